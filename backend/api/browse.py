@@ -7,14 +7,19 @@ import os
 import json
 from pathlib import Path
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 
 from services.logger import get_logger
+from services.dir_summary import dir_summary
 
 logger = get_logger(__name__)
 router = APIRouter()
 
+# 目录摘要未索引时最多等待后台索引的时间（秒），超时后先返回未知
+SUMMARY_WAIT = 1.0
+
 class DirectoryItem(BaseModel):
     """目录项模型"""
     name: str
@@ -23,6 +28,9 @@ class DirectoryItem(BaseModel):
     size: Optional[int] = None
     modified_time: Optional[str] = None
     has_strm_files: Optional[bool] = None
+    strm_count: Optional[int] = None
+    linked_sidecars: Optional[int] = None
+    unlinked_sidecars: Optional[int] = None
 
 class BrowseResult(BaseModel):
     """浏览结果模型"""
@@ -32,6 +40,7 @@ class BrowseResult(BaseModel):
     total_items: int
     directories_count: int
     files_count: int
+    summary_pending: bool = False
 
 @router.get("/", response_model=BrowseResult)
 async def browse_directory(
@@ -66,6 +75,11 @@ async def browse_directory(
         items = []
         directories_count = 0
         files_count = 0
+        summary_pending = False
+        
+        # 子目录的 .strm 统计从目录摘要索引查询，首次浏览时在后台建立索引
+        if check_strm:
+            await run_in_threadpool(dir_summary.prepare, str(current_path), SUMMARY_WAIT)
         
         try:
             # 遍历目录内容
@@ -94,16 +108,12 @@ async def browse_directory(
                     size = None
                     modified_time_str = None
                 
-                # 检查目录中是否包含 .strm 文件
-                has_strm_files = None
+                # 查询目录中的 .strm 文件统计
+                summary = {}
                 if is_directory and check_strm:
-                    try:
-                        has_strm_files = any(
-                            f.suffix.lower() == '.strm' 
-                            for f in item_path.rglob('*.strm')
-                        )
-                    except (OSError, PermissionError):
-                        has_strm_files = None
+                    summary = dir_summary.lookup(str(item_path)) or {}
+                    if not summary:
+                        summary_pending = True
                 
                 # 创建目录项
                 directory_item = DirectoryItem(
@@ -112,7 +122,10 @@ async def browse_directory(
                     is_directory=is_directory,
                     size=size,
                     modified_time=modified_time_str,
-                    has_strm_files=has_strm_files
+                    has_strm_files=summary.get("has_strm_files"),
+                    strm_count=summary.get("strm_count"),
+                    linked_sidecars=summary.get("linked_sidecars"),
+                    unlinked_sidecars=summary.get("unlinked_sidecars")
                 )
                 
                 items.append(directory_item)
@@ -138,7 +151,8 @@ async def browse_directory(
             items=items,
             total_items=len(items),
             directories_count=directories_count,
-            files_count=files_count
+            files_count=files_count,
+            summary_pending=summary_pending
         )
         
         logger.debug(f"浏览目录: {current_path}, 返回 {len(items)} 个项目")
@@ -174,6 +188,7 @@ async def search_directories(
         
         results = []
         query_lower = query.lower()
+        await run_in_threadpool(dir_summary.prepare, str(search_root), SUMMARY_WAIT)
         
         def search_recursive(path: Path, current_depth: int):
             """递归搜索目录"""
@@ -194,21 +209,14 @@ async def search_directories(
                     
                     # 检查目录名是否匹配
                     if query_lower in item.name.lower():
-                        # 检查是否包含 .strm 文件
-                        try:
-                            has_strm_files = any(
-                                f.suffix.lower() == '.strm' 
-                                for f in item.rglob('*.strm')
-                            )
-                        except (OSError, PermissionError):
-                            has_strm_files = None
-                        
+                        summary = dir_summary.lookup(str(item)) or {}
                         results.append({
                             "name": item.name,
                             "path": str(item),
                             "relative_path": str(item.relative_to(search_root)),
                             "depth": current_depth,
-                            "has_strm_files": has_strm_files
+                            "has_strm_files": summary.get("has_strm_files"),
+                            "strm_count": summary.get("strm_count")
                         })
                     
                     # 递归搜索子目录
@@ -276,6 +284,8 @@ async def autocomplete_path(
                 "message": "父目录不存在或无法访问"
             }
         
+        await run_in_threadpool(dir_summary.prepare, str(parent), SUMMARY_WAIT)
+        
         try:
             # 获取匹配的子目录
             prefix_lower = prefix.lower() if 'prefix' in locals() else ""
@@ -300,19 +310,14 @@ async def autocomplete_path(
                 # 添加建议
                 full_path = str(item)
                 
-                # 检查是否包含 .strm 文件（可选）
-                try:
-                    has_strm_files = any(
-                        f.suffix.lower() == '.strm' 
-                        for f in item.rglob('*.strm')
-                    )
-                except (OSError, PermissionError):
-                    has_strm_files = None
+                # 从目录摘要索引查询 .strm 文件统计
+                summary = dir_summary.lookup(full_path) or {}
                 
                 suggestions.append({
                     "path": full_path,
                     "name": item.name,
-                    "has_strm_files": has_strm_files
+                    "has_strm_files": summary.get("has_strm_files"),
+                    "strm_count": summary.get("strm_count")
                 })
         
         except (PermissionError, OSError):
@@ -3,7 +3,10 @@
 处理扫描配置、任务管理等
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+import asyncio
+
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from pathlib import Path
@@ -13,6 +16,13 @@ from services.scanner import StrmScanner
 from services.watcher import WatcherService
 from services.scheduler import SchedulerService
 from services.config_manager import ConfigManager
+from services.scan_governor import scan_governor, make_scan_key
+from services.io_budget import io_budget
+from services.shared_scan import scan_shared, collapse_roots
+from services.scan_progress import scan_history
+from services.scan_reports import scan_reports
+from services.dir_summary import dir_summary
+from services.fs_guard import fs_guard, FsTimeoutError, MountUnavailableError
 
 logger = get_logger(__name__)
 router = APIRouter()
@@ -26,6 +36,9 @@ class ScanConfig(BaseModel):
     dry_run: bool = Field(default=False, description="是否仅预览不执行")
     custom_video_extensions: List[str] = Field(default=[], description="自定义视频扩展名")
     custom_metadata_extensions: List[str] = Field(default=[], description="自定义元数据扩展名")
+    ops_per_second: Optional[float] = Field(default=None, ge=0, description="每秒文件系统操作数上限，为空或 0 表示不限")
+    adaptive_throttle: bool = Field(default=False, description="是否根据存储延迟自动退避")
+    verbose: bool = Field(default=False, description="是否按 INFO 级别输出逐文件的详细日志（排查单个目录时使用）")
 
 class CreateScanConfig(BaseModel):
     """创建扫描配置"""
@@ -35,6 +48,8 @@ class CreateScanConfig(BaseModel):
     recursive: bool = Field(default=True, description="是否递归扫描子目录")
     custom_video_extensions: List[str] = Field(default=[], description="自定义视频扩展名")
     custom_metadata_extensions: List[str] = Field(default=[], description="自定义元数据扩展名")
+    ops_per_second: Optional[float] = Field(default=None, ge=0, description="每秒文件系统操作数上限，为空或 0 表示不限")
+    adaptive_throttle: bool = Field(default=False, description="是否根据存储延迟自动退避")
 
 class SavedScanConfig(BaseModel):
     """保存的扫描配置"""
@@ -45,6 +60,8 @@ class SavedScanConfig(BaseModel):
     recursive: bool = Field(default=True, description="是否递归扫描子目录")
     custom_video_extensions: List[str] = Field(default=[], description="自定义视频扩展名")
     custom_metadata_extensions: List[str] = Field(default=[], description="自定义元数据扩展名")
+    ops_per_second: Optional[float] = Field(default=None, ge=0, description="每秒文件系统操作数上限，为空或 0 表示不限")
+    adaptive_throttle: bool = Field(default=False, description="是否根据存储延迟自动退避")
     created_at: str = Field(default="", description="创建时间")
     updated_at: str = Field(default="", description="更新时间")
 
@@ -56,6 +73,8 @@ class ScanConfigUpdate(BaseModel):
     recursive: Optional[bool] = Field(None, description="是否递归扫描子目录")
     custom_video_extensions: Optional[List[str]] = Field(None, description="自定义视频扩展名")
     custom_metadata_extensions: Optional[List[str]] = Field(None, description="自定义元数据扩展名")
+    ops_per_second: Optional[float] = Field(None, ge=0, description="每秒文件系统操作数上限，0 表示不限")
+    adaptive_throttle: Optional[bool] = Field(None, description="是否根据存储延迟自动退避")
 
 class ScanResult(BaseModel):
     """扫描结果"""
@@ -68,12 +87,14 @@ class ScanResult(BaseModel):
     errors: List[Dict]
     details: List[Dict]
     duration: float
+    report_id: Optional[str] = None
 
 class WatchConfig(BaseModel):
     """监听配置"""
     directory: str = Field(..., description="监听目录路径")
     target_formats: List[str] = Field(default=["mp4", "mkv"], description="目标视频格式")
     recursive: bool = Field(default=True, description="是否递归监听子目录")
+    watch_mode: str = Field(default="recursive", description="监听模式: recursive 或 selective（仅监听包含 .strm 文件的目录）")
 
 class ScheduleConfig(BaseModel):
     """定时任务配置"""
@@ -87,52 +108,198 @@ class ScheduleConfig(BaseModel):
     scan_config_id: Optional[str] = Field(None, description="关联的扫描配置ID")
     custom_video_extensions: List[str] = Field(default=[], description="自定义视频扩展名")
     custom_metadata_extensions: List[str] = Field(default=[], description="自定义元数据扩展名")
+    skip_watched: bool = Field(default=True, description="是否跳过文件监听服务已实时处理的目录，仅补扫脏目录")
+    time_limit: Optional[float] = Field(default=None, gt=0, description="单次运行的最长时间（秒），超时后在检查点停止并在下次运行时续扫")
+    ops_per_second: Optional[float] = Field(default=None, ge=0, description="每秒文件系统操作数上限，为空或 0 表示不限")
+    adaptive_throttle: bool = Field(default=False, description="是否根据存储延迟自动退避")
+
+class BatchExecuteConfig(BaseModel):
+    """批量执行扫描配置"""
+    config_ids: List[str] = Field(..., min_length=1, description="要执行的扫描配置 ID 列表")
+    dry_run: bool = Field(default=False, description="是否仅预览不执行")
+
+class StaggerConfig(BaseModel):
+    """定时任务错峰配置"""
+    window: float = Field(..., ge=0, description="同一设备上的任务最多推迟的秒数，0 表示关闭错峰")
+    jitter: float = Field(default=0, ge=0, description="额外随机抖动的秒数上限")
+
+class DeviceBudgetConfig(BaseModel):
+    """设备 I/O 预算配置"""
+    path: str = Field(..., description="设备上的任意路径（如媒体库根目录）")
+    ops_per_second: Optional[float] = Field(default=None, ge=0, description="每秒文件系统操作数上限，为空或 0 表示取消限制")
+    adaptive: bool = Field(default=False, description="是否根据存储延迟自动退避")
 
 class ExtensionConfig(BaseModel):
     """扩展名配置"""
     video_extensions: List[str] = Field(default=[], description="自定义视频扩展名")
     metadata_extensions: List[str] = Field(default=[], description="自定义元数据扩展名")
+    apply: bool = Field(default=False, description="是否立即为已配置的目录补建新扩展名的链接（扩展名增量扫描）")
 
 # 全局服务实例（将在 main.py 中注入）
 scanner = StrmScanner()
 config_manager = ConfigManager()
+# 目录摘要与全局扫描器共用扩展名集合
+dir_summary.use_scanner(scanner)
 watcher_service = None
 scheduler_service = None
 
+async def _validate_directory(directory: str):
+    """
+    在线程池中经挂载点保护检查目录，失效的挂载点不会阻塞事件循环
+    
+    Raises:
+        HTTPException: 目录不存在、不是目录（400）或挂载点不可用（503）
+    """
+    path = Path(directory)
+    try:
+        exists, is_dir = await run_in_threadpool(
+            fs_guard.call, directory, lambda: (path.exists(), path.is_dir()),
+            description=f"检查目录 {directory}"
+        )
+    except (FsTimeoutError, MountUnavailableError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    if not exists:
+        raise HTTPException(status_code=400, detail=f"目录不存在: {directory}")
+    if not is_dir:
+        raise HTTPException(status_code=400, detail=f"路径不是目录: {directory}")
+
 @router.post("/scan", response_model=ScanResult)
 async def scan_directory(config: ScanConfig, background_tasks: BackgroundTasks):
     """执行目录扫描"""
     try:
         # 验证目录
-        directory_path = Path(config.directory)
-        if not directory_path.exists():
-            raise HTTPException(status_code=400, detail=f"目录不存在: {config.directory}")
-        
-        if not directory_path.is_dir():
-            raise HTTPException(status_code=400, detail=f"路径不是目录: {config.directory}")
+        await _validate_directory(config.directory)
         
         logger.info(f"开始扫描目录: {config.directory}")
         
         # 创建临时扫描器实例，应用自定义扩展名
         temp_scanner = StrmScanner(
             custom_video_extensions=config.custom_video_extensions,
-            custom_metadata_extensions=config.custom_metadata_extensions
+            custom_metadata_extensions=config.custom_metadata_extensions,
+            ops_per_second=config.ops_per_second,
+            adaptive_throttle=config.adaptive_throttle,
+            verbose=config.verbose
         )
+        dir_summary.register_extensions(temp_scanner)
         
-        # 执行扫描
-        result = temp_scanner.scan_directory(
-            directory=config.directory,
-            target_formats=config.target_formats,
-            recursive=config.recursive,
-            dry_run=config.dry_run
-        )
+        # 通过全局扫描控制器执行，不占用请求线程；相同目录的重复请求合并
+        # 进度历史、去重键和设备号需要访问文件系统，在线程池中计算
+        def submit():
+            progress = scan_history.new_progress(config.directory, config.recursive)
+            return scan_governor.submit(
+                make_scan_key(
+                    config.directory,
+                    config.recursive,
+                    config.custom_video_extensions,
+                    config.custom_metadata_extensions,
+                    config.dry_run
+                ),
+                lambda: temp_scanner.scan_directory(
+                    directory=config.directory,
+                    target_formats=config.target_formats,
+                    recursive=config.recursive,
+                    dry_run=config.dry_run,
+                    progress=progress
+                ),
+                description=f"手动扫描: {config.directory}",
+                source="api",
+                path=config.directory,
+                progress=progress,
+                dry_run=config.dry_run
+            )
         
-        return ScanResult(**result)
+        job = await run_in_threadpool(submit)
+        result = await asyncio.wrap_future(job.future)
         
+        return ScanResult(**result)
+    
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"扫描目录失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/scan/jobs")
+async def get_scan_jobs():
+    """获取全局扫描队列状态（运行中、排队中和最近完成的扫描）"""
+    return scan_governor.get_status()
+
+@router.get("/scan/jobs/{job_id}")
+async def get_scan_job(job_id: int):
+    """获取指定扫描的状态"""
+    job = scan_governor.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"扫描不存在: {job_id}")
+    
+    return job
+
+@router.get("/scan-reports")
+async def list_scan_reports(
+    limit: int = Query(50, ge=1, le=200, description="返回数量"),
+    directory: Optional[str] = Query(None, description="按扫描目录过滤")
+):
+    """获取最近的扫描报告（从新到旧）"""
+    return {"reports": scan_reports.list_reports(limit, directory)}
+
+@router.get("/scan-reports/diff")
+async def diff_scan_reports(
+    base: str = Query(..., description="基准报告 ID"),
+    target: str = Query(..., description="对比报告 ID"),
+    limit: int = Query(100, ge=1, le=10000, description="每类变化最多返回的文件数")
+):
+    """对比两次扫描：新增失败、已修复、新增、消失和链接数变化的文件"""
+    diff = await run_in_threadpool(scan_reports.diff, base, target, limit)
+    if diff is None:
+        raise HTTPException(status_code=404, detail=f"扫描报告不存在: {base} 或 {target}")
+    
+    return diff
+
+@router.get("/scan-reports/{report_id}")
+async def get_scan_report(
+    report_id: str,
+    status: Optional[str] = Query(None, pattern="^(linked|unchanged|failed)$", description="按文件状态过滤"),
+    limit: int = Query(100, ge=1, le=10000, description="返回数量"),
+    offset: int = Query(0, ge=0, description="跳过数量")
+):
+    """获取扫描报告中的逐文件结果"""
+    report = await run_in_threadpool(scan_reports.get_files, report_id, status, limit, offset)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"扫描报告不存在: {report_id}")
+    
+    return report
+
+@router.get("/scan-reports/{report_id}/failures")
+async def get_scan_report_failures(
+    report_id: str,
+    limit: int = Query(100, ge=1, le=10000, description="返回数量"),
+    offset: int = Query(0, ge=0, description="跳过数量")
+):
+    """获取某次扫描中处理失败的文件"""
+    return await get_scan_report(report_id, "failed", limit, offset)
+
+@router.get("/io/budgets")
+async def get_device_budgets():
+    """获取各存储设备的 I/O 预算及令牌桶状态（设备号在线程池中解析）"""
+    return {"budgets": await run_in_threadpool(io_budget.get_status)}
+
+@router.put("/io/budgets")
+async def set_device_budget(config: DeviceBudgetConfig):
+    """设置路径所在存储设备的 I/O 预算（对该设备上的所有扫描生效）"""
+    path = Path(config.path)
+    try:
+        exists = await run_in_threadpool(
+            fs_guard.call, config.path, path.exists, description=f"检查路径 {config.path}"
+        )
+        if not exists:
+            raise HTTPException(status_code=400, detail=f"路径不存在: {config.path}")
+        
+        await run_in_threadpool(io_budget.set_device_budget, config.path, config.ops_per_second, config.adaptive)
+    except (FsTimeoutError, MountUnavailableError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return {"message": f"成功设置 I/O 预算: {config.path}"}
+
 @router.post("/cleanup")
 async def cleanup_broken_links(directory: str, recursive: bool = True):
     """清理损坏的软链接"""
@@ -143,7 +310,7 @@ async def cleanup_broken_links(directory: str, recursive: bool = True):
         
         result = scanner.cleanup_broken_links(directory, recursive)
         return result
-        
+    
     except Exception as e:
         logger.error(f"清理软链接失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -195,11 +362,13 @@ async def add_watch_directory(config: WatchConfig):
     if not watcher_service:
         raise HTTPException(status_code=500, detail="监听服务未初始化")
     
-    success = watcher_service.add_watch_directory(
+    # 解析和检查目录需要访问文件系统，在线程池中执行
+    success = await run_in_threadpool(lambda: watcher_service.add_watch_directory(
         directory=config.directory,
         target_formats=config.target_formats,
-        recursive=config.recursive
-    )
+        recursive=config.recursive,
+        watch_mode=config.watch_mode
+    ))
     
     if success:
         return {"message": f"成功添加监听目录: {config.directory}"}
@@ -259,7 +428,11 @@ async def add_scheduled_task(config: ScheduleConfig):
             enabled=config.enabled,
             recursive=scan_config.get("recursive", True),
             custom_video_extensions=scan_config.get("custom_video_extensions", []),
-            custom_metadata_extensions=scan_config.get("custom_metadata_extensions", [])
+            custom_metadata_extensions=scan_config.get("custom_metadata_extensions", []),
+            skip_watched=config.skip_watched,
+            ops_per_second=scan_config.get("ops_per_second"),
+            adaptive_throttle=scan_config.get("adaptive_throttle", False),
+            time_limit=config.time_limit
         )
     else:
         # 使用直接参数
@@ -272,7 +445,11 @@ async def add_scheduled_task(config: ScheduleConfig):
             enabled=config.enabled,
             recursive=config.recursive,
             custom_video_extensions=config.custom_video_extensions,
-            custom_metadata_extensions=config.custom_metadata_extensions
+            custom_metadata_extensions=config.custom_metadata_extensions,
+            skip_watched=config.skip_watched,
+            ops_per_second=config.ops_per_second,
+            adaptive_throttle=config.adaptive_throttle,
+            time_limit=config.time_limit
         )
     
     if success:
@@ -333,13 +510,58 @@ async def run_task_now(task_id: str):
     if not scheduler_service:
         raise HTTPException(status_code=500, detail="调度服务未初始化")
     
-    success = scheduler_service.run_task_now(task_id)
+    # 去重键和设备号需要访问文件系统，在线程池中提交
+    success = await run_in_threadpool(scheduler_service.run_task_now, task_id)
     
     if success:
         return {"message": f"成功触发任务执行: {task_id}"}
     else:
         raise HTTPException(status_code=400, detail=f"触发任务执行失败: {task_id}")
 
+@router.get("/schedule/tasks/{task_id}/history")
+async def get_task_history(task_id: str, limit: int = Query(default=50, ge=1, le=1000, description="返回记录数量")):
+    """获取定时任务运行历史"""
+    global scheduler_service
+    
+    if not scheduler_service:
+        raise HTTPException(status_code=500, detail="调度服务未初始化")
+    
+    return {
+        "task_id": task_id,
+        "runs": scheduler_service.get_task_history(task_id, limit)
+    }
+
+@router.get("/schedule/tasks/{task_id}/stats")
+async def get_task_duration_stats(task_id: str):
+    """获取定时任务运行耗时的百分位统计（p50/p90/p95/p99）"""
+    global scheduler_service
+    
+    if not scheduler_service:
+        raise HTTPException(status_code=500, detail="调度服务未初始化")
+    
+    return scheduler_service.get_task_duration_stats(task_id)
+
+@router.get("/schedule/stagger")
+async def get_schedule_stagger():
+    """获取定时任务错峰配置"""
+    global scheduler_service
+    
+    if not scheduler_service:
+        raise HTTPException(status_code=500, detail="调度服务未初始化")
+    
+    return scheduler_service.get_stagger()
+
+@router.put("/schedule/stagger")
+async def set_schedule_stagger(config: StaggerConfig):
+    """设置定时任务错峰配置"""
+    global scheduler_service
+    
+    if not scheduler_service:
+        raise HTTPException(status_code=500, detail="调度服务未初始化")
+    
+    scheduler_service.set_stagger(config.window, config.jitter)
+    return {"message": "成功设置错峰配置"}
+
 @router.get("/schedule/status")
 async def get_scheduler_status():
     """获取调度器状态"""
@@ -348,9 +570,79 @@ async def get_scheduler_status():
     if not scheduler_service:
         return {"is_running": False}
     
-    return {"is_running": scheduler_service.is_running()}
+    return {"is_running": scheduler_service.get_running_status()}
 
 # 扩展名管理相关接口
+def _normalize_extension(extension: str) -> str:
+    extension = extension if extension.startswith('.') else '.' + extension
+    return extension.lower()
+
+def _apply_new_extensions(metadata_extensions: List[str], video_extensions: List[str]) -> List[int]:
+    """
+    为所有已配置的目录（扫描配置、定时任务、监听目录）提交扩展名增量扫描
+    
+    每个目标按自身的自定义扩展名和限速配置创建扫描器，配置相同的目标才合并重叠目录。
+    需要访问文件系统，应在线程池中调用
+    
+    Returns:
+        提交的扫描任务 ID 列表
+    """
+    global config_manager, scheduler_service, watcher_service
+    
+    targets = [(config["directory"], config.get("recursive", True), config) for config in config_manager.get_all_configs()]
+    if scheduler_service:
+        targets += [(task["directory"], task["recursive"], task) for task in scheduler_service.get_tasks()]
+    if watcher_service:
+        # 监听服务使用默认扩展名
+        targets += [(config["path"], config["recursive"], {}) for config in watcher_service.watch_dirs.values()]
+    
+    groups: Dict[tuple, List[tuple]] = {}
+    for directory, recursive, settings in targets:
+        try:
+            if not fs_guard.call(directory, Path(directory).is_dir, description=f"检查目录 {directory}"):
+                continue
+        except (FsTimeoutError, MountUnavailableError) as e:
+            logger.warning(f"跳过扩展名增量扫描: {e}")
+            continue
+        
+        key = (
+            tuple(sorted(settings.get("custom_video_extensions") or [])),
+            tuple(sorted(settings.get("custom_metadata_extensions") or [])),
+            settings.get("ops_per_second"),
+            settings.get("adaptive_throttle", False)
+        )
+        groups.setdefault(key, []).append((directory, recursive))
+    
+    job_ids = []
+    for (custom_video, custom_metadata, ops_per_second, adaptive_throttle), group in groups.items():
+        target_scanner = StrmScanner(
+            custom_video_extensions=list(custom_video),
+            custom_metadata_extensions=list(custom_metadata),
+            ops_per_second=ops_per_second,
+            adaptive_throttle=adaptive_throttle
+        )
+        for directory, recursive in collapse_roots(group):
+            job = scan_governor.submit(
+                (
+                    "extension_delta", directory, recursive, custom_video, custom_metadata,
+                    tuple(sorted(metadata_extensions)), tuple(sorted(video_extensions))
+                ),
+                lambda directory=directory, recursive=recursive, target_scanner=target_scanner:
+                    target_scanner.scan_new_extensions(
+                        directory,
+                        metadata_extensions=metadata_extensions,
+                        video_extensions=video_extensions,
+                        recursive=recursive
+                    ),
+                description=f"扩展名增量扫描: {directory}",
+                source="api",
+                path=directory
+            )
+            job_ids.append(job.job_id)
+    
+    logger.info(f"为 {len(job_ids)} 个目录提交扩展名增量扫描")
+    return job_ids
+
 @router.get("/extensions")
 async def get_supported_extensions():
     """获取支持的扩展名列表"""
@@ -363,25 +655,39 @@ async def get_supported_extensions():
     }
 
 @router.post("/extensions/video")
-async def add_video_extension(extension: str):
-    """添加自定义视频扩展名"""
+async def add_video_extension(extension: str, apply: bool = False):
+    """添加自定义视频扩展名，apply 为 true 时为已配置的目录补建链接"""
     global scanner
     
     try:
+        is_new = _normalize_extension(extension) not in scanner.video_extensions
         scanner.add_video_extension(extension)
-        return {"message": f"成功添加视频扩展名: {extension}"}
+        if is_new:
+            dir_summary.expire()
+        
+        response = {"message": f"成功添加视频扩展名: {extension}"}
+        if apply and is_new:
+            response["scan_jobs"] = await run_in_threadpool(_apply_new_extensions, [], [_normalize_extension(extension)])
+        return response
     except Exception as e:
         logger.error(f"添加视频扩展名失败: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/extensions/metadata")
-async def add_metadata_extension(extension: str):
-    """添加自定义元数据扩展名"""
+async def add_metadata_extension(extension: str, apply: bool = False):
+    """添加自定义元数据扩展名，apply 为 true 时只为新扩展名补建链接，无需全量重扫"""
     global scanner
     
     try:
+        is_new = _normalize_extension(extension) not in scanner.metadata_extensions
         scanner.add_metadata_extension(extension)
-        return {"message": f"成功添加元数据扩展名: {extension}"}
+        if is_new:
+            dir_summary.expire()
+        
+        response = {"message": f"成功添加元数据扩展名: {extension}"}
+        if apply and is_new:
+            response["scan_jobs"] = await run_in_threadpool(_apply_new_extensions, [_normalize_extension(extension)], [])
+        return response
     except Exception as e:
         logger.error(f"添加元数据扩展名失败: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -396,19 +702,31 @@ async def add_extensions_batch(config: ExtensionConfig):
             "video_extensions": [],
             "metadata_extensions": []
         }
+        new_video = []
+        new_metadata = []
         
         for ext in config.video_extensions:
+            if _normalize_extension(ext) not in scanner.video_extensions:
+                new_video.append(_normalize_extension(ext))
             scanner.add_video_extension(ext)
             results["video_extensions"].append(ext)
         
         for ext in config.metadata_extensions:
+            if _normalize_extension(ext) not in scanner.metadata_extensions:
+                new_metadata.append(_normalize_extension(ext))
             scanner.add_metadata_extension(ext)
             results["metadata_extensions"].append(ext)
         
-        return {
+        if new_video or new_metadata:
+            dir_summary.expire()
+        
+        response = {
             "message": "批量添加扩展名成功",
             "added": results
         }
+        if config.apply and (new_video or new_metadata):
+            response["scan_jobs"] = await run_in_threadpool(_apply_new_extensions, new_metadata, new_video)
+        return response
     except Exception as e:
         logger.error(f"批量添加扩展名失败: {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -422,6 +740,75 @@ async def get_scan_configs():
     configs = config_manager.get_all_configs()
     return {"configs": configs}
 
+@router.get("/scan-configs/overlaps")
+async def get_overlapping_scan_configs():
+    """获取扫描目录互相嵌套的配置"""
+    global config_manager
+    
+    return {"overlaps": config_manager.get_overlapping_configs()}
+
+@router.post("/scan-configs/execute")
+async def execute_scan_configs(batch: BatchExecuteConfig):
+    """批量执行扫描配置，目录重叠的配置合并为一次遍历"""
+    global config_manager
+    
+    configs = []
+    for config_id in dict.fromkeys(batch.config_ids):
+        config = config_manager.get_config(config_id)
+        if not config:
+            raise HTTPException(status_code=404, detail=f"配置不存在: {config_id}")
+        await _validate_directory(config["directory"])
+        configs.append(config)
+    
+    requests = [
+        {
+            "directory": config["directory"],
+            "recursive": config.get("recursive", True),
+            "scanner": StrmScanner(
+                custom_video_extensions=config.get("custom_video_extensions", []),
+                custom_metadata_extensions=config.get("custom_metadata_extensions", []),
+                ops_per_second=config.get("ops_per_second"),
+                adaptive_throttle=config.get("adaptive_throttle", False)
+            )
+        }
+        for config in configs
+    ]
+    for request in requests:
+        dir_summary.register_extensions(request["scanner"])
+    
+    try:
+        logger.info(f"批量执行扫描配置: {', '.join(config['name'] for config in configs)}")
+        
+        job = await run_in_threadpool(lambda: scan_governor.submit(
+            ("batch",) + tuple(sorted(
+                make_scan_key(
+                    config["directory"],
+                    config.get("recursive", True),
+                    config.get("custom_video_extensions", []),
+                    config.get("custom_metadata_extensions", []),
+                    batch.dry_run
+                )
+                for config in configs
+            )),
+            lambda: scan_shared(requests, dry_run=batch.dry_run),
+            description=f"批量扫描配置: {', '.join(config['name'] for config in configs)}",
+            source="api",
+            paths=[config["directory"] for config in configs],
+            dry_run=batch.dry_run
+        ))
+        results = await asyncio.wrap_future(job.future)
+        
+        return {
+            "results": [
+                {"config_id": config["config_id"], **ScanResult(**result).dict()}
+                for config, result in zip(configs, results)
+            ]
+        }
+    
+    except Exception as e:
+        logger.error(f"批量执行扫描配置失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/scan-configs/{config_id}")
 async def get_scan_config(config_id: str):
     """获取指定扫描配置"""
@@ -509,30 +896,50 @@ async def execute_scan_config(config_id: str, dry_run: bool = False):
     
     try:
         # 验证目录
-        directory_path = Path(config["directory"])
-        if not directory_path.exists():
-            raise HTTPException(status_code=400, detail=f"目录不存在: {config['directory']}")
-        
-        if not directory_path.is_dir():
-            raise HTTPException(status_code=400, detail=f"路径不是目录: {config['directory']}")
+        await _validate_directory(config["directory"])
         
         logger.info(f"执行扫描配置: {config['name']} (ID: {config_id})")
         
         # 创建扫描器实例，应用自定义扩展名
         temp_scanner = StrmScanner(
             custom_video_extensions=config.get("custom_video_extensions", []),
-            custom_metadata_extensions=config.get("custom_metadata_extensions", [])
+            custom_metadata_extensions=config.get("custom_metadata_extensions", []),
+            ops_per_second=config.get("ops_per_second"),
+            adaptive_throttle=config.get("adaptive_throttle", False)
         )
+        dir_summary.register_extensions(temp_scanner)
         
-        # 执行扫描
-        result = temp_scanner.scan_directory(
-            directory=config["directory"],
-            recursive=config.get("recursive", True),
-            dry_run=dry_run
-        )
+        # 通过全局扫描控制器执行，进度历史、去重键和设备号在线程池中计算
+        def submit():
+            progress = scan_history.new_progress(config["directory"], config.get("recursive", True))
+            return scan_governor.submit(
+                make_scan_key(
+                    config["directory"],
+                    config.get("recursive", True),
+                    config.get("custom_video_extensions", []),
+                    config.get("custom_metadata_extensions", []),
+                    dry_run
+                ),
+                lambda: temp_scanner.scan_directory(
+                    directory=config["directory"],
+                    recursive=config.get("recursive", True),
+                    dry_run=dry_run,
+                    progress=progress
+                ),
+                description=f"扫描配置: {config['name']}",
+                source="api",
+                path=config["directory"],
+                progress=progress,
+                dry_run=dry_run
+            )
         
-        return ScanResult(**result)
+        job = await run_in_threadpool(submit)
+        result = await asyncio.wrap_future(job.future)
         
+        return ScanResult(**result)
+    
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"执行扫描配置失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -3,16 +3,26 @@
 提供日志查询和管理功能
 """
 
-from fastapi import APIRouter, HTTPException, Query
+import asyncio
+import itertools
+import json
+import zlib
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any
 from datetime import datetime
 
 from services.logger import log_manager, get_logger
+from services.log_tail import log_tail, DEFAULT_BUFFER_SIZE
 
 logger = get_logger(__name__)
 router = APIRouter()
 
+# 流式导出每次输出的块大小（字符数）
+EXPORT_CHUNK_SIZE = 64 * 1024
+
 class LogEntry(BaseModel):
     """日志条目模型"""
     asctime: str
@@ -28,13 +38,33 @@ class LogQuery(BaseModel):
     start_time: Optional[str] = None
     end_time: Optional[str] = None
 
+def _parse_time(value: Optional[str], label: str) -> Optional[datetime]:
+    """解析 ISO 格式的时间参数"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{label}格式错误，请使用 ISO 格式")
+
+def _validate_level(level: Optional[str]):
+    """验证日志级别参数"""
+    valid_levels = {'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'}
+    if level and level.upper() not in valid_levels:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"无效的日志级别: {level}. 有效值: {', '.join(valid_levels)}"
+        )
+
 @router.get("/", response_model=List[Dict[str, Any]])
 async def get_logs(
     limit: int = Query(default=100, ge=1, le=1000, description="返回日志数量"),
     level: Optional[str] = Query(default=None, description="日志级别过滤 (DEBUG, INFO, WARNING, ERROR, CRITICAL)"),
     search: Optional[str] = Query(default=None, description="搜索关键词"),
     start_time: Optional[str] = Query(default=None, description="开始时间 (ISO格式)"),
-    end_time: Optional[str] = Query(default=None, description="结束时间 (ISO格式)")
+    end_time: Optional[str] = Query(default=None, description="结束时间 (ISO格式)"),
+    offset: int = Query(default=0, ge=0, description="跳过的日志数量（分页）"),
+    name: Optional[str] = Query(default=None, description="日志器名称过滤")
 ):
     """
     获取日志记录
@@ -44,31 +74,16 @@ async def get_logs(
     - level: 按日志级别过滤
     - search: 按消息内容搜索
     - start_time, end_time: 按时间范围过滤
+    - offset: 分页偏移
+    - name: 按日志器名称过滤
     """
     try:
         # 解析时间参数
-        start_dt = None
-        end_dt = None
-        
-        if start_time:
-            try:
-                start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            except ValueError:
-                raise HTTPException(status_code=400, detail="开始时间格式错误，请使用 ISO 格式")
-        
-        if end_time:
-            try:
-                end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-            except ValueError:
-                raise HTTPException(status_code=400, detail="结束时间格式错误，请使用 ISO 格式")
+        start_dt = _parse_time(start_time, "开始时间")
+        end_dt = _parse_time(end_time, "结束时间")
         
         # 验证日志级别
-        valid_levels = {'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'}
-        if level and level.upper() not in valid_levels:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"无效的日志级别: {level}. 有效值: {', '.join(valid_levels)}"
-            )
+        _validate_level(level)
         
         # 获取日志
         logs = log_manager.get_logs(
@@ -76,18 +91,64 @@ async def get_logs(
             level=level,
             search=search,
             start_time=start_dt,
-            end_time=end_dt
+            end_time=end_dt,
+            offset=offset,
+            name=name
         )
         
         logger.info(f"查询日志: 返回 {len(logs)} 条记录")
         return logs
-        
+    
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"获取日志失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/stream")
+async def stream_logs(
+    request: Request,
+    level: Optional[str] = Query(default=None, description="日志级别过滤"),
+    search: Optional[str] = Query(default=None, description="搜索关键词"),
+    name: Optional[str] = Query(default=None, description="日志器名称过滤"),
+    buffer_size: int = Query(default=DEFAULT_BUFFER_SIZE, ge=10, le=5000, description="客户端缓冲条数，消费过慢时丢弃最旧的日志")
+):
+    """
+    实时日志推送（Server-Sent Events）
+    
+    新日志写入时立即推送，过滤在服务端完成；
+    缓冲区溢出时发送 dropped 事件告知丢弃的条数
+    """
+    subscriber = log_tail.subscribe(level=level, search=search, name=name, buffer_size=buffer_size)
+    
+    async def event_stream():
+        reported_dropped = 0
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.ready.wait(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # 心跳，防止代理断开空闲连接
+                    yield ": keepalive\n\n"
+                    continue
+                
+                entries = subscriber.drain()
+                if subscriber.dropped > reported_dropped:
+                    yield f"event: dropped\ndata: {json.dumps({'dropped': subscriber.dropped - reported_dropped})}\n\n"
+                    reported_dropped = subscriber.dropped
+                for entry in entries:
+                    yield f"data: {json.dumps(entry, ensure_ascii=False)}\n\n"
+        finally:
+            log_tail.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/levels")
 async def get_log_levels():
     """获取支持的日志级别列表"""
@@ -102,58 +163,38 @@ async def get_log_levels():
     }
 
 @router.get("/stats")
-async def get_log_statistics():
-    """获取日志统计信息"""
+async def get_log_statistics(
+    hours: int = Query(default=24, ge=1, le=720, description="按小时统计的时间范围")
+):
+    """获取日志统计信息（写入时累加的计数，覆盖全部历史）"""
     try:
-        # 获取最近的日志进行统计
-        recent_logs = log_manager.get_logs(limit=1000)
-        
-        if not recent_logs:
-            return {
-                "total": 0,
-                "level_counts": {},
-                "recent_errors": 0,
-                "latest_log_time": None
-            }
-        
-        # 统计各级别日志数量
-        level_counts = {}
-        error_count = 0
-        
-        for log in recent_logs:
-            level = log.get('levelname', 'UNKNOWN')
-            level_counts[level] = level_counts.get(level, 0) + 1
-            
-            if level in ['ERROR', 'CRITICAL']:
-                error_count += 1
-        
-        # 最新日志时间
-        latest_log_time = recent_logs[0].get('asctime') if recent_logs else None
-        
-        return {
-            "total": len(recent_logs),
-            "level_counts": level_counts,
-            "recent_errors": error_count,
-            "latest_log_time": latest_log_time
-        }
-        
+        return log_manager.get_stats(hours=hours)
+    
     except Exception as e:
         logger.error(f"获取日志统计失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/clear")
-async def clear_old_logs(days: int = Query(default=7, ge=1, le=365, description="保留最近几天的日志")):
+async def clear_old_logs(
+    days: int = Query(default=7, ge=1, le=365, description="保留最近几天的日志"),
+    compress_after_days: Optional[int] = Query(default=None, ge=0, le=365, description="压缩早于该天数的日志分段"),
+    max_total_mb: Optional[float] = Query(default=None, gt=0, description="日志总大小上限（MB），超出时删除最旧的分段")
+):
     """
     清理旧日志
     
-    删除指定天数之前的日志记录
+    按整个日志分段删除指定天数之前的日志，可选压缩较旧的分段和限制总大小
     """
     try:
-        log_manager.clear_old_logs(days=days)
-        
-        logger.info(f"清理了 {days} 天前的日志")
-        return {"message": f"成功清理 {days} 天前的日志"}
+        result = await run_in_threadpool(
+            log_manager.clear_old_logs,
+            days=days,
+            compress_after_days=compress_after_days,
+            max_total_mb=max_total_mb
+        )
         
+        return {"message": f"成功清理 {days} 天前的日志", **result}
+    
     except Exception as e:
         logger.error(f"清理日志失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -161,56 +202,79 @@ async def clear_old_logs(days: int = Query(default=7, ge=1, le=365, description=
 @router.get("/export")
 async def export_logs(
     format_type: str = Query(default="json", description="导出格式: json 或 txt"),
-    limit: int = Query(default=1000, ge=1, le=10000, description="导出日志数量"),
-    level: Optional[str] = Query(default=None, description="日志级别过滤")
+    limit: Optional[int] = Query(default=None, ge=1, description="导出日志数量上限，为空表示不限"),
+    level: Optional[str] = Query(default=None, description="日志级别过滤"),
+    start_time: Optional[str] = Query(default=None, description="开始时间 (ISO格式)"),
+    end_time: Optional[str] = Query(default=None, description="结束时间 (ISO格式)"),
+    search: Optional[str] = Query(default=None, description="搜索关键词"),
+    compress: bool = Query(default=False, description="是否 gzip 压缩")
 ):
     """
     导出日志
     
-    支持 JSON 和文本格式导出
+    按时间顺序流式导出（逐个分段读取，不整体载入内存），
+    支持 JSON 和文本格式，可选 gzip 压缩
     """
-    try:
-        # 获取日志
-        logs = log_manager.get_logs(limit=limit, level=level)
-        
-        if format_type.lower() == "json":
-            from fastapi.responses import JSONResponse
-            import json
-            
-            # 返回 JSON 格式
-            return JSONResponse(
-                content=logs,
-                headers={
-                    "Content-Disposition": f"attachment; filename=strm_linker_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                }
-            )
-            
-        elif format_type.lower() == "txt":
-            from fastapi.responses import PlainTextResponse
-            
-            # 转换为文本格式
-            text_lines = []
-            for log in logs:
-                line = f"[{log.get('asctime', '')}] {log.get('levelname', '')} {log.get('name', '')} - {log.get('message', '')}"
-                text_lines.append(line)
-            
-            text_content = '\n'.join(text_lines)
-            
-            return PlainTextResponse(
-                content=text_content,
-                headers={
-                    "Content-Disposition": f"attachment; filename=strm_linker_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                }
-            )
+    format_type = format_type.lower()
+    if format_type not in ("json", "txt"):
+        raise HTTPException(status_code=400, detail="不支持的导出格式，支持: json, txt")
+    
+    _validate_level(level)
+    start_dt = _parse_time(start_time, "开始时间")
+    end_dt = _parse_time(end_time, "结束时间")
+    
+    def render() -> Iterator[str]:
+        """逐条渲染导出内容"""
+        entries = log_manager.iter_logs(level=level, search=search, start_time=start_dt, end_time=end_dt)
+        if limit:
+            entries = itertools.islice(entries, limit)
         
+        if format_type == "json":
+            yield "["
+            for index, (line, _) in enumerate(entries):
+                yield ("\n" if index == 0 else ",\n") + line
+            yield "\n]\n"
         else:
-            raise HTTPException(status_code=400, detail="不支持的导出格式，支持: json, txt")
+            for _, log in entries:
+                yield f"[{log.get('asctime', '')}] {log.get('levelname', '')} {log.get('name', '')} - {log.get('message', '')}\n"
+    
+    def stream() -> Iterator[bytes]:
+        """按块输出，压缩时边生成边压缩"""
+        compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31 输出 gzip 格式
+        buffer = []
+        buffered = 0
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"导出日志失败: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        try:
+            for text in render():
+                buffer.append(text)
+                buffered += len(text)
+                if buffered >= EXPORT_CHUNK_SIZE:
+                    data = "".join(buffer).encode("utf-8")
+                    buffer, buffered = [], 0
+                    data = compressor.compress(data) if compressor else data
+                    if data:
+                        yield data
+        except Exception as e:
+            logger.error(f"导出日志失败: {e}")
+            raise
+        
+        data = "".join(buffer).encode("utf-8")
+        if compressor:
+            data = compressor.compress(data) + compressor.flush()
+        if data:
+            yield data
+    
+    filename = f"strm_linker_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format_type}"
+    if compress:
+        filename += ".gz"
+    
+    return StreamingResponse(
+        stream(),
+        media_type="application/gzip" if compress else (
+            "application/json" if format_type == "json" else "text/plain; charset=utf-8"
+        ),
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 @router.post("/test")
 async def test_logging():
@@ -229,7 +293,7 @@ async def test_logging():
         test_logger.critical("这是一条严重日志")
         
         return {"message": "测试日志已生成"}
-        
+    
     except Exception as e:
         logger.error(f"生成测试日志失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
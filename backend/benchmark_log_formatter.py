@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+日志格式化器性能测试脚本
+对比 pythonjsonlogger.JsonFormatter 与 FastJsonFormatter 每秒可格式化的日志条数
+
+用法: python benchmark_log_formatter.py [--records 200000] [--rounds 5]
+"""
+
+import argparse
+import json
+import logging
+import time
+
+from pythonjsonlogger import jsonlogger
+from services.log_format import FastJsonFormatter
+from services.log_segments import parse_log_time
+
+def make_records(count: int):
+    """生成与扫描日志相似的测试记录"""
+    records = []
+    for i in range(count):
+        record = logging.LogRecord(
+            name="services.scanner",
+            level=logging.INFO,
+            pathname=__file__,
+            lineno=0,
+            msg="创建元数据软链接: /media/tv/绝命毒师/Season 1/绝命毒师.S01E%02d.(mp4).nfo -> 绝命毒师.S01E%02d.nfo",
+            args=(i % 100, i % 100),
+            exc_info=None
+        )
+        # 日志监听线程拿到的记录已由 QueueHandler 合并参数
+        record.msg = record.getMessage()
+        record.args = None
+        records.append(record)
+    return records
+
+def benchmark(formatter: logging.Formatter, records, rounds: int) -> float:
+    """返回最好一轮的每秒格式化条数"""
+    best = 0.0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for record in records:
+            formatter.format(record)
+        elapsed = time.perf_counter() - started
+        best = max(best, len(records) / elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="日志格式化器性能测试")
+    parser.add_argument("--records", type=int, default=200000, help="每轮格式化的日志条数")
+    parser.add_argument("--rounds", type=int, default=5, help="测试轮数（取最好一轮）")
+    args = parser.parse_args()
+    
+    records = make_records(args.records)
+    formatters = {
+        "JsonFormatter": jsonlogger.JsonFormatter("%(asctime)s %(name)s %(levelname)s %(message)s"),
+        "FastJsonFormatter": FastJsonFormatter()
+    }
+    
+    # 两种输出字段一致，且时间戳都能被 get_logs 解析
+    for name, formatter in formatters.items():
+        entry = json.loads(formatter.format(records[0]))
+        assert set(entry) == {"asctime", "name", "levelname", "message"}, name
+        assert parse_log_time(entry["asctime"]) is not None, name
+    
+    print(f"📊 格式化 {args.records} 条日志，{args.rounds} 轮取最好成绩:")
+    results = {}
+    for name, formatter in formatters.items():
+        results[name] = benchmark(formatter, records, args.rounds)
+        print(f"  - {name:<18} {results[name]:>12,.0f} 条/秒")
+    
+    print(f"\n✅ FastJsonFormatter 提速 {results['FastJsonFormatter'] / results['JsonFormatter']:.1f} 倍")
+
+if __name__ == "__main__":
+    main()
@@ -16,9 +16,13 @@ import uvicorn
 sys.path.append(str(Path(__file__).parent))
 
 from api import config, logs, browse
-from services.logger import setup_logging
+from services.logger import setup_logging, log_manager
 from services.scheduler import SchedulerService
 from services.watcher import WatcherService
+from services.work_scheduler import work_scheduler
+from services.fs_guard import fs_guard
+from services.log_tail import log_tail
+from services.dir_summary import dir_summary
 
 # 设置日志
 logger = setup_logging()
@@ -57,8 +61,9 @@ async def startup_event():
     
     logger.info("启动 STRM Linker 服务...")
     
-    # 初始化定时任务服务
+    # 初始化定时任务服务，并恢复持久化的任务
     scheduler_service = SchedulerService()
+    scheduler_service.start()
     
     # 初始化文件监听服务
     watcher_service = WatcherService()
@@ -77,11 +82,16 @@ async def shutdown_event():
     
     if scheduler_service:
         scheduler_service.stop()
+        scheduler_service.events.close()
     
     if watcher_service:
         watcher_service.stop()
+        watcher_service.events.close()
+    
+    work_scheduler.shutdown()
     
     logger.info("服务已关闭")
+    log_manager.shutdown()
 
 # 静态文件服务（Vue 前端）
 frontend_dist = Path(__file__).parent.parent / "frontend" / "dist"
@@ -115,13 +125,27 @@ else:
 @app.get("/api/health")
 async def health_check():
     """健康检查"""
+    # 熔断中的挂载点（如失效的 NFS 共享）视为降级
+    unhealthy_mounts = fs_guard.get_unhealthy_mounts()
+    
     return {
-        "status": "healthy",
+        "status": "degraded" if unhealthy_mounts else "healthy",
         "version": "1.0.0",
         "services": {
             "scheduler": scheduler_service.get_running_status() if scheduler_service else False,
             "watcher": watcher_service.get_running_status() if watcher_service else False
-        }
+        },
+        "work_queue": work_scheduler.get_status(),
+        "mounts": {
+            "unhealthy": unhealthy_mounts,
+            "all": fs_guard.get_status()
+        },
+        "events": {
+            "scheduler": scheduler_service.events.get_stats() if scheduler_service else None,
+            "watcher": watcher_service.events.get_stats() if watcher_service else None
+        },
+        "log_tail": log_tail.get_stats(),
+        "dir_summary": dir_summary.get_status()
     }
 
 if __name__ == "__main__":
@@ -10,9 +10,16 @@ from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 from services.logger import get_logger
+from services.shared_scan import find_overlaps
 
 logger = get_logger(__name__)
 
+# 后续版本新增的配置字段及默认值，加载旧配置时补齐
+CONFIG_FIELD_DEFAULTS = {
+    "ops_per_second": None,  # 每秒文件系统操作数上限，None 或 0 表示不限
+    "adaptive_throttle": False  # 是否根据存储延迟自动退避
+}
+
 class ConfigManager:
     """配置管理器"""
     
@@ -33,6 +40,9 @@ class ConfigManager:
             if self.config_file.exists():
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     self.configs = json.load(f)
+                for config in self.configs.values():
+                    for key, default in CONFIG_FIELD_DEFAULTS.items():
+                        config.setdefault(key, default)
                 logger.info(f"加载了 {len(self.configs)} 个扫描配置")
             else:
                 self.configs = {}
@@ -64,6 +74,8 @@ class ConfigManager:
             "recursive": config_data.get("recursive", True),
             "custom_video_extensions": config_data.get("custom_video_extensions", []),
             "custom_metadata_extensions": config_data.get("custom_metadata_extensions", []),
+            "ops_per_second": config_data.get("ops_per_second"),
+            "adaptive_throttle": config_data.get("adaptive_throttle", False),
             "created_at": now,
             "updated_at": now
         }
@@ -113,6 +125,17 @@ class ConfigManager:
         logger.info(f"删除扫描配置: {config_name} (ID: {config_id})")
         return True
     
+    def get_overlapping_configs(self) -> List[Dict[str, Any]]:
+        """查找扫描目录互相嵌套的配置（同时执行时可合并为一次遍历）"""
+        return find_overlaps([
+            {
+                "id": config_id,
+                "directory": config["directory"],
+                "recursive": config.get("recursive", True)
+            }
+            for config_id, config in self.configs.items()
+        ])
+    
     def get_config_by_name(self, name: str) -> Optional[Dict[str, Any]]:
         """根据名称获取配置"""
         for config in self.configs.values():
@@ -0,0 +1,24 @@
+"""
+存储设备识别工具
+按文件系统设备 (st_dev) 对路径分组，供 I/O 调度使用
+"""
+
+import os
+from typing import Optional
+
+from services.fs_guard import fs_guard
+
+def get_device_id(path: str) -> Optional[int]:
+    """获取路径所在的文件系统设备号（经挂载点保护），路径不可访问或挂载点失效时返回 None"""
+    try:
+        return fs_guard.call(path, os.stat, path, description=f"获取设备号 {path}").st_dev
+    except OSError:
+        return None
+
+def device_label(device: Optional[int]) -> str:
+    """设备号的可读形式 (major:minor)"""
+    if device is None:
+        return "unknown"
+    if hasattr(os, "major"):
+        return f"{os.major(device)}:{os.minor(device)}"
+    return str(device)
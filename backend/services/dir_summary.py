@@ -0,0 +1,549 @@
+"""
+目录摘要索引模块
+缓存每个目录递归统计的 .strm 文件数以及已链接/未链接的元数据文件数，
+目录浏览、搜索和路径补全直接查表，不再每次递归遍历整个媒体库。
+扫描完成和监听事件只重新列举受影响的目录，其余变化由过期后的后台刷新兜底
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from services.logger import get_logger
+from services.fs_guard import fs_guard, FsTimeoutError, MountUnavailableError
+from services.scanner import StrmScanner
+
+logger = get_logger(__name__)
+
+# 摘要过期时间（秒），过期后查询仍返回旧值，同时在后台刷新
+DEFAULT_TTL = 600
+
+# 监听事件触发的重新列举延迟（秒），合并同一目录的连续事件
+INVALIDATE_DELAY = 2.0
+
+# 单次递归刷新最多列举的目录数，超过时放弃（如浏览根目录 /），改为分别索引各子目录
+MAX_WALK_DIRECTORIES = 200000
+
+# 索引持久化的最小间隔（秒）
+SAVE_INTERVAL = 30.0
+
+# 计数字段：.strm 文件、已链接的元数据文件、未链接的元数据文件
+COUNT_FIELDS = ("strm_count", "linked_sidecars", "unlinked_sidecars")
+
+def _list_entries(path: str) -> List[Tuple[str, bool, bool]]:
+    """列举目录，返回 [(名称, 是否目录, 是否软链接)]，不跟随软链接"""
+    with os.scandir(path) as it:
+        entries = []
+        for entry in it:
+            try:
+                entries.append((entry.name, entry.is_dir(follow_symlinks=False), entry.is_symlink()))
+            except OSError:
+                continue
+        return entries
+
+class DirSummary:
+    """单个目录的摘要：自身计数、递归计数和子目录"""
+    
+    __slots__ = ("own", "total", "children", "refreshed_at")
+    
+    def __init__(self, own: Tuple[int, int, int], children: Iterable[str], refreshed_at: float):
+        self.own = own
+        self.total = list(own)
+        self.children = set(children)
+        self.refreshed_at = refreshed_at  # 最近一次递归刷新覆盖该目录的时间
+    
+    def to_dict(self) -> Dict[str, object]:
+        summary = dict(zip(COUNT_FIELDS, self.total))
+        summary["has_strm_files"] = self.total[0] > 0
+        summary["refreshed_at"] = self.refreshed_at
+        return summary
+
+class DirectorySummaryIndex:
+    """目录摘要索引（后台线程负责列举目录）"""
+    
+    def __init__(self, index_file: str = "configs/dir_summary.json", ttl: float = DEFAULT_TTL):
+        self.index_file = index_file
+        self.ttl = ttl
+        self.scanner = StrmScanner()  # 提供 .strm 匹配规则和基础扩展名，启动后替换为全局扫描器
+        self._extra_video: Set[str] = set()  # 扫描任务、扫描配置登记的自定义扩展名
+        self._extra_metadata: Set[str] = set()
+        self._cond = threading.Condition()
+        self._nodes: Dict[str, DirSummary] = {}  # 已索引的目录，其整个子树都在索引中
+        self._pending: Dict[str, Tuple[bool, float]] = {}  # 目录 -> (是否递归刷新, 执行时间)
+        self._oversized: Dict[str, float] = {}  # 目录过多放弃递归刷新的目录 -> 放弃时间
+        self._walking: Optional[str] = None  # 正在递归刷新的目录
+        self._worker: Optional[threading.Thread] = None
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._load()
+    
+    # ---------- 查询 ----------
+    
+    def lookup(self, path: str) -> Optional[Dict[str, object]]:
+        """查询目录的递归摘要，未索引时返回 None"""
+        path = os.path.normpath(path)
+        with self._cond:
+            node = self._nodes.get(path)
+            return node.to_dict() if node else None
+    
+    def prepare(self, root: str, wait: float = 0.0) -> bool:
+        """
+        确保 root 的子树已被索引（浏览、搜索前调用）
+        
+        未索引时安排递归刷新并最多等待 wait 秒；已索引但过期时在后台刷新，不等待；
+        root 过大无法整体索引时改为分别索引其子目录
+        
+        Returns:
+            root 是否已在索引中
+        """
+        root = os.path.normpath(root)
+        deadline = time.monotonic() + wait
+        with self._cond:
+            node = self._nodes.get(root)
+            if node is not None:
+                if time.time() - node.refreshed_at > self.ttl:
+                    self._request_locked(root, True)
+                return True
+            
+            if not self._is_oversized_locked(root):
+                if root != self._walking:
+                    self._request_locked(root, True)
+                self._cond.wait_for(
+                    lambda: root in self._nodes or root in self._oversized,
+                    timeout=max(0.0, deadline - time.monotonic())
+                )
+                if root in self._nodes:
+                    return True
+                if root not in self._oversized:
+                    return False
+        
+        # 子树过大：分别索引各子目录
+        try:
+            entries = fs_guard.call(root, _list_entries, root, description=f"列举目录 {root}")
+        except OSError:
+            return False
+        children = [name for name, is_dir, _ in entries if is_dir]
+        with self._cond:
+            for name in children:
+                child = os.path.join(root, name)
+                if child not in self._nodes and child != self._walking and not self._is_oversized_locked(child):
+                    self._request_locked(child, True)
+            self._cond.wait_for(
+                lambda: all(os.path.join(root, name) in self._nodes for name in children),
+                timeout=max(0.0, deadline - time.monotonic())
+            )
+        return False
+    
+    def get_status(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                "directories": len(self._nodes),
+                "pending": len(self._pending),
+                "oversized": sorted(self._oversized),
+                "ttl": self.ttl
+            }
+    
+    # ---------- 更新 ----------
+    
+    def use_scanner(self, scanner: StrmScanner):
+        """
+        使用全局扫描器的扩展名集合（共享同一集合对象），
+        运行时通过接口添加的扩展名直接生效
+        """
+        with self._cond:
+            self.scanner = scanner
+    
+    def register_extensions(self, scanner: StrmScanner):
+        """
+        登记扫描器的扩展名（任务、扫描配置的自定义扩展名），摘要按所有已登记的扩展名统计
+        
+        出现新的扩展名时已有摘要全部视为过期：随后的扫描会重新列举其处理过的目录，
+        其余目录在下次查询时后台刷新
+        """
+        with self._cond:
+            video, metadata = self._extensions_locked()
+            new_video = scanner.video_extensions - video
+            new_metadata = scanner.metadata_extensions - metadata
+            if not new_video and not new_metadata:
+                return
+            
+            self._extra_video |= new_video
+            self._extra_metadata |= new_metadata
+            self._expire_locked()
+        logger.info(f"目录摘要登记新扩展名: {', '.join(sorted(new_video | new_metadata))}")
+    
+    def expire(self):
+        """扩展名变化后把所有摘要标记为过期，下次查询时在后台重新统计"""
+        with self._cond:
+            self._expire_locked()
+    
+    def _expire_locked(self):
+        for node in self._nodes.values():
+            node.refreshed_at = 0.0
+        self._dirty = True
+    
+    def _extensions_locked(self) -> Tuple[Set[str], Set[str]]:
+        """当前统计使用的 (视频扩展名, 元数据扩展名)"""
+        return (
+            self.scanner.video_extensions | self._extra_video,
+            self.scanner.metadata_extensions | self._extra_metadata
+        )
+    
+    def invalidate(self, directory: str, recursive: bool = False):
+        """
+        目录内容发生变化（监听事件），延迟后重新列举该目录
+        
+        只处理已索引的目录及已索引目录下新建的子目录
+        """
+        directory = os.path.normpath(directory)
+        with self._cond:
+            if directory in self._nodes or os.path.dirname(directory) in self._nodes:
+                self._request_locked(directory, recursive, INVALIDATE_DELAY)
+    
+    def apply_scan_result(self, result: Dict):
+        """
+        扫描完成后更新摘要：重新列举包含已处理 .strm 文件的目录，
+        扫描根目录尚未索引时安排整体索引
+        """
+        directory = result.get("directory")
+        if not directory:
+            return
+        directory = os.path.normpath(directory)
+        
+        with self._cond:
+            if directory not in self._nodes:
+                # 目录过多已放弃整体索引的根目录不再重复尝试
+                if directory != self._walking and not self._is_oversized_locked(directory):
+                    self._request_locked(directory, True)
+                return
+            
+            touched = {os.path.dirname(detail["file"]) for detail in result.get("details", [])}
+            touched.update(os.path.dirname(error["file"]) for error in result.get("errors", []))
+            for path in touched:
+                if path in self._nodes:
+                    self._request_locked(path, False)
+    
+    def _request_locked(self, path: str, recursive: bool, delay: float = 0.0):
+        """安排刷新（需持有锁）；同一目录的请求合并，保留较早的执行时间"""
+        due = time.monotonic() + delay
+        previous = self._pending.get(path)
+        if previous:
+            recursive = recursive or previous[0]
+            due = min(due, previous[1])
+        self._pending[path] = (recursive, due)
+        
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="DirSummary", daemon=True)
+            self._worker.start()
+        self._cond.notify_all()
+    
+    def _is_oversized_locked(self, path: str) -> bool:
+        gave_up = self._oversized.get(path)
+        if gave_up is None:
+            return False
+        if time.time() - gave_up > self.ttl:
+            del self._oversized[path]
+            return False
+        return True
+    
+    # ---------- 后台刷新 ----------
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                item = self._next_locked()
+                save = item is None and self._save_due_locked()
+            if save:
+                self._save()
+            if item is None:
+                continue
+            
+            path, recursive = item
+            if recursive:
+                with self._cond:
+                    self._walking = path
+            try:
+                if recursive:
+                    self._refresh_tree(path)
+                else:
+                    self._refresh_directory(path)
+            except Exception as e:
+                logger.error(f"刷新目录摘要失败: {path}: {e}")
+            
+            with self._cond:
+                self._walking = None
+                self._cond.notify_all()
+    
+    def _next_locked(self) -> Optional[Tuple[str, bool]]:
+        """取出最早到期的请求；没有到期请求时等待，索引需要保存时立即返回 None"""
+        now = time.monotonic()
+        if self._pending:
+            path, (recursive, due) = min(self._pending.items(), key=lambda item: item[1][1])
+            if due <= now:
+                del self._pending[path]
+                return path, recursive
+            timeout = due - now
+        else:
+            timeout = None
+        
+        if self._dirty:
+            save_at = self._last_save + SAVE_INTERVAL
+            if save_at <= now:
+                return None
+            timeout = min(timeout, save_at - now) if timeout is not None else save_at - now
+        
+        self._cond.wait(timeout)
+        return None
+    
+    def _save_due_locked(self) -> bool:
+        return self._dirty and time.monotonic() - self._last_save >= SAVE_INTERVAL
+    
+    def _is_dir(self, path: str) -> Optional[bool]:
+        """经挂载点保护判断目录是否存在，挂载点超时或熔断时返回 None"""
+        try:
+            return fs_guard.call(path, os.path.isdir, path, description=f"检查目录 {path}")
+        except (FsTimeoutError, MountUnavailableError) as e:
+            logger.warning(f"目录摘要刷新中止: {e}")
+            return None
+    
+    def _summarize(
+        self,
+        entries: List[Tuple[str, bool, bool]],
+        extensions: Tuple[Set[str], Set[str]]
+    ) -> Tuple[Tuple[int, int, int], List[str]]:
+        """
+        由目录列举结果计算自身计数
+        
+        与扫描器的规则一致：xxx.(mp4).strm 对应的元数据文件 xxx.nfo
+        存在软链接 xxx.(mp4).nfo 时为已链接，否则为未链接
+        """
+        video_extensions, metadata_extensions = extensions
+        files: Dict[str, bool] = {}
+        children = []
+        for name, is_dir, is_symlink in entries:
+            if is_dir:
+                children.append(name)
+            else:
+                files[name] = is_symlink
+        
+        strm = linked = unlinked = 0
+        pattern = self.scanner.strm_pattern
+        for name in files:
+            if not name.endswith('.strm'):
+                continue
+            match = pattern.match(name)
+            if not match or f'.{match.group(2).lower()}' not in video_extensions:
+                continue
+            
+            strm += 1
+            base_name, video_ext = match.groups()
+            for metadata_ext in metadata_extensions:
+                if base_name + metadata_ext not in files:
+                    continue
+                if files.get(f"{base_name}.({video_ext}){metadata_ext}"):
+                    linked += 1
+                else:
+                    unlinked += 1
+        
+        return (strm, linked, unlinked), children
+    
+    def _walk(self, root: str) -> Optional[Dict[str, DirSummary]]:
+        """
+        列举整个子树并计算递归计数
+        
+        挂载点超时或熔断、目录数超过上限时返回 None（保留旧的摘要）
+        """
+        refreshed_at = time.time()
+        with self._cond:
+            extensions = self._extensions_locked()
+        nodes: Dict[str, DirSummary] = {}
+        order = []
+        stack = [root]
+        
+        while stack:
+            path = stack.pop()
+            try:
+                entries = fs_guard.call(path, _list_entries, path, description=f"列举目录 {path}")
+            except (FsTimeoutError, MountUnavailableError) as e:
+                logger.warning(f"目录摘要刷新中止: {e}")
+                return None
+            except OSError:
+                # 无权限或已删除的目录按空目录计
+                entries = []
+            
+            own, children = self._summarize(entries, extensions)
+            nodes[path] = DirSummary(own, children, refreshed_at)
+            order.append(path)
+            if len(nodes) > MAX_WALK_DIRECTORIES:
+                with self._cond:
+                    self._oversized[root] = time.time()
+                logger.info(f"目录过多，不整体索引: {root}")
+                return None
+            stack.extend(os.path.join(path, name) for name in children)
+        
+        # 先序遍历的逆序保证子目录先于父目录累加
+        for path in reversed(order):
+            node = nodes[path]
+            for name in node.children:
+                child_total = nodes[os.path.join(path, name)].total
+                for i in range(len(COUNT_FIELDS)):
+                    node.total[i] += child_total[i]
+        
+        return nodes
+    
+    def _refresh_tree(self, root: str):
+        """递归刷新 root 的整个子树"""
+        is_dir = self._is_dir(root)
+        if is_dir is None:
+            return
+        if not is_dir:
+            # 目录已被删除
+            with self._cond:
+                self._drop_locked(root)
+            return
+        
+        started = time.monotonic()
+        nodes = self._walk(root)
+        if nodes is None:
+            return
+        
+        with self._cond:
+            old_total = self._remove_subtree_locked(root)
+            self._nodes.update(nodes)
+            self._propagate_locked(root, [new - old for new, old in zip(nodes[root].total, old_total)])
+            self._oversized.pop(root, None)
+            self._dirty = True
+        
+        logger.debug(f"刷新目录摘要: {root}, {len(nodes)} 个目录, 耗时 {time.monotonic() - started:.2f}秒")
+    
+    def _refresh_directory(self, path: str):
+        """重新列举单个目录：更新自身计数，移除已删除的子目录，新建的子目录递归索引"""
+        with self._cond:
+            indexed = path in self._nodes
+            if not indexed and os.path.dirname(path) not in self._nodes:
+                return
+            extensions = self._extensions_locked()
+        if not indexed:
+            # 已索引目录下新建的子目录
+            self._refresh_tree(path)
+            return
+        
+        try:
+            entries = fs_guard.call(path, _list_entries, path, description=f"列举目录 {path}")
+        except (FsTimeoutError, MountUnavailableError) as e:
+            logger.warning(f"目录摘要刷新中止: {e}")
+            return
+        except (FileNotFoundError, NotADirectoryError):
+            # 目录已被删除
+            with self._cond:
+                if path in self._nodes:
+                    self._drop_locked(path)
+            return
+        except OSError:
+            entries = []
+        
+        own, children = self._summarize(entries, extensions)
+        with self._cond:
+            node = self._nodes.get(path)
+            if node is None:
+                return
+            
+            delta = [new - old for new, old in zip(own, node.own)]
+            for name in node.children - set(children):
+                removed = self._remove_subtree_locked(os.path.join(path, name))
+                delta = [d - r for d, r in zip(delta, removed)]
+            added = set(children) - node.children
+            node.own = own
+            node.children &= set(children)
+            for i in range(len(COUNT_FIELDS)):
+                node.total[i] += delta[i]
+            self._propagate_locked(path, delta)
+            for name in added:
+                self._request_locked(os.path.join(path, name), True)
+            self._dirty = True
+    
+    def _drop_locked(self, root: str):
+        """已删除的目录：移除子树并从上级目录的计数中扣除"""
+        old_total = self._remove_subtree_locked(root)
+        self._propagate_locked(root, [-old for old in old_total])
+        parent = self._nodes.get(os.path.dirname(root))
+        if parent:
+            parent.children.discard(os.path.basename(root))
+        self._dirty = True
+    
+    def _remove_subtree_locked(self, root: str) -> List[int]:
+        """从索引中移除子树，返回其原递归计数"""
+        node = self._nodes.get(root)
+        if node is None:
+            return [0] * len(COUNT_FIELDS)
+        
+        total = list(node.total)
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            removed = self._nodes.pop(path, None)
+            if removed:
+                stack.extend(os.path.join(path, name) for name in removed.children)
+        return total
+    
+    def _propagate_locked(self, path: str, delta: List[int]):
+        """把 path 的递归计数变化累加到已索引的各级上级目录，并登记子目录关系"""
+        while True:
+            parent = os.path.dirname(path)
+            node = self._nodes.get(parent)
+            if parent == path or node is None:
+                return
+            node.children.add(os.path.basename(path))
+            for i in range(len(COUNT_FIELDS)):
+                node.total[i] += delta[i]
+            path = parent
+    
+    # ---------- 持久化 ----------
+    
+    def _load(self):
+        """载入持久化的索引，递归计数在载入时重新累加"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"加载目录摘要索引失败: {e}")
+            return
+        
+        nodes = {path: DirSummary(tuple(values[:3]), (), values[3]) for path, values in data.items()}
+        # 按深度从深到浅累加到父目录
+        for path in sorted(nodes, key=lambda p: p.count(os.sep), reverse=True):
+            parent = os.path.dirname(path)
+            if parent != path and parent in nodes:
+                parent_node = nodes[parent]
+                parent_node.children.add(os.path.basename(path))
+                for i in range(len(COUNT_FIELDS)):
+                    parent_node.total[i] += nodes[path].total[i]
+        self._nodes = nodes
+        logger.info(f"载入目录摘要索引: {len(nodes)} 个目录")
+    
+    def _save(self):
+        """保存索引：锁内只复制目录列表，序列化和写文件在锁外进行，不阻塞查询"""
+        with self._cond:
+            items = list(self._nodes.items())
+            self._dirty = False
+            self._last_save = time.monotonic()
+        
+        # own 和 refreshed_at 只会被整体替换，锁外读取得到的是某一时刻的完整值
+        data = {path: [*node.own, node.refreshed_at] for path, node in items}
+        temp = self.index_file + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.index_file) or ".", exist_ok=True)
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp, self.index_file)
+        except OSError as e:
+            logger.error(f"保存目录摘要索引失败: {e}")
+            with self._cond:
+                self._dirty = True
+
+# 全局目录摘要索引实例
+dir_summary = DirectorySummaryIndex()
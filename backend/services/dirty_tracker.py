@@ -0,0 +1,178 @@
+"""
+监听与定时任务协调模块
+记录文件监听服务已实时处理的目录树，以及需要补扫的脏目录，
+使定时任务只扫描监听服务未覆盖的部分
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+class DirtyTracker:
+    """监听覆盖范围与脏目录追踪器"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._coverage: Dict[str, float] = {}  # 递归监听根目录 -> 连续监听开始时间
+        self._extensions: Dict[str, Tuple[Set[str], Set[str]]] = {}  # 递归监听根目录 -> 监听服务的 (视频, 元数据) 扩展名
+        self._dirty: Dict[str, Tuple[bool, float]] = {}  # 目录 -> (是否整个子树需要补扫, 标记时间)
+        self._processed: Dict[str, int] = {}  # 递归监听根目录 -> 监听服务已处理的文件数
+    
+    @staticmethod
+    def _normalize(path: str) -> str:
+        return str(Path(path).resolve())
+    
+    @staticmethod
+    def _is_within(path: str, root: str) -> bool:
+        """判断 path 是否等于 root 或位于 root 之下"""
+        return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+    
+    def start_coverage(self, root: str, video_extensions: Set[str], metadata_extensions: Set[str]):
+        """
+        开始覆盖某个目录树
+        
+        只有递归监听才能保证目录树中所有新增的 .strm 文件都被处理，
+        选择性监听模式不应调用此方法
+        
+        Args:
+            root: 监听根目录
+            video_extensions: 监听服务处理的视频扩展名（传入扫描器的集合，运行时的修改同步生效）
+            metadata_extensions: 监听服务处理的元数据扩展名
+        """
+        root = self._normalize(root)
+        with self._lock:
+            self._coverage.setdefault(root, time.time())
+            self._extensions[root] = (video_extensions, metadata_extensions)
+            self._processed.setdefault(root, 0)
+        logger.info(f"监听服务开始覆盖目录: {root}")
+    
+    def stop_coverage(self, root: str):
+        """停止覆盖某个目录树，之后的定时任务需要全量扫描"""
+        root = self._normalize(root)
+        with self._lock:
+            self._coverage.pop(root, None)
+            self._extensions.pop(root, None)
+            self._processed.pop(root, None)
+        logger.info(f"监听服务停止覆盖目录: {root}")
+    
+    def stop_all_coverage(self):
+        """停止所有覆盖（监听服务停止时调用）"""
+        with self._lock:
+            self._coverage.clear()
+            self._extensions.clear()
+            self._processed.clear()
+    
+    def mark_processed(self, file_path: str):
+        """记录监听服务已成功处理的文件"""
+        file_path = self._normalize(file_path)
+        with self._lock:
+            for root in self._coverage:
+                if self._is_within(file_path, root):
+                    self._processed[root] += 1
+    
+    def mark_dirty(self, path: str, subtree: bool = False):
+        """
+        标记需要由定时任务补扫的目录
+        
+        Args:
+            path: 目录路径
+            subtree: 是否整个子树都需要补扫（如新移入的目录）
+        """
+        path = self._normalize(path)
+        with self._lock:
+            previous = self._dirty.get(path)
+            self._dirty[path] = (subtree or bool(previous and previous[0]), time.time())
+    
+    def plan_scan(
+        self,
+        directory: str,
+        recursive: bool,
+        last_run: Optional[float],
+        video_extensions: Set[str],
+        metadata_extensions: Set[str]
+    ) -> Optional[List[Tuple[str, bool]]]:
+        """
+        规划定时任务的扫描范围
+        
+        任务的扩展名必须都在监听服务的处理范围内：否则监听服务会跳过任务才识别的
+        .strm 文件或少建元数据链接，这些文件不会被标记为脏目录
+        
+        Args:
+            directory: 任务扫描目录
+            recursive: 任务是否递归扫描
+            last_run: 上次定时扫描的开始时间戳
+            video_extensions: 任务的视频扩展名
+            metadata_extensions: 任务的元数据扩展名
+        
+        Returns:
+            None 表示需要全量扫描；否则返回需要补扫的 (目录, 是否递归) 列表，
+            空列表表示监听服务已完整覆盖，无需扫描
+        """
+        if last_run is None:
+            return None
+        
+        directory = self._normalize(directory)
+        
+        with self._lock:
+            # 自上次扫描以来必须一直处于递归监听之下
+            roots = [
+                root for root, since in self._coverage.items()
+                if self._is_within(directory, root) and since <= last_run
+            ]
+            if not roots:
+                return None
+            
+            covered = any(
+                video_extensions <= self._extensions[root][0] and metadata_extensions <= self._extensions[root][1]
+                for root in roots
+            )
+            if not covered:
+                logger.info(f"任务使用了监听服务未处理的扩展名，需要全量扫描: {directory}")
+                return None
+            
+            plan = []
+            for path, (subtree, _) in sorted(self._dirty.items()):
+                if not self._is_within(path, directory):
+                    continue
+                if not recursive and path != directory:
+                    continue
+                # 已被上级递归补扫覆盖的目录无需重复扫描
+                if any(rec and self._is_within(path, planned) for planned, rec in plan):
+                    continue
+                plan.append((path, subtree and recursive))
+        
+        return plan
+    
+    def clear(self, directory: str, before: float, recursive: bool = True):
+        """清除定时任务已补扫的脏目录（保留扫描期间新标记的目录）"""
+        directory = self._normalize(directory)
+        with self._lock:
+            for path, (_, marked_at) in list(self._dirty.items()):
+                if marked_at >= before:
+                    continue
+                if path == directory or (recursive and self._is_within(path, directory)):
+                    del self._dirty[path]
+    
+    def get_status(self) -> Dict:
+        """获取覆盖状态"""
+        with self._lock:
+            return {
+                "covered_directories": [
+                    {
+                        "path": root,
+                        "since": since,
+                        "processed_files": self._processed.get(root, 0)
+                    }
+                    for root, since in self._coverage.items()
+                ],
+                "dirty_directories": len(self._dirty)
+            }
+
+# 全局协调实例
+dirty_tracker = DirtyTracker()
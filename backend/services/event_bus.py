@@ -0,0 +1,266 @@
+"""
+事件总线模块
+将监听服务和调度服务的事件异步分发给订阅者，
+慢订阅者不会阻塞文件处理线程
+"""
+
+import queue
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 订阅者队列满时的处理策略
+POLICY_DROP_OLDEST = "drop_oldest"  # 丢弃最旧的事件，保留最新状态
+POLICY_DROP_NEWEST = "drop_newest"  # 丢弃新到达的事件
+POLICY_BLOCK = "block"  # 背压：该订阅者的转交线程等待其消费（有超时），分发线程和其他订阅者不受影响
+SUBSCRIBER_POLICIES = (POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_BLOCK)
+
+class _Subscription:
+    """
+    单个订阅者：独立的有界队列和投递线程
+    
+    block 策略另有转交线程：分发线程只把事件放入订阅者的有界收件箱（满时丢弃），
+    由转交线程等待投递队列出现空位，慢订阅者不会拖住其他订阅者
+    """
+    
+    def __init__(self, bus_name: str, callback: Callable, policy: str, max_queue_size: int, block_timeout: float):
+        self.callback = callback
+        self.policy = policy
+        self.max_queue_size = max(1, max_queue_size)
+        self.block_timeout = block_timeout
+        self.delivered = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        name = f"EventBus-{bus_name}-{getattr(callback, '__name__', 'callback')}"
+        self._thread = threading.Thread(target=self._deliver_loop, name=name, daemon=True)
+        self._thread.start()
+        
+        self._inbox: Optional[queue.Queue] = None
+        self._handoff: Optional[threading.Thread] = None
+        if policy == POLICY_BLOCK:
+            self._inbox = queue.Queue(maxsize=self.max_queue_size)
+            self._handoff = threading.Thread(target=self._handoff_loop, name=f"{name}-handoff", daemon=True)
+            self._handoff.start()
+    
+    def offer(self, event: Dict[str, Any]):
+        """按订阅策略放入事件（在分发线程中调用，从不等待）"""
+        if self._inbox is not None:
+            try:
+                self._inbox.put_nowait(event)
+            except queue.Full:
+                with self._cond:
+                    self.dropped += 1
+            return
+        
+        with self._cond:
+            if len(self._queue) >= self.max_queue_size:
+                if self.policy == POLICY_DROP_NEWEST:
+                    self.dropped += 1
+                    return
+                self._queue.popleft()
+                self.dropped += 1
+            
+            self._queue.append(event)
+            self._cond.notify_all()
+    
+    def _handoff_loop(self):
+        """block 策略的转交线程：等待投递队列出现空位（有超时），超时后丢弃"""
+        while True:
+            event = self._inbox.get()
+            with self._cond:
+                if event is None or self._closed:
+                    return
+                has_space = self._cond.wait_for(
+                    lambda: len(self._queue) < self.max_queue_size or self._closed,
+                    timeout=self.block_timeout
+                )
+                if self._closed:
+                    return
+                if not has_space:
+                    self.dropped += 1
+                    continue
+                
+                self._queue.append(event)
+                self._cond.notify_all()
+    
+    def _deliver_loop(self):
+        """投递线程主循环"""
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._queue:
+                    return
+                event = self._queue.popleft()
+                self._cond.notify_all()
+            
+            try:
+                self.callback(event)
+                delivered = True
+            except Exception as e:
+                delivered = False
+                logger.error(f"回调函数执行失败: {e}")
+            
+            with self._cond:
+                if delivered:
+                    self.delivered += 1
+                else:
+                    self.failed += 1
+    
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._handoff is not None:
+            try:
+                # 唤醒等待收件箱的转交线程；收件箱已满时转交线程不会阻塞在 get 上
+                self._inbox.put_nowait(None)
+            except queue.Full:
+                pass
+            self._handoff.join(timeout=5)
+        self._thread.join(timeout=5)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = len(self._queue)
+            delivered, dropped, failed = self.delivered, self.dropped, self.failed
+        if self._inbox is not None:
+            queued += self._inbox.qsize()
+        return {
+            "callback": getattr(self.callback, "__name__", repr(self.callback)),
+            "policy": self.policy,
+            "queued": queued,
+            "max_queue_size": self.max_queue_size,
+            "delivered": delivered,
+            "dropped": dropped,
+            "failed": failed
+        }
+
+class EventBus:
+    """异步事件总线"""
+    
+    def __init__(self, name: str, max_queue_size: int = 1000):
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._subscriptions: List[_Subscription] = []
+        self._lock = threading.Lock()
+        self._dispatcher: Optional[threading.Thread] = None
+        self.published = 0
+        self.dropped = 0  # 总线队列已满而丢弃的事件
+    
+    def subscribe(
+        self,
+        callback: Callable,
+        policy: str = POLICY_DROP_OLDEST,
+        max_queue_size: int = 100,
+        block_timeout: float = 1.0
+    ):
+        """
+        订阅事件
+        
+        Args:
+            callback: 回调函数，接收事件字典
+            policy: 队列满时的处理策略 (drop_oldest, drop_newest, block)
+            max_queue_size: 订阅者队列容量
+            block_timeout: block 策略下转交线程等待队列空位的最长时间（秒），超时后丢弃
+        """
+        if policy not in SUBSCRIBER_POLICIES:
+            raise ValueError(f"不支持的订阅策略: {policy}")
+        
+        with self._lock:
+            if any(sub.callback == callback for sub in self._subscriptions):
+                return
+            self._subscriptions.append(
+                _Subscription(self.name, callback, policy, max_queue_size, block_timeout)
+            )
+            self._ensure_dispatcher()
+    
+    def unsubscribe(self, callback: Callable):
+        """取消订阅"""
+        with self._lock:
+            removed = [sub for sub in self._subscriptions if sub.callback == callback]
+            self._subscriptions = [sub for sub in self._subscriptions if sub.callback != callback]
+        
+        for sub in removed:
+            sub.close()
+    
+    def publish(self, event: Dict[str, Any]) -> bool:
+        """发布事件，从不阻塞；总线队列已满时丢弃并计数"""
+        if not self._subscriptions:
+            return True
+        
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        
+        # 多个线程同时发布，计数在锁内更新
+        with self._lock:
+            self.published += 1
+        return True
+    
+    def _ensure_dispatcher(self):
+        """按需启动分发线程（调用方需持有 self._lock）"""
+        if self._dispatcher and self._dispatcher.is_alive():
+            return
+        
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_loop,
+            name=f"EventBus-{self.name}",
+            daemon=True
+        )
+        self._dispatcher.start()
+    
+    def _dispatch_loop(self):
+        """分发线程：把总线事件扇出到各订阅者队列"""
+        while True:
+            event = self._queue.get()
+            if event is None:
+                return
+            
+            with self._lock:
+                subscriptions = list(self._subscriptions)
+            
+            for sub in subscriptions:
+                sub.offer(event)
+    
+    def close(self):
+        """停止分发并关闭所有订阅者"""
+        with self._lock:
+            subscriptions = self._subscriptions
+            self._subscriptions = []
+            dispatcher = self._dispatcher
+            self._dispatcher = None
+        
+        if dispatcher:
+            self._queue.put(None)
+            dispatcher.join(timeout=5)
+        
+        for sub in subscriptions:
+            sub.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取总线统计"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            published = self.published
+            dropped = self.dropped
+        subscriber_stats = [sub.get_stats() for sub in subscriptions]
+        
+        return {
+            "name": self.name,
+            "queued": self._queue.qsize(),
+            "published": published,
+            "dropped": dropped,
+            "subscribers": subscriber_stats,
+            "subscriber_dropped": sum(stats["dropped"] for stats in subscriber_stats)
+        }
@@ -0,0 +1,297 @@
+"""
+挂载点保护模块
+失效的 NFS/SMB 挂载会让目录列举、stat 和链接操作无限期阻塞。
+此模块为文件系统操作加上单次超时，并为每个挂载点维护熔断器：
+连续超时达到阈值后，在冷却期内直接跳过该挂载点并报告为不健康
+"""
+
+import errno
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 熔断器状态
+BREAKER_CLOSED = "closed"  # 正常
+BREAKER_OPEN = "open"  # 冷却中，直接拒绝操作
+BREAKER_HALF_OPEN = "half_open"  # 冷却结束，放行一次试探操作
+
+# 挂载表刷新间隔（秒）
+MOUNT_TABLE_TTL = 60
+
+class FsTimeoutError(OSError):
+    """文件系统操作超时"""
+    
+    def __init__(self, mount: str, description: str, timeout: float):
+        super().__init__(errno.ETIMEDOUT, f"文件系统操作超时 ({timeout} 秒): {description} [挂载点: {mount}]")
+        self.mount = mount
+
+class MountUnavailableError(OSError):
+    """挂载点熔断中，操作被跳过"""
+    
+    def __init__(self, mount: str, retry_at: float):
+        super().__init__(
+            errno.EIO,
+            f"挂载点暂不可用，已熔断至 {time.strftime('%H:%M:%S', time.localtime(retry_at))}: {mount}"
+        )
+        self.mount = mount
+
+def _load_mount_points() -> List[str]:
+    """读取挂载表（Linux），按长度倒序以便最长前缀匹配；不访问挂载的文件系统本身"""
+    try:
+        with open("/proc/self/mounts", "r", encoding="utf-8") as f:
+            mounts = {
+                line.split()[1].replace("\\040", " ")
+                for line in f
+                if len(line.split()) > 1
+            }
+    except OSError:
+        return []
+    return sorted(mounts, key=len, reverse=True)
+
+class _GuardedFuture(Future):
+    """记录操作何时被工作线程取走的 Future"""
+    
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+
+class _DaemonExecutor:
+    """
+    使用守护线程的线程池
+    
+    标准 ThreadPoolExecutor 的工作线程在解释器退出时会被 join，
+    卡死在失效挂载上的线程会让进程无法退出；守护线程不会
+    """
+    
+    def __init__(self, max_workers: int, thread_name_prefix: str):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._idle = threading.Semaphore(0)
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+    
+    def submit(self, fn: Callable, *args, **kwargs) -> _GuardedFuture:
+        future = _GuardedFuture()
+        self._queue.put((future, fn, args, kwargs))
+        
+        # 有空闲线程时复用，否则在上限内新建
+        if self._idle.acquire(blocking=False):
+            return future
+        with self._lock:
+            if len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._worker,
+                    name=f"{self.thread_name_prefix}_{len(self._threads)}",
+                    daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+        return future
+    
+    def _worker(self):
+        while True:
+            future, fn, args, kwargs = self._queue.get()
+            if future.set_running_or_notify_cancel():
+                future.started.set()
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            del future, fn, args, kwargs
+            self._idle.release()
+
+class _MountBreaker:
+    """单个挂载点的熔断器和操作线程池"""
+    
+    def __init__(self, mount: str, max_workers: int):
+        self.mount = mount
+        # 每个挂载点独立的线程池：卡死的线程只占用该挂载点的线程
+        self.executor = _DaemonExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"FsGuard-{os.path.basename(mount) or 'root'}"
+        )
+        self.state = BREAKER_CLOSED
+        self.probing = False  # 半开状态下是否已有试探操作在进行
+        self.consecutive_timeouts = 0
+        self.total_timeouts = 0
+        self.total_rejected = 0
+        self.open_until = 0.0
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[float] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "mount": self.mount,
+            "state": self.state,
+            "healthy": self.state == BREAKER_CLOSED,
+            "consecutive_timeouts": self.consecutive_timeouts,
+            "total_timeouts": self.total_timeouts,
+            "total_rejected": self.total_rejected,
+            "retry_at": self.open_until if self.state == BREAKER_OPEN else None,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at
+        }
+
+class FsGuard:
+    """文件系统操作超时与挂载点熔断"""
+    
+    def __init__(
+        self,
+        timeout: float = 10.0,
+        failure_threshold: int = 3,
+        cooldown: float = 300.0,
+        workers_per_mount: int = 8
+    ):
+        """
+        Args:
+            timeout: 单次文件系统操作的超时时间（秒）
+            failure_threshold: 连续超时多少次后熔断该挂载点
+            cooldown: 熔断冷却时间（秒），之后放行一次试探操作
+            workers_per_mount: 每个挂载点执行操作的线程数
+        """
+        self.timeout = timeout
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.workers_per_mount = workers_per_mount
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, _MountBreaker] = {}
+        self._mount_points: List[str] = []
+        self._mount_points_loaded = 0.0
+    
+    def mount_for(self, path: Any) -> str:
+        """按挂载表最长前缀匹配路径所在的挂载点（不访问文件系统）"""
+        path = os.path.abspath(str(path))
+        
+        now = time.monotonic()
+        if now - self._mount_points_loaded > MOUNT_TABLE_TTL:
+            self._mount_points = _load_mount_points()
+            self._mount_points_loaded = now
+        
+        for mount in self._mount_points:
+            if path == mount or path.startswith(mount.rstrip(os.sep) + os.sep):
+                return mount
+        
+        # 没有挂载表的平台（Windows 等）按盘符区分
+        return os.path.splitdrive(path)[0] or os.sep
+    
+    def _breaker(self, mount: str) -> _MountBreaker:
+        with self._lock:
+            breaker = self._breakers.get(mount)
+            if breaker is None:
+                breaker = _MountBreaker(mount, self.workers_per_mount)
+                self._breakers[mount] = breaker
+            return breaker
+    
+    def _admit(self, breaker: _MountBreaker) -> bool:
+        """检查熔断状态，熔断中时抛出 MountUnavailableError；返回本次操作是否为半开状态的试探"""
+        with self._lock:
+            if breaker.state == BREAKER_OPEN and time.time() >= breaker.open_until:
+                breaker.state = BREAKER_HALF_OPEN
+            
+            if breaker.state == BREAKER_HALF_OPEN and not breaker.probing:
+                # 冷却结束，只放行一次试探操作
+                breaker.probing = True
+                logger.info(f"挂载点冷却结束，试探恢复: {breaker.mount}")
+                return True
+            
+            if breaker.state != BREAKER_CLOSED:
+                breaker.total_rejected += 1
+                raise MountUnavailableError(breaker.mount, breaker.open_until)
+            return False
+    
+    def check(self, path: Any):
+        """路径所在挂载点熔断冷却中时抛出 MountUnavailableError（不占用试探机会）"""
+        breaker = self._breaker(self.mount_for(path))
+        with self._lock:
+            if breaker.state == BREAKER_OPEN and time.time() < breaker.open_until:
+                raise MountUnavailableError(breaker.mount, breaker.open_until)
+    
+    def call(self, path: Any, fn: Callable, *args, description: str = "", **kwargs) -> Any:
+        """
+        在超时保护下执行文件系统操作
+        
+        Args:
+            path: 操作涉及的路径，用于确定挂载点
+            fn: 操作函数
+            description: 操作描述（用于日志）
+        
+        超时从工作线程开始执行操作时计算；等待空闲线程的时间另外限制为同样的时长，
+        等待超时说明线程被之前卡死的操作占满，不计为挂载点的新故障
+        
+        Raises:
+            FsTimeoutError: 操作超时（执行线程会被放弃）或等待空闲线程超时
+            MountUnavailableError: 挂载点熔断中
+        """
+        breaker = self._breaker(self.mount_for(path))
+        probing = self._admit(breaker)
+        
+        future = breaker.executor.submit(fn, *args, **kwargs)
+        if not future.started.wait(self.timeout) and future.cancel():
+            if probing:
+                # 试探操作没有执行，放行下一次试探
+                with self._lock:
+                    breaker.probing = False
+            raise FsTimeoutError(breaker.mount, f"等待空闲线程: {description or path}", self.timeout)
+        
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self._record_timeout(breaker, description or f"{getattr(fn, '__name__', 'op')} {path}")
+            raise FsTimeoutError(breaker.mount, description or str(path), self.timeout)
+        finally:
+            # 操作有响应（包括抛出普通异常）说明挂载点可用
+            if future.done() and (breaker.state != BREAKER_CLOSED or breaker.consecutive_timeouts):
+                self._record_success(breaker)
+    
+    def _record_timeout(self, breaker: _MountBreaker, description: str):
+        with self._lock:
+            breaker.probing = False
+            breaker.consecutive_timeouts += 1
+            breaker.total_timeouts += 1
+            breaker.last_error = f"操作超时: {description}"
+            breaker.last_error_at = time.time()
+            
+            if breaker.state == BREAKER_HALF_OPEN or breaker.consecutive_timeouts >= self.failure_threshold:
+                breaker.state = BREAKER_OPEN
+                breaker.open_until = time.time() + self.cooldown
+                logger.error(
+                    f"挂载点连续 {breaker.consecutive_timeouts} 次操作超时，"
+                    f"熔断 {self.cooldown:.0f} 秒: {breaker.mount}"
+                )
+            else:
+                logger.warning(f"文件系统操作超时 ({self.timeout} 秒): {description}")
+    
+    def _record_success(self, breaker: _MountBreaker):
+        with self._lock:
+            if breaker.state == BREAKER_HALF_OPEN:
+                logger.info(f"挂载点已恢复: {breaker.mount}")
+            breaker.state = BREAKER_CLOSED
+            breaker.probing = False
+            breaker.consecutive_timeouts = 0
+    
+    def get_status(self) -> List[Dict[str, Any]]:
+        """获取各挂载点的熔断状态"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+            now = time.time()
+            for breaker in breakers:
+                if breaker.state == BREAKER_OPEN and now >= breaker.open_until:
+                    breaker.state = BREAKER_HALF_OPEN
+            return [breaker.to_dict() for breaker in breakers]
+    
+    def get_unhealthy_mounts(self) -> List[Dict[str, Any]]:
+        """获取不健康（熔断中或试探中）的挂载点"""
+        return [status for status in self.get_status() if not status["healthy"]]
+
+# 全局挂载点保护实例
+fs_guard = FsGuard()
@@ -0,0 +1,295 @@
+"""
+扫描 I/O 预算模块
+用令牌桶限制扫描对共享存储的每秒操作数（目录列举、stat、链接操作），
+避免与 Emby/Jellyfin 播放争抢 NAS 带宽；自适应模式根据实测延迟自动退避
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from services.logger import get_logger
+from services.devices import get_device_id, device_label
+from services.fs_guard import fs_guard
+
+logger = get_logger(__name__)
+
+class TokenBucket:
+    """线程安全的令牌桶"""
+    
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Args:
+            rate: 每秒补充的令牌数（即每秒允许的操作数）
+            burst: 桶容量，默认为 1 秒的令牌量
+        """
+        self._lock = threading.Lock()
+        self.rate = max(0.1, float(rate))
+        self.burst = float(burst) if burst else max(1.0, self.rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self.waited = 0.0  # 累计等待时间（秒）
+    
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def acquire(self, tokens: float = 1.0):
+        """获取令牌，不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+    
+    def record_latency(self, seconds: float):
+        """记录操作延迟（固定速率的令牌桶忽略）"""
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "rate": round(self.rate, 2),
+            "burst": self.burst,
+            "waited_seconds": round(self.waited, 3),
+            "adaptive": False
+        }
+
+class AdaptiveTokenBucket(TokenBucket):
+    """
+    自适应令牌桶
+    
+    以指数加权平均跟踪操作延迟：延迟超过目标时按比例降速（乘性减），
+    延迟正常时逐步提速（加性增），速率在 [min_rate, max_rate] 之间变化
+    """
+    
+    def __init__(
+        self,
+        max_rate: float,
+        min_rate: float = 5.0,
+        target_latency: float = 0.05,
+        adjust_interval: float = 1.0
+    ):
+        super().__init__(max_rate)
+        self.max_rate = self.rate
+        self.min_rate = min(max(0.1, min_rate), self.max_rate)
+        self.target_latency = target_latency
+        self.adjust_interval = adjust_interval
+        self.latency_ewma: Optional[float] = None
+        self._last_adjust = time.monotonic()
+    
+    def record_latency(self, seconds: float):
+        with self._lock:
+            if self.latency_ewma is None:
+                self.latency_ewma = seconds
+            else:
+                self.latency_ewma = self.latency_ewma * 0.9 + seconds * 0.1
+            
+            now = time.monotonic()
+            if now - self._last_adjust < self.adjust_interval:
+                return
+            self._last_adjust = now
+            
+            if self.latency_ewma > self.target_latency:
+                new_rate = max(self.min_rate, self.rate * 0.7)
+            else:
+                new_rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+            
+            if new_rate != self.rate:
+                self._refill(now)
+                self.rate = new_rate
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats.update({
+            "adaptive": True,
+            "max_rate": self.max_rate,
+            "min_rate": self.min_rate,
+            "target_latency": self.target_latency,
+            "latency_ewma": round(self.latency_ewma, 4) if self.latency_ewma is not None else None
+        })
+        return stats
+
+def create_bucket(ops_per_second: float, adaptive: bool = False) -> TokenBucket:
+    """按配置创建令牌桶"""
+    if adaptive:
+        return AdaptiveTokenBucket(ops_per_second)
+    return TokenBucket(ops_per_second)
+
+class IoThrottle:
+    """一次扫描的 I/O 节流器，同时受扫描配置预算和设备预算约束"""
+    
+    def __init__(self, buckets: List[TokenBucket]):
+        self.buckets = buckets
+        self.operations = 0
+    
+    @contextmanager
+    def op(self, count: int = 1):
+        """
+        包裹文件系统操作：先获取令牌，再记录实测延迟
+        
+        count 为一次调用中包含的操作数（如批量 stat），令牌按桶容量分批获取，
+        记录的延迟为单次操作的平均值
+        """
+        for bucket in self.buckets:
+            remaining = float(count)
+            while remaining > 0:
+                tokens = min(remaining, bucket.burst)
+                bucket.acquire(tokens)
+                remaining -= tokens
+        
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            latency = (time.monotonic() - started) / max(1, count)
+            self.operations += count
+            for bucket in self.buckets:
+                bucket.record_latency(latency)
+
+class IoBudgetRegistry:
+    """
+    设备级 I/O 预算注册表
+    
+    预算按路径保存，路径所在的设备号在首次需要时（扫描线程或线程池中）解析，
+    导入模块和启动服务时不访问文件系统；无法识别设备的路径在之后的调用中重试
+    """
+    
+    def __init__(self, config_file: str = "configs/io_budgets.json"):
+        self.config_file = Path(config_file)
+        self._lock = threading.Lock()
+        self._budgets: Dict[str, Dict[str, Any]] = {}  # 路径 -> {"ops_per_second", "adaptive"}
+        self._buckets: Dict[str, TokenBucket] = {}  # 路径 -> 令牌桶
+        self._devices: Dict[str, int] = {}  # 路径 -> 已解析的设备号
+        self._load()
+    
+    def _load(self):
+        """加载设备预算配置（按路径保存，设备号延迟解析）"""
+        try:
+            if self.config_file.exists():
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    self._budgets = json.load(f)
+        except Exception as e:
+            logger.error(f"加载 I/O 预算配置失败: {e}")
+            self._budgets = {}
+        
+        for path, budget in self._budgets.items():
+            self._buckets[path] = create_bucket(budget["ops_per_second"], budget.get("adaptive", False))
+    
+    def _save(self):
+        self.config_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.config_file, 'w', encoding='utf-8') as f:
+            json.dump(self._budgets, f, ensure_ascii=False, indent=2)
+    
+    def _resolve_devices(self) -> Dict[str, int]:
+        """解析尚未识别设备的预算路径（不持有锁访问文件系统），返回 路径 -> 设备号"""
+        with self._lock:
+            pending = [path for path in self._budgets if path not in self._devices]
+        
+        for path in pending:
+            device = get_device_id(path)
+            if device is None:
+                logger.warning(f"无法识别设备，I/O 预算暂不生效: {path}")
+                continue
+            with self._lock:
+                if path in self._budgets:
+                    self._devices[path] = device
+        
+        with self._lock:
+            return dict(self._devices)
+    
+    def set_device_budget(self, path: str, ops_per_second: Optional[float], adaptive: bool = False):
+        """
+        设置路径所在设备的 I/O 预算（访问文件系统，需在线程池或后台线程中调用）
+        
+        Args:
+            path: 设备上的任意路径（如媒体库根目录）
+            ops_per_second: 每秒操作数上限，None 表示取消限制
+            adaptive: 是否根据延迟自适应调整
+        """
+        path = fs_guard.call(path, os.path.realpath, path, description=f"解析路径 {path}")
+        device = get_device_id(path)
+        devices = self._resolve_devices()
+        
+        with self._lock:
+            # 同一设备只保留一个预算
+            same_device = [other for other, other_device in devices.items() if device is not None and other_device == device]
+            for other in same_device:
+                self._budgets.pop(other, None)
+                self._buckets.pop(other, None)
+                self._devices.pop(other, None)
+            
+            if ops_per_second:
+                budget = {"ops_per_second": ops_per_second, "adaptive": adaptive}
+                self._budgets[path] = budget
+                self._buckets[path] = create_bucket(ops_per_second, adaptive)
+                if device is not None:
+                    self._devices[path] = device
+            else:
+                self._budgets.pop(path, None)
+                self._buckets.pop(path, None)
+                self._devices.pop(path, None)
+            self._save()
+        
+        logger.info(f"设置设备 I/O 预算: {path} ({device_label(device)}) -> {ops_per_second or '不限'} ops/s")
+    
+    def throttle_for(
+        self,
+        path: str,
+        ops_per_second: Optional[float] = None,
+        adaptive: bool = False
+    ) -> Optional[IoThrottle]:
+        """
+        获取扫描路径的节流器（在扫描线程中调用）
+        
+        Args:
+            path: 扫描目录
+            ops_per_second: 扫描配置级的每秒操作数上限
+            adaptive: 扫描配置级预算是否自适应
+        
+        Returns:
+            没有任何预算时返回 None
+        """
+        buckets = []
+        if ops_per_second:
+            buckets.append(create_bucket(ops_per_second, adaptive))
+        
+        if self._budgets:
+            device = get_device_id(path)
+            devices = self._resolve_devices()
+            budget_path = next((p for p, d in devices.items() if device is not None and d == device), None)
+            with self._lock:
+                device_bucket = self._buckets.get(budget_path)
+            if device_bucket:
+                buckets.append(device_bucket)
+        
+        return IoThrottle(buckets) if buckets else None
+    
+    def get_status(self) -> List[Dict[str, Any]]:
+        """获取设备预算状态（解析设备号，需在线程池中调用）"""
+        devices = self._resolve_devices()
+        with self._lock:
+            budgets = dict(self._budgets)
+            buckets = dict(self._buckets)
+        
+        status = []
+        for path, budget in budgets.items():
+            bucket = buckets.get(path)
+            status.append({
+                "path": path,
+                "device": device_label(devices.get(path)),
+                "ops_per_second": budget["ops_per_second"],
+                "adaptive": budget.get("adaptive", False),
+                "bucket": bucket.get_stats() if bucket else None
+            })
+        return status
+
+# 全局设备预算实例
+io_budget = IoBudgetRegistry()
@@ -0,0 +1,51 @@
+"""
+结构化日志格式化模块
+固定字段布局的 JSON 格式化器，直接拼接字符串并使用 json 模块的 C 实现转义，
+时间戳为 get_logs 可直接解析的 ISO 格式
+"""
+
+import logging
+import time
+from json.encoder import encode_basestring
+from typing import Optional, Tuple
+
+class FastJsonFormatter(logging.Formatter):
+    """
+    快速 JSON 日志格式化器
+    
+    输出字段固定为 asctime、name、levelname、message（有异常时追加 exc_info），
+    与之前 JsonFormatter 的字段一致；中文不转义，文件更小
+    """
+    
+    def __init__(self):
+        super().__init__()
+        # 同一秒内的日志复用已格式化的时间前缀
+        self._time_cache: Tuple[int, str] = (-1, "")
+    
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        """格式化为本地时间 YYYY-MM-DD HH:MM:SS.mmm（ISO 8601）"""
+        seconds = int(record.created)
+        cached_seconds, prefix = self._time_cache
+        if seconds != cached_seconds:
+            prefix = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(seconds))
+            self._time_cache = (seconds, prefix)
+        return f"{prefix}.{int(record.msecs):03d}"
+    
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        line = (
+            '{"asctime": "' + self.formatTime(record)
+            + '", "name": ' + encode_basestring(record.name)
+            + ', "levelname": "' + record.levelname
+            + '", "message": ' + encode_basestring(message)
+        )
+        
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line += ', "exc_info": ' + encode_basestring(record.exc_text)
+        if record.stack_info:
+            line += ', "stack_info": ' + encode_basestring(self.formatStack(record.stack_info))
+        
+        return line + '}'
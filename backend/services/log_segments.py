@@ -0,0 +1,376 @@
+"""
+日志分段存储模块
+日志按大小和日期滚动为多个分段文件，每个分段带一个索引文件（时间范围、各级别条数），
+查询时按分段从新到旧、从文件末尾向前读取，凑够条数即停止，时间范围不重叠的分段直接跳过
+"""
+
+import gzip
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# 分段索引文件后缀（与分段文件同名）
+SEGMENT_INDEX_SUFFIX = ".idx"
+
+# 默认单个分段的最大字节数
+DEFAULT_MAX_SEGMENT_BYTES = 10 * 1024 * 1024
+
+# 压缩分段的后缀
+COMPRESSED_SUFFIX = ".gz"
+
+# 反向读取的块大小
+READ_BLOCK_SIZE = 64 * 1024
+
+def parse_log_time(asctime: str) -> Optional[float]:
+    """解析日志行的 asctime（本地时间）为时间戳，无法解析时返回 None"""
+    try:
+        return datetime.fromisoformat(asctime.replace('Z', '+00:00')).timestamp()
+    except (ValueError, AttributeError):
+        return None
+
+class SegmentIndex:
+    """单个分段的索引：时间范围、各级别条数和分段文件的字节数"""
+    
+    def __init__(
+        self,
+        path: Path,
+        first_time: Optional[float] = None,
+        last_time: Optional[float] = None,
+        levels: Optional[Dict[str, int]] = None,
+        count: int = 0,
+        size: int = 0
+    ):
+        self.path = path
+        self.first_time = first_time
+        self.last_time = last_time
+        self.levels = levels or {}
+        self.count = count
+        self.size = size
+    
+    def add(self, created: float, levelname: str, size: int):
+        """记录一条写入的日志"""
+        if self.first_time is None or created < self.first_time:
+            self.first_time = created
+        if self.last_time is None or created > self.last_time:
+            self.last_time = created
+        self.levels[levelname] = self.levels.get(levelname, 0) + 1
+        self.count += 1
+        self.size += size
+    
+    def overlaps(self, start: Optional[float], end: Optional[float]) -> bool:
+        """分段的时间范围是否与查询范围重叠"""
+        if self.count == 0:
+            return False
+        if start is not None and self.last_time < start:
+            return False
+        if end is not None and self.first_time > end:
+            return False
+        return True
+    
+    def copy(self) -> "SegmentIndex":
+        return SegmentIndex(self.path, self.first_time, self.last_time, dict(self.levels), self.count, self.size)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "file": self.path.name,
+            "first_time": self.first_time,
+            "last_time": self.last_time,
+            "levels": self.levels,
+            "count": self.count,
+            "size": self.size
+        }
+    
+    @classmethod
+    def from_dict(cls, path: Path, data: Dict[str, Any]) -> "SegmentIndex":
+        return cls(
+            path,
+            data.get("first_time"),
+            data.get("last_time"),
+            data.get("levels") or {},
+            data.get("count", 0),
+            data.get("size", 0)
+        )
+    
+    @classmethod
+    def build(cls, path: Path) -> "SegmentIndex":
+        """扫描分段文件重建索引（仅用于缺少索引的旧文件）"""
+        index = cls(path)
+        opener = gzip.open if path.name.endswith(COMPRESSED_SUFFIX) else open
+        with opener(path, 'rb') as f:
+            for raw in f:
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    continue
+                created = parse_log_time(entry.get('asctime', ''))
+                if created is None:
+                    continue
+                index.add(created, entry.get('levelname', 'UNKNOWN'), len(raw))
+        index.size = path.stat().st_size
+        return index
+
+def index_path(segment: Path) -> Path:
+    return segment.with_name(segment.name + SEGMENT_INDEX_SUFFIX)
+
+def read_lines_reversed(path: Path, size: Optional[int] = None) -> Iterator[str]:
+    """
+    从文件末尾向前逐行读取
+    
+    Args:
+        path: 文件路径
+        size: 只读取前 size 个字节（正在写入的分段取快照大小，避免读到半行）
+    """
+    if path.name.endswith(COMPRESSED_SUFFIX):
+        # 压缩分段无法随机访问，整体解压后倒序（分段大小有上限）
+        with gzip.open(path, 'rb') as f:
+            lines = f.read().split(b'\n')
+        for line in reversed(lines):
+            if line:
+                yield line.decode('utf-8', errors='replace')
+        return
+    
+    with open(path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        if size is not None:
+            end = min(end, size)
+        
+        position = end
+        remainder = b''
+        while position > 0:
+            read_size = min(READ_BLOCK_SIZE, position)
+            position -= read_size
+            f.seek(position)
+            lines = (f.read(read_size) + remainder).split(b'\n')
+            # 块开头可能是半行，留到读取下一块时拼接
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                if line:
+                    yield line.decode('utf-8', errors='replace')
+        
+        if remainder:
+            yield remainder.decode('utf-8', errors='replace')
+
+def read_segment_reversed(segment: SegmentIndex) -> Iterator[str]:
+    """倒序读取分段；查询期间分段被保留策略删除或压缩时视为空分段"""
+    try:
+        yield from read_lines_reversed(segment.path, segment.size)
+    except FileNotFoundError:
+        return
+
+def read_segment_forward(segment: SegmentIndex) -> Iterator[str]:
+    """
+    顺序流式读取分段（不整体载入内存）
+    
+    未压缩的分段只读取到索引快照的大小为止，跳过正在写入的半行；
+    查询期间分段被删除或压缩时视为空分段
+    """
+    compressed = segment.path.name.endswith(COMPRESSED_SUFFIX)
+    try:
+        with (gzip.open if compressed else open)(segment.path, 'rb') as f:
+            remaining = None if compressed else segment.size
+            for raw in f:
+                if remaining is not None:
+                    remaining -= len(raw)
+                    if remaining < 0:
+                        break
+                line = raw.rstrip(b'\r\n')
+                if line:
+                    yield line.decode('utf-8', errors='replace')
+    except FileNotFoundError:
+        return
+
+class SegmentedLogHandler(logging.FileHandler):
+    """
+    分段日志文件处理器
+    
+    当前分段固定为 log_file，超过 max_bytes 或跨日时滚动为
+    <名称>.<首条日志时间>.log 并写出索引文件；由日志监听线程单独调用
+    """
+    
+    def __init__(self, log_file: Path, max_bytes: int = DEFAULT_MAX_SEGMENT_BYTES):
+        self.log_file = Path(log_file)
+        self.max_bytes = max_bytes
+        super().__init__(self.log_file, encoding='utf-8')
+        
+        self._segments: List[SegmentIndex] = self._load_segments()
+        self._active = SegmentIndex.build(self.log_file) if self.log_file.exists() else SegmentIndex(self.log_file)
+        
+        # 旧版本不分段的日志文件，首次启动时整体转为一个分段
+        if self._active.size >= self.max_bytes:
+            self._rollover()
+    
+    def _segment_files(self) -> List[Path]:
+        """已滚动的分段文件（含压缩分段）"""
+        stem, suffix = self.log_file.stem, self.log_file.suffix
+        return sorted(
+            list(self.log_file.parent.glob(f"{stem}.*{suffix}"))
+            + list(self.log_file.parent.glob(f"{stem}.*{suffix}{COMPRESSED_SUFFIX}"))
+        )
+    
+    def _load_segments(self) -> List[SegmentIndex]:
+        segments = []
+        for path in self._segment_files():
+            try:
+                with open(index_path(path), 'r', encoding='utf-8') as f:
+                    segments.append(SegmentIndex.from_dict(path, json.load(f)))
+                continue
+            except (OSError, ValueError):
+                pass
+            
+            # 索引缺失或损坏时重建
+            try:
+                segment = SegmentIndex.build(path)
+                self._write_index(segment)
+                segments.append(segment)
+            except OSError:
+                continue
+        
+        segments.sort(key=lambda segment: segment.first_time or 0)
+        return segments
+    
+    @staticmethod
+    def _write_index(segment: SegmentIndex):
+        with open(index_path(segment.path), 'w', encoding='utf-8') as f:
+            json.dump(segment.to_dict(), f, ensure_ascii=False)
+    
+    def _should_rollover(self, created: float) -> bool:
+        if self._active.count == 0:
+            return False
+        if self._active.size >= self.max_bytes:
+            return True
+        # 按日滚动，保证过期清理可以按整个分段进行
+        return time.localtime(created)[:3] != time.localtime(self._active.first_time)[:3]
+    
+    def _rollover(self):
+        """把当前分段改名为带时间的分段文件，写出索引并开始新分段"""
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        
+        started = time.localtime(self._active.first_time or time.time())
+        stem, suffix = self.log_file.stem, self.log_file.suffix
+        name = f"{stem}.{time.strftime('%Y%m%d-%H%M%S', started)}{suffix}"
+        target = self.log_file.with_name(name)
+        sequence = 1
+        while target.exists() or target.with_name(target.name + COMPRESSED_SUFFIX).exists():
+            target = self.log_file.with_name(f"{stem}.{time.strftime('%Y%m%d-%H%M%S', started)}-{sequence}{suffix}")
+            sequence += 1
+        
+        os.replace(self.log_file, target)
+        segment = self._active
+        segment.path = target
+        self._write_index(segment)
+        self._segments.append(segment)
+        
+        self._active = SegmentIndex(self.log_file)
+        self.stream = self._open()
+    
+    def emit(self, record: logging.LogRecord):
+        try:
+            if self._should_rollover(record.created):
+                self._rollover()
+            
+            if self.stream is None:
+                self.stream = self._open()
+            
+            start = self.stream.tell()
+            logging.StreamHandler.emit(self, record)
+            self._active.add(record.created, record.levelname, self.stream.tell() - start)
+        except Exception:
+            self.handleError(record)
+    
+    def snapshot(self) -> List[SegmentIndex]:
+        """所有分段（含当前分段）索引的快照，从新到旧"""
+        with self.lock:
+            segments = [segment.copy() for segment in self._segments]
+            segments.append(self._active.copy())
+        return list(reversed(segments))
+    
+    def apply_retention(
+        self,
+        max_age: Optional[float] = None,
+        compress_age: Optional[float] = None,
+        max_total_bytes: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        按整个分段执行保留策略，只依据索引判断，不读取日志内容；
+        当前正在写入的分段不受影响，因此不会丢失并发写入的日志
+        
+        Args:
+            max_age: 最后一条日志早于该秒数的分段被删除
+            compress_age: 最后一条日志早于该秒数的分段被 gzip 压缩
+            max_total_bytes: 分段总大小上限（含当前分段），超出时从最旧的分段开始删除
+        
+        Returns:
+            删除和压缩的分段数、释放的字节数
+        """
+        now = time.time()
+        expired: List[SegmentIndex] = []
+        
+        with self.lock:
+            kept = []
+            for segment in self._segments:
+                if max_age is not None and (segment.last_time or 0) < now - max_age:
+                    expired.append(segment)
+                else:
+                    kept.append(segment)
+            
+            if max_total_bytes is not None:
+                total = self._active.size + sum(segment.size for segment in kept)
+                while kept and total > max_total_bytes:
+                    segment = kept.pop(0)
+                    total -= segment.size
+                    expired.append(segment)
+            
+            self._segments = kept
+            to_compress = [
+                segment for segment in kept
+                if compress_age is not None
+                and (segment.last_time or 0) < now - compress_age
+                and not segment.path.name.endswith(COMPRESSED_SUFFIX)
+            ]
+        
+        freed = 0
+        for segment in expired:
+            freed += segment.size
+            for path in (segment.path, index_path(segment.path)):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+        
+        compressed = 0
+        for segment in to_compress:
+            freed += self._compress(segment)
+            compressed += 1
+        
+        return {"deleted": len(expired), "compressed": compressed, "freed_bytes": freed}
+    
+    def _compress(self, segment: SegmentIndex) -> int:
+        """gzip 压缩一个已滚动的分段，返回节省的字节数"""
+        source = segment.path
+        target = source.with_name(source.name + COMPRESSED_SUFFIX)
+        temp = target.with_name(target.name + ".tmp")
+        
+        with open(source, 'rb') as src, gzip.open(temp, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(temp, target)
+        
+        original_size = segment.size
+        with self.lock:
+            segment.path = target
+            segment.size = target.stat().st_size
+            self._write_index(segment)
+        
+        for path in (source, index_path(source)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        
+        return max(0, original_size - segment.size)
@@ -0,0 +1,156 @@
+"""
+日志统计计数模块
+日志监听线程在写入时累加各级别、各日志器和每小时的计数，
+定期持久化到日志目录，统计接口直接读取计数而不再解析日志
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# 计数持久化的最小间隔（秒）
+SAVE_INTERVAL = 5.0
+
+# 按小时计数的保留时长（小时）
+HOURLY_RETENTION = 30 * 24
+
+# 视为错误的日志级别
+ERROR_LEVELS = ("ERROR", "CRITICAL")
+
+def _hour_key(created: float) -> str:
+    return time.strftime("%Y-%m-%d %H:00", time.localtime(created))
+
+class LogStats:
+    """日志累计计数"""
+    
+    def __init__(self, stats_file: Path, seed: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            stats_file: 计数持久化文件
+            seed: 计数文件不存在时的初始级别计数（来自已有日志分段的索引）
+        """
+        self.stats_file = Path(stats_file)
+        self._lock = threading.Lock()
+        self.total = 0
+        self.levels: Dict[str, int] = {}
+        self.loggers: Dict[str, int] = {}
+        self.hourly: Dict[str, Dict[str, int]] = {}
+        self.latest_log_time: Optional[str] = None
+        self.since: Optional[float] = None
+        self._dirty = False
+        self._last_save = time.monotonic()
+        
+        if not self._load() and seed:
+            self.levels = dict(seed)
+            self.total = sum(seed.values())
+            self._dirty = True
+    
+    def _load(self) -> bool:
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        
+        self.total = data.get("total", 0)
+        self.levels = data.get("levels", {})
+        self.loggers = data.get("loggers", {})
+        self.hourly = data.get("hourly", {})
+        self.latest_log_time = data.get("latest_log_time")
+        self.since = data.get("since")
+        return True
+    
+    def record(self, created: float, levelname: str, name: str, asctime: str):
+        """累加一条日志（在日志监听线程中调用）"""
+        with self._lock:
+            self.total += 1
+            self.levels[levelname] = self.levels.get(levelname, 0) + 1
+            self.loggers[name] = self.loggers.get(name, 0) + 1
+            hour = self.hourly.setdefault(_hour_key(created), {})
+            hour[levelname] = hour.get(levelname, 0) + 1
+            self.latest_log_time = asctime
+            if self.since is None:
+                self.since = created
+            self._dirty = True
+            
+            if time.monotonic() - self._last_save >= SAVE_INTERVAL:
+                self._save_locked()
+    
+    def save(self):
+        with self._lock:
+            self._save_locked()
+    
+    def _save_locked(self):
+        self._last_save = time.monotonic()
+        if not self._dirty:
+            return
+        
+        # 只保留最近一段时间的小时计数
+        if len(self.hourly) > HOURLY_RETENTION:
+            for hour in sorted(self.hourly)[:len(self.hourly) - HOURLY_RETENTION]:
+                del self.hourly[hour]
+        
+        data = {
+            "total": self.total,
+            "levels": self.levels,
+            "loggers": self.loggers,
+            "hourly": self.hourly,
+            "latest_log_time": self.latest_log_time,
+            "since": self.since
+        }
+        temp = self.stats_file.with_name(self.stats_file.name + ".tmp")
+        try:
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp, self.stats_file)
+            self._dirty = False
+        except OSError:
+            pass
+    
+    def get_stats(self, hours: int = 24) -> Dict[str, Any]:
+        """获取统计，hours 为返回的按小时计数的范围"""
+        now = time.time()
+        recent_hours = {_hour_key(now - i * 3600) for i in range(hours)}
+        
+        with self._lock:
+            hourly: List[Dict[str, Any]] = [
+                {"hour": hour, "total": sum(counts.values()), "levels": dict(counts)}
+                for hour, counts in sorted(self.hourly.items())
+                if hour in recent_hours
+            ]
+            return {
+                "total": self.total,
+                "level_counts": dict(self.levels),
+                "logger_counts": dict(self.loggers),
+                "recent_errors": sum(
+                    hour["levels"].get(level, 0) for hour in hourly for level in ERROR_LEVELS
+                ),
+                "latest_log_time": self.latest_log_time,
+                "since": self.since,
+                "hourly": hourly
+            }
+
+class LogStatsHandler(logging.Handler):
+    """在日志写入时累加统计计数的处理器（由日志监听线程调用）"""
+    
+    def __init__(self, stats: LogStats):
+        super().__init__()
+        self.stats = stats
+        self.setFormatter(logging.Formatter())
+    
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.stats.record(record.created, record.levelname, record.name, self.formatter.formatTime(record))
+        except Exception:
+            self.handleError(record)
+    
+    def flush(self):
+        self.stats.save()
+    
+    def close(self):
+        self.stats.save()
+        super().close()
@@ -0,0 +1,195 @@
+"""
+日志索引存储模块（可选）
+把日志同时写入本地 SQLite 数据库，按时间、级别、日志器名称建立索引，
+消息内容使用 FTS5 全文索引，日志量很大时查询、搜索和分页仍然只走索引
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# 批量提交：累计条数或距上次提交的时间达到阈值时写入数据库
+BATCH_SIZE = 200
+BATCH_INTERVAL = 0.5
+
+# FTS5 三元组分词器只能匹配至少 3 个字符的关键词
+TRIGRAM_MIN_LENGTH = 3
+
+def fts5_available() -> bool:
+    """当前 SQLite 是否支持 FTS5"""
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        finally:
+            conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+class LogStore:
+    """SQLite 日志索引存储"""
+    
+    def __init__(self, db_path: str = "logs/strm_linker.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._pending: List[Tuple[float, str, str, str, str]] = []
+        self._last_flush = time.monotonic()
+        self.trigram = self._init_schema()
+    
+    def _init_schema(self) -> bool:
+        """创建数据表，返回消息全文索引是否使用三元组分词（支持任意子串搜索）"""
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS logs (
+                    id INTEGER PRIMARY KEY,
+                    created REAL NOT NULL,
+                    level TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    record TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_logs_created ON logs (created);
+                CREATE INDEX IF NOT EXISTS idx_logs_level ON logs (level, id);
+                CREATE INDEX IF NOT EXISTS idx_logs_name ON logs (name, id);
+            """)
+            
+            row = self._conn.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'logs_fts'"
+            ).fetchone()
+            if row:
+                return "trigram" in row[0]
+            
+            try:
+                self._conn.execute("CREATE VIRTUAL TABLE logs_fts USING fts5(message, tokenize='trigram')")
+                return True
+            except sqlite3.OperationalError:
+                # SQLite 3.34 之前没有三元组分词器
+                self._conn.execute("CREATE VIRTUAL TABLE logs_fts USING fts5(message)")
+                return False
+    
+    def add(self, created: float, level: str, name: str, message: str, record: str):
+        """缓存一条日志，达到批量阈值时写入"""
+        with self._lock:
+            self._pending.append((created, level, name, message, record))
+            if len(self._pending) >= BATCH_SIZE or time.monotonic() - self._last_flush >= BATCH_INTERVAL:
+                self._flush_locked()
+    
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+    
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        
+        pending, self._pending = self._pending, []
+        with self._conn:
+            for created, level, name, message, record in pending:
+                cursor = self._conn.execute(
+                    "INSERT INTO logs (created, level, name, message, record) VALUES (?, ?, ?, ?, ?)",
+                    (created, level, name, message, record)
+                )
+                self._conn.execute(
+                    "INSERT INTO logs_fts (rowid, message) VALUES (?, ?)",
+                    (cursor.lastrowid, message)
+                )
+    
+    def query(
+        self,
+        limit: int = 100,
+        offset: int = 0,
+        level: Optional[str] = None,
+        search: Optional[str] = None,
+        name: Optional[str] = None,
+        start_ts: Optional[float] = None,
+        end_ts: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """按条件查询日志，结果按时间倒序"""
+        conditions = []
+        params: List[Any] = []
+        
+        if level:
+            conditions.append("level = ?")
+            params.append(level.upper())
+        if name:
+            conditions.append("name = ?")
+            params.append(name)
+        if start_ts is not None:
+            conditions.append("created >= ?")
+            params.append(start_ts)
+        if end_ts is not None:
+            conditions.append("created <= ?")
+            params.append(end_ts)
+        if search:
+            if self.trigram and len(search) >= TRIGRAM_MIN_LENGTH:
+                conditions.append("id IN (SELECT rowid FROM logs_fts WHERE logs_fts MATCH ?)")
+                params.append('"' + search.replace('"', '""') + '"')
+            else:
+                # 关键词过短或分词器不支持子串时退回逐行匹配
+                conditions.append("instr(lower(message), ?) > 0")
+                params.append(search.lower())
+        
+        sql = "SELECT record FROM logs"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(sql, params).fetchall()
+        
+        return [json.loads(row[0]) for row in rows]
+    
+    def delete_before(self, cutoff: float) -> int:
+        """删除早于 cutoff 的日志，返回删除条数"""
+        with self._lock, self._conn:
+            self._flush_locked()
+            self._conn.execute(
+                "DELETE FROM logs_fts WHERE rowid IN (SELECT id FROM logs WHERE created < ?)",
+                (cutoff,)
+            )
+            return self._conn.execute("DELETE FROM logs WHERE created < ?", (cutoff,)).rowcount
+    
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+class LogStoreHandler(logging.Handler):
+    """把日志写入索引存储的处理器（由日志监听线程调用）"""
+    
+    def __init__(self, store: LogStore):
+        super().__init__()
+        self.store = store
+    
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.store.add(
+                record.created,
+                record.levelname,
+                record.name,
+                record.getMessage(),
+                self.format(record)
+            )
+        except Exception:
+            self.handleError(record)
+    
+    def flush(self):
+        self.store.flush()
+    
+    def close(self):
+        try:
+            self.store.close()
+        finally:
+            super().close()
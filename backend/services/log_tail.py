@@ -0,0 +1,140 @@
+"""
+日志实时推送模块
+日志监听线程把新日志直接分发给各订阅者（不重新读取日志文件），
+过滤在服务端完成；每个订阅者只有一个有界缓冲区，没有独立线程，
+客户端消费过慢时丢弃最旧的日志并计数
+"""
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+# 每个订阅者默认缓冲的日志条数
+DEFAULT_BUFFER_SIZE = 500
+
+class LogSubscriber:
+    """单个实时日志订阅者（一个浏览器连接）"""
+    
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        level: Optional[str] = None,
+        search: Optional[str] = None,
+        name: Optional[str] = None,
+        buffer_size: int = DEFAULT_BUFFER_SIZE
+    ):
+        self.loop = loop
+        self.level = level.upper() if level else None
+        self.search = search.lower() if search else None
+        self.name = name
+        self.buffer = deque(maxlen=max(1, buffer_size))
+        self.ready = asyncio.Event()
+        self.delivered = 0
+        self.dropped = 0
+        self._wakeup_pending = False
+        self._lock = threading.Lock()
+    
+    def matches(self, entry: Dict[str, Any]) -> bool:
+        if self.level and entry["levelname"] != self.level:
+            return False
+        if self.name and entry["name"] != self.name:
+            return False
+        if self.search and self.search not in entry["message"].lower():
+            return False
+        return True
+    
+    def offer(self, entry: Dict[str, Any]):
+        """放入一条日志（在日志监听线程中调用），缓冲区满时丢弃最旧的"""
+        with self._lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(entry)
+            if self._wakeup_pending:
+                return
+            self._wakeup_pending = True
+        
+        # 一批日志只唤醒一次事件循环
+        try:
+            self.loop.call_soon_threadsafe(self.ready.set)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+    
+    def drain(self) -> List[Dict[str, Any]]:
+        """取出缓冲区中的全部日志（在事件循环中调用）"""
+        with self._lock:
+            entries = list(self.buffer)
+            self.buffer.clear()
+            self._wakeup_pending = False
+            self.ready.clear()
+        self.delivered += len(entries)
+        return entries
+
+class LogTailHub:
+    """实时日志订阅者注册表"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: List[LogSubscriber] = []
+    
+    def subscribe(
+        self,
+        level: Optional[str] = None,
+        search: Optional[str] = None,
+        name: Optional[str] = None,
+        buffer_size: int = DEFAULT_BUFFER_SIZE
+    ) -> LogSubscriber:
+        """在当前事件循环中创建订阅者"""
+        subscriber = LogSubscriber(asyncio.get_running_loop(), level, search, name, buffer_size)
+        with self._lock:
+            self._subscribers = self._subscribers + [subscriber]
+        return subscriber
+    
+    def unsubscribe(self, subscriber: LogSubscriber):
+        with self._lock:
+            self._subscribers = [sub for sub in self._subscribers if sub is not subscriber]
+    
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+    
+    def publish(self, entry: Dict[str, Any]):
+        # 订阅者列表写时复制，发布时无需加锁
+        for subscriber in self._subscribers:
+            if subscriber.matches(entry):
+                subscriber.offer(entry)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        subscribers = self._subscribers
+        return {
+            "subscribers": len(subscribers),
+            "delivered": sum(sub.delivered for sub in subscribers),
+            "dropped": sum(sub.dropped for sub in subscribers)
+        }
+
+class LogTailHandler(logging.Handler):
+    """把新日志分发给实时订阅者的处理器（由日志监听线程调用）"""
+    
+    def __init__(self, hub: LogTailHub):
+        super().__init__()
+        self.hub = hub
+        self.setFormatter(logging.Formatter())
+    
+    def emit(self, record: logging.LogRecord):
+        if not self.hub.has_subscribers:
+            return
+        
+        try:
+            self.hub.publish({
+                "asctime": self.formatter.formatTime(record),
+                "name": record.name,
+                "levelname": record.levelname,
+                "message": record.getMessage()
+            })
+        except Exception:
+            self.handleError(record)
+
+# 全局实时日志实例
+log_tail = LogTailHub()
@@ -5,37 +5,96 @@
 
 import os
 import json
+import time
+import queue
+import atexit
 import logging
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
-from pythonjsonlogger import jsonlogger
+from typing import Iterator, List, Dict, Any, Optional, Tuple
+from datetime import datetime
 import threading
 
+from services.log_segments import (
+    DEFAULT_MAX_SEGMENT_BYTES,
+    SegmentedLogHandler,
+    parse_log_time,
+    read_segment_forward,
+    read_segment_reversed
+)
+from services.log_store import LogStore, LogStoreHandler, fts5_available
+from services.log_tail import LogTailHandler, log_tail
+from services.log_stats import LogStats, LogStatsHandler
+from services.log_format import FastJsonFormatter
+
+# 设置环境变量 LOG_STORE=sqlite 启用 SQLite 日志索引存储
+LOG_STORE_ENV = "LOG_STORE"
+
 class LogManager:
     """日志管理器"""
     
-    def __init__(self, log_dir: str = "logs"):
+    def __init__(
+        self,
+        log_dir: str = "logs",
+        max_segment_bytes: int = DEFAULT_MAX_SEGMENT_BYTES,
+        use_store: Optional[bool] = None
+    ):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
         self.log_file = self.log_dir / "strm_linker.log"
+        self.max_segment_bytes = max_segment_bytes
         self._lock = threading.Lock()
         
-        # 配置日志格式
-        self.formatter = jsonlogger.JsonFormatter(
-            "%(asctime)s %(name)s %(levelname)s %(message)s"
-        )
+        # 可选的 SQLite 索引存储，启用后查询和搜索走索引，不再读取日志文件
+        if use_store is None:
+            use_store = os.getenv(LOG_STORE_ENV, "").lower() == "sqlite"
+        store_error = None
+        if use_store and not fts5_available():
+            store_error = "当前 SQLite 不支持 FTS5，日志索引存储未启用"
+            use_store = False
+        self.store = LogStore(str(self.log_dir / "strm_linker.db")) if use_store else None
+        
+        # 配置日志格式（固定字段的快速 JSON 格式化器）
+        self.formatter = FastJsonFormatter()
+        
+        # 所有日志器共用一个队列处理器，业务线程只负责入队；
+        # 格式化和文件、控制台写入由唯一的后台监听线程完成
+        self._queue = queue.Queue(-1)
+        self.queue_handler = QueueHandler(self._queue)
+        file_handler, console_handler = self._setup_handlers()
+        self.file_handler = file_handler
+        # 实时日志推送直接从队列取新日志，不重新读取文件
+        tail_handler = LogTailHandler(log_tail)
+        tail_handler.setLevel(logging.INFO)
+        tail_handler.setFormatter(self.formatter)
+        handlers = [file_handler, console_handler, tail_handler]
         
-        # 设置日志处理器
-        self._setup_handlers()
+        # 写入时累加的统计计数；首次启用时以已有分段索引的级别计数为起点
+        seed: Dict[str, int] = {}
+        for segment in file_handler.snapshot():
+            for level_name, count in segment.levels.items():
+                seed[level_name] = seed.get(level_name, 0) + count
+        self.stats = LogStats(self.log_dir / "strm_linker.stats.json", seed)
+        stats_handler = LogStatsHandler(self.stats)
+        stats_handler.setLevel(logging.INFO)
+        stats_handler.setFormatter(self.formatter)
+        handlers.append(stats_handler)
+        if self.store:
+            store_handler = LogStoreHandler(self.store)
+            store_handler.setLevel(logging.INFO)
+            store_handler.setFormatter(self.formatter)
+            handlers.append(store_handler)
+        self._listener = QueueListener(self._queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+        atexit.register(self.shutdown)
+        
+        if store_error:
+            self.get_logger(__name__).warning(store_error)
     
     def _setup_handlers(self):
         """设置日志处理器"""
-        # 文件处理器
-        file_handler = logging.FileHandler(
-            self.log_file, 
-            encoding='utf-8'
-        )
+        # 文件处理器（按大小和日期滚动分段）
+        file_handler = SegmentedLogHandler(self.log_file, self.max_segment_bytes)
         file_handler.setLevel(logging.INFO)
         file_handler.setFormatter(self.formatter)
         
@@ -54,21 +113,33 @@ class LogManager:
         """获取指定名称的日志器"""
         logger = logging.getLogger(name)
         
-        if not logger.handlers:
-            file_handler, console_handler = self._setup_handlers()
-            logger.addHandler(file_handler)
-            logger.addHandler(console_handler)
+        if self.queue_handler not in logger.handlers:
+            logger.addHandler(self.queue_handler)
             logger.setLevel(logging.INFO)
         
         return logger
     
+    def shutdown(self):
+        """停止后台监听线程，写出队列中剩余的日志并关闭文件"""
+        with self._lock:
+            if self._listener is None:
+                return
+            listener = self._listener
+            self._listener = None
+        
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+    
     def get_logs(
         self, 
         limit: int = 100, 
         level: Optional[str] = None,
         search: Optional[str] = None,
         start_time: Optional[datetime] = None,
-        end_time: Optional[datetime] = None
+        end_time: Optional[datetime] = None,
+        offset: int = 0,
+        name: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         获取日志记录
@@ -79,85 +150,155 @@ class LogManager:
             search: 搜索关键词
             start_time: 开始时间
             end_time: 结束时间
+            offset: 跳过前 offset 条匹配的记录（分页）
+            name: 日志器名称过滤
         """
         logs = []
+        level = level.upper() if level else None
+        start_ts = start_time.timestamp() if start_time else None
+        end_ts = end_time.timestamp() if end_time else None
+        
+        if self.store:
+            try:
+                return self.store.query(limit, offset, level, search, name, start_ts, end_ts)
+            except Exception as e:
+                self.get_logger(__name__).error(f"查询日志索引失败: {e}")
+                return logs
         
-        if not self.log_file.exists():
-            return logs
+        search = search.lower() if search else None
+        skipped = 0
         
         try:
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                for line in f:
+            # 分段从新到旧、每个分段从末尾向前读取，结果即按时间倒序
+            for segment in self.file_handler.snapshot():
+                if not segment.overlaps(start_ts, end_ts):
+                    continue
+                if level and not segment.levels.get(level):
+                    continue
+                
+                for line in read_segment_reversed(segment):
                     try:
-                        log_entry = json.loads(line.strip())
-                        
-                        # 解析时间
-                        log_time = datetime.fromisoformat(
-                            log_entry.get('asctime', '').replace('Z', '+00:00')
-                        )
-                        
-                        # 时间范围过滤
-                        if start_time and log_time < start_time:
-                            continue
-                        if end_time and log_time > end_time:
+                        log_entry = json.loads(line)
+                    except ValueError:
+                        # 忽略无效的日志行
+                        continue
+                    
+                    # 时间范围过滤
+                    if start_ts is not None or end_ts is not None:
+                        log_time = parse_log_time(log_entry.get('asctime', ''))
+                        if log_time is None:
                             continue
-                        
-                        # 级别过滤
-                        if level and log_entry.get('levelname') != level.upper():
+                        if end_ts is not None and log_time > end_ts:
                             continue
-                        
-                        # 关键词搜索
-                        if search:
-                            message = log_entry.get('message', '').lower()
-                            if search.lower() not in message:
-                                continue
-                        
-                        logs.append(log_entry)
-                        
-                    except (json.JSONDecodeError, ValueError):
-                        # 忽略无效的日志行
+                        if start_ts is not None and log_time < start_ts:
+                            # 分段内按写入顺序排列，更早的行都不在范围内
+                            break
+                    
+                    # 级别过滤
+                    if level and log_entry.get('levelname') != level:
+                        continue
+                    
+                    if name and log_entry.get('name') != name:
                         continue
+                    
+                    # 关键词搜索
+                    if search and search not in log_entry.get('message', '').lower():
+                        continue
+                    
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    
+                    logs.append(log_entry)
+                    if len(logs) >= limit:
+                        return logs
         
         except Exception as e:
             self.get_logger(__name__).error(f"读取日志文件失败: {e}")
         
-        # 按时间倒序排列，返回最新的记录
-        logs.sort(key=lambda x: x.get('asctime', ''), reverse=True)
-        return logs[:limit]
+        return logs
     
-    def clear_old_logs(self, days: int = 7):
-        """清理指定天数之前的日志"""
-        cutoff_time = datetime.now() - timedelta(days=days)
+    def iter_logs(
+        self,
+        level: Optional[str] = None,
+        search: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        name: Optional[str] = None
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        按时间顺序逐条遍历日志分段（用于导出，不整体载入内存）
         
-        if not self.log_file.exists():
-            return
+        Yields:
+            (原始日志行, 解析后的日志条目)
+        """
+        level = level.upper() if level else None
+        search = search.lower() if search else None
+        start_ts = start_time.timestamp() if start_time else None
+        end_ts = end_time.timestamp() if end_time else None
         
-        try:
-            valid_logs = []
+        for segment in reversed(self.file_handler.snapshot()):
+            if not segment.overlaps(start_ts, end_ts):
+                continue
+            if level and not segment.levels.get(level):
+                continue
             
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        log_entry = json.loads(line.strip())
-                        log_time = datetime.fromisoformat(
-                            log_entry.get('asctime', '').replace('Z', '+00:00')
-                        )
-                        
-                        if log_time >= cutoff_time:
-                            valid_logs.append(line.strip())
-                            
-                    except (json.JSONDecodeError, ValueError):
+            for line in read_segment_forward(segment):
+                try:
+                    log_entry = json.loads(line)
+                except ValueError:
+                    continue
+                
+                if start_ts is not None or end_ts is not None:
+                    log_time = parse_log_time(log_entry.get('asctime', ''))
+                    if log_time is None:
                         continue
-            
-            # 重写日志文件
-            with open(self.log_file, 'w', encoding='utf-8') as f:
-                for log_line in valid_logs:
-                    f.write(log_line + '\n')
-            
-            self.get_logger(__name__).info(f"清理了 {days} 天前的日志")
-            
-        except Exception as e:
-            self.get_logger(__name__).error(f"清理日志失败: {e}")
+                    if start_ts is not None and log_time < start_ts:
+                        continue
+                    if end_ts is not None and log_time > end_ts:
+                        # 分段内按写入顺序排列，之后的行都不在范围内
+                        break
+                
+                if level and log_entry.get('levelname') != level:
+                    continue
+                if name and log_entry.get('name') != name:
+                    continue
+                if search and search not in log_entry.get('message', '').lower():
+                    continue
+                
+                yield line, log_entry
+    
+    def get_stats(self, hours: int = 24) -> Dict[str, Any]:
+        """获取日志统计（累计计数，覆盖全部历史）"""
+        return self.stats.get_stats(hours)
+    
+    def clear_old_logs(
+        self,
+        days: int = 7,
+        compress_after_days: Optional[int] = None,
+        max_total_mb: Optional[float] = None
+    ) -> Dict[str, int]:
+        """
+        清理旧日志（按整个分段删除或压缩，不重写正在写入的文件）
+        
+        Args:
+            days: 删除最后一条日志早于该天数的分段
+            compress_after_days: 压缩最后一条日志早于该天数的分段，None 表示不压缩
+            max_total_mb: 日志总大小上限（MB），超出时从最旧的分段开始删除
+        """
+        result = self.file_handler.apply_retention(
+            max_age=days * 86400,
+            compress_age=compress_after_days * 86400 if compress_after_days is not None else None,
+            max_total_bytes=int(max_total_mb * 1024 * 1024) if max_total_mb else None
+        )
+        if self.store:
+            result["deleted_records"] = self.store.delete_before(time.time() - days * 86400)
+        
+        self.get_logger(__name__).info(
+            f"清理了 {days} 天前的日志: 删除 {result['deleted']} 个分段, "
+            f"压缩 {result['compressed']} 个分段, 释放 {result['freed_bytes']} 字节"
+        )
+        return result
 
 # 全局日志管理器实例
 log_manager = LogManager()
@@ -0,0 +1,284 @@
+"""
+全局扫描并发控制模块
+定时任务、手动触发和 API 扫描统一经过此处排队：
+限制同时运行的扫描数量，超出的请求排队等待，
+相同目标的重复请求合并到同一个进行中的扫描；
+不同存储设备上的扫描并行执行，同一设备上的扫描受设备并发预算限制
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Tuple
+
+from services.logger import get_logger
+from services.devices import get_device_id, device_label
+from services.fs_guard import fs_guard
+from services.scan_progress import ScanProgress
+from services.scan_reports import scan_reports
+from services.dir_summary import dir_summary
+
+logger = get_logger(__name__)
+
+# 保留的已完成任务数量（用于状态查询）
+FINISHED_JOBS_LIMIT = 100
+
+def make_scan_key(
+    directory: str,
+    recursive: bool = True,
+    custom_video_extensions: Optional[Iterable[str]] = None,
+    custom_metadata_extensions: Optional[Iterable[str]] = None,
+    dry_run: bool = False
+) -> Tuple:
+    """
+    生成扫描请求的去重键：目录和扫描规则都相同的请求视为重复
+    
+    解析真实路径经挂载点保护，挂载点失效时抛出 FsTimeoutError 或 MountUnavailableError
+    """
+    return (
+        "scan",
+        fs_guard.call(directory, os.path.realpath, directory, description=f"解析路径 {directory}"),
+        bool(recursive),
+        tuple(sorted(ext.lower() for ext in custom_video_extensions or [])),
+        tuple(sorted(ext.lower() for ext in custom_metadata_extensions or [])),
+        bool(dry_run)
+    )
+
+class ScanJob:
+    """一次受控的扫描"""
+    
+    _ids = itertools.count(1)
+    
+    def __init__(
+        self,
+        key: Hashable,
+        fn: Callable[[], Any],
+        description: str,
+        source: str,
+        devices: Iterable[Optional[int]] = (),
+        progress: Optional[ScanProgress] = None,
+        dry_run: bool = False
+    ):
+        self.job_id = next(self._ids)
+        self.key = key
+        self.devices: FrozenSet[int] = frozenset(device for device in devices if device is not None)  # 扫描涉及的存储设备
+        self.progress = progress  # 扫描进度（可选）
+        self.dry_run = dry_run  # 预览扫描：不保存报告、不更新目录摘要
+        self.fn = fn
+        self.description = description
+        self.source = source
+        self.future: Future = Future()
+        self.state = "queued"
+        self.merged_requests = 0  # 合并进来的重复请求数
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "description": self.description,
+            "source": self.source,
+            "dry_run": self.dry_run,
+            "device": ", ".join(device_label(device) for device in sorted(self.devices)) or device_label(None),
+            "state": self.state,
+            "merged_requests": self.merged_requests,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "progress": self.progress.to_dict() if self.progress else None
+        }
+
+class ScanGovernor:
+    """全局扫描并发控制器"""
+    
+    def __init__(self, max_concurrent_scans: int = 4, max_scans_per_device: int = 1):
+        """
+        Args:
+            max_concurrent_scans: 全局同时运行的扫描上限
+            max_scans_per_device: 同一存储设备上同时运行的扫描上限
+        """
+        self.max_concurrent_scans = max(1, max_concurrent_scans)
+        self.max_scans_per_device = max(1, max_scans_per_device)
+        self._lock = threading.Lock()
+        self._queue: deque = deque()
+        self._in_flight: Dict[Hashable, ScanJob] = {}  # 排队中或运行中的任务
+        self._running: Dict[int, ScanJob] = {}
+        self._finished: "OrderedDict[int, ScanJob]" = OrderedDict()
+    
+    def submit(
+        self,
+        key: Hashable,
+        fn: Callable[[], Any],
+        description: str = "",
+        source: str = "api",
+        path: Optional[str] = None,
+        progress: Optional[ScanProgress] = None,
+        dry_run: bool = False,
+        paths: Optional[Iterable[str]] = None
+    ) -> ScanJob:
+        """
+        提交扫描
+        
+        Args:
+            key: 去重键，相同键的请求在前一个完成前合并为同一个扫描
+            fn: 执行扫描的函数，返回值作为 future 结果
+            description: 扫描描述（用于状态展示）
+            source: 来源（scheduler, manual, api）
+            path: 扫描的目录，用于按存储设备调度
+            progress: 扫描进度对象，随任务状态一起返回
+            dry_run: 是否为预览扫描
+            paths: 批量扫描涉及的所有目录，扫描占用其中每个存储设备的并发预算
+        
+        Returns:
+            ScanJob，通过 job.future 获取结果
+        """
+        targets = list(paths or []) + ([path] if path else [])
+        devices = {get_device_id(target) for target in targets}
+        
+        with self._lock:
+            existing = self._in_flight.get(key)
+            if existing:
+                existing.merged_requests += 1
+                logger.info(f"合并重复的扫描请求: {existing.description} (来源: {source})")
+                return existing
+            
+            job = ScanJob(key, fn, description, source, devices, progress, dry_run)
+            self._in_flight[key] = job
+            self._queue.append(job)
+            
+            self._dispatch()
+            
+            if job.state == "queued":
+                logger.info(
+                    f"扫描排队等待: {description} "
+                    f"(运行中 {len(self._running)}, 排队 {len(self._queue)})"
+                )
+            
+            return job
+    
+    def run(
+        self,
+        key: Hashable,
+        fn: Callable[[], Any],
+        description: str = "",
+        source: str = "api",
+        path: Optional[str] = None
+    ) -> Any:
+        """提交扫描并等待结果"""
+        return self.submit(key, fn, description, source, path).future.result()
+    
+    def _devices_have_slot(self, devices: FrozenSet[int]) -> bool:
+        """扫描涉及的每个设备是否都还有扫描并发预算（调用方需持有 self._lock）"""
+        for device in devices:
+            running_on_device = sum(1 for job in self._running.values() if device in job.devices)
+            if running_on_device >= self.max_scans_per_device:
+                return False
+        return True
+    
+    def _dispatch(self):
+        """按提交顺序启动可运行的扫描，直到达到全局并发上限（调用方需持有 self._lock）"""
+        index = 0
+        while index < len(self._queue) and len(self._running) < self.max_concurrent_scans:
+            job = self._queue[index]
+            if not self._devices_have_slot(job.devices):
+                # 涉及的设备已满，让其他设备上的扫描先运行
+                index += 1
+                continue
+            
+            del self._queue[index]
+            job.state = "running"
+            job.started_at = time.time()
+            if job.progress:
+                job.progress.start()
+            self._running[job.job_id] = job
+            
+            thread = threading.Thread(
+                target=self._run_job,
+                args=(job,),
+                name=f"Scan-{job.job_id}",
+                daemon=True
+            )
+            thread.start()
+    
+    def _run_job(self, job: ScanJob):
+        """执行单个扫描"""
+        try:
+            result = job.fn()
+            self._publish_result(job, result)
+            job.state = "completed"
+            job.future.set_result(result)
+        except BaseException as e:
+            job.state = "failed"
+            job.error = str(e)
+            job.future.set_exception(e)
+        finally:
+            job.finished_at = time.time()
+            if job.progress:
+                job.progress.finish()
+            with self._lock:
+                self._running.pop(job.job_id, None)
+                if self._in_flight.get(job.key) is job:
+                    del self._in_flight[job.key]
+                
+                self._finished[job.job_id] = job
+                while len(self._finished) > FINISHED_JOBS_LIMIT:
+                    self._finished.popitem(last=False)
+                
+                self._dispatch()
+    
+    @staticmethod
+    def _publish_result(job: ScanJob, result: Any):
+        """
+        保存扫描报告并更新目录摘要索引（合并扫描返回每个请求的结果列表），
+        失败不影响扫描结果；预览扫描没有改动文件，不保存报告也不更新摘要；
+        已带报告 ID 的结果（定时任务关联运行记录自行保存）不重复保存
+        """
+        if job.dry_run:
+            return
+        
+        results = result if isinstance(result, list) else [result]
+        for item in results:
+            if not isinstance(item, dict) or item.get("report_id"):
+                continue
+            try:
+                scan_reports.record(item, label=job.description, source=job.source)
+                dir_summary.apply_scan_result(item)
+            except Exception as e:
+                logger.error(f"保存扫描结果失败: {e}")
+    
+    def is_active(self, key: Hashable) -> bool:
+        """指定键的扫描是否正在排队或运行"""
+        with self._lock:
+            return key in self._in_flight
+    
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """获取指定扫描的状态"""
+        with self._lock:
+            for job in itertools.chain(self._running.values(), self._queue, self._finished.values()):
+                if job.job_id == job_id:
+                    return job.to_dict()
+        return None
+    
+    def get_status(self) -> Dict[str, Any]:
+        """获取并发控制状态"""
+        with self._lock:
+            running: List[ScanJob] = list(self._running.values())
+            queued: List[ScanJob] = list(self._queue)
+            finished: List[ScanJob] = list(self._finished.values())[-20:]
+        
+        return {
+            "max_concurrent_scans": self.max_concurrent_scans,
+            "max_scans_per_device": self.max_scans_per_device,
+            "running": [job.to_dict() for job in running],
+            "queued": [job.to_dict() for job in queued],
+            "recent": [job.to_dict() for job in reversed(finished)]
+        }
+
+# 全局扫描控制器实例
+scan_governor = ScanGovernor()
@@ -0,0 +1,129 @@
+"""
+扫描进度与预计剩余时间
+以已遍历的目录数对比上次完整扫描的目录数估算进度，按当前遍历速度估算剩余时间
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from services.logger import get_logger
+from services.fs_guard import fs_guard
+
+logger = get_logger(__name__)
+
+class ScanProgress:
+    """单次扫描的进度计数（由扫描线程更新，其他线程只读）"""
+    
+    def __init__(self, directory: str, expected_directories: Optional[int] = None):
+        self.directory = directory
+        self.expected_directories = expected_directories  # 上次完整扫描的目录数，未知时为 None
+        self.directories_visited = 0
+        self.files_found = 0
+        self.files_processed = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+    
+    def start(self):
+        """扫描实际开始执行时调用，排队等待的时间不计入耗时和速度"""
+        self.started_at = time.time()
+    
+    def directory_visited(self):
+        self.directories_visited += 1
+    
+    def file_found(self):
+        self.files_found += 1
+    
+    def file_processed(self):
+        self.files_processed += 1
+    
+    def finish(self):
+        self.finished_at = time.time()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        now = self.finished_at or time.time()
+        elapsed = now - self.started_at
+        percent = None
+        eta_seconds = None
+        
+        if self.finished_at:
+            percent = 100.0
+            eta_seconds = 0
+        elif self.expected_directories:
+            # 目录数可能比上次多，未完成时最多报告 99%
+            percent = min(99.0, self.directories_visited * 100.0 / self.expected_directories)
+            if self.directories_visited and elapsed > 0:
+                rate = self.directories_visited / elapsed
+                remaining = max(0, self.expected_directories - self.directories_visited)
+                eta_seconds = round(remaining / rate, 1)
+        
+        return {
+            "directories_visited": self.directories_visited,
+            "expected_directories": self.expected_directories,
+            "files_found": self.files_found,
+            "files_processed": self.files_processed,
+            "percent": round(percent, 1) if percent is not None else None,
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": eta_seconds
+        }
+
+class ScanHistory:
+    """记录每个扫描目标最近一次完整扫描的目录数和耗时，用于进度估算"""
+    
+    def __init__(self, history_file: str = "configs/scan_history.json"):
+        self.history_file = Path(history_file)
+        self._lock = threading.Lock()
+        self._history: Dict[str, Dict[str, Any]] = {}
+        self._load()
+    
+    @staticmethod
+    def _key(directory: str, recursive: bool) -> str:
+        """按真实路径区分扫描目标；解析经挂载点保护，挂载点失效时退回规范化的绝对路径"""
+        try:
+            path = fs_guard.call(directory, os.path.realpath, directory, description=f"解析路径 {directory}")
+        except OSError:
+            path = os.path.abspath(directory)
+        return f"{path}|{'recursive' if recursive else 'flat'}"
+    
+    def _load(self):
+        try:
+            if self.history_file.exists():
+                with open(self.history_file, 'r', encoding='utf-8') as f:
+                    self._history = json.load(f)
+        except Exception as e:
+            logger.error(f"加载扫描历史失败: {e}")
+            self._history = {}
+    
+    def _save(self):
+        try:
+            self.history_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.history_file, 'w', encoding='utf-8') as f:
+                json.dump(self._history, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.error(f"保存扫描历史失败: {e}")
+    
+    def get(self, directory: str, recursive: bool = True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._history.get(self._key(directory, recursive))
+    
+    def record(self, directory: str, recursive: bool, progress: ScanProgress):
+        """记录一次完整扫描的规模"""
+        with self._lock:
+            self._history[self._key(directory, recursive)] = {
+                "directories": progress.directories_visited,
+                "strm_files": progress.files_found,
+                "duration": round((progress.finished_at or time.time()) - progress.started_at, 3),
+                "recorded_at": time.time()
+            }
+            self._save()
+    
+    def new_progress(self, directory: str, recursive: bool = True) -> ScanProgress:
+        """按历史目录数创建进度对象"""
+        history = self.get(directory, recursive)
+        return ScanProgress(directory, history["directories"] if history else None)
+
+# 全局扫描历史实例
+scan_history = ScanHistory()
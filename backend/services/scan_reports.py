@@ -0,0 +1,294 @@
+"""
+扫描报告模块
+每次扫描结束后把逐文件结果保存为紧凑的列式报告（目录和错误信息字典编码，gzip 压缩），
+可以不依赖日志查询某次扫描失败的文件，或对比两次扫描的差异
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 逐文件状态（报告中按下标编码）
+STATUS_LINKED = "linked"  # 本次创建了链接
+STATUS_UNCHANGED = "unchanged"  # 处理成功但无需创建链接
+STATUS_FAILED = "failed"  # 处理失败
+STATUSES = (STATUS_LINKED, STATUS_UNCHANGED, STATUS_FAILED)
+
+# 保留的报告数量
+MAX_REPORTS = 200
+
+REPORT_VERSION = 1
+
+# 报告文件中列式编码用的字段（不属于元数据）
+_ENCODING_KEYS = ("version", "statuses", "directories", "errors", "columns")
+
+class ScanReport:
+    """已载入的扫描报告（列式数据）"""
+    
+    def __init__(self, data: Dict[str, Any]):
+        self.meta = {key: value for key, value in data.items() if key not in _ENCODING_KEYS}
+        self.directories: List[str] = data["directories"]
+        self.errors: List[str] = data["errors"]
+        self.columns: Dict[str, list] = data["columns"]
+    
+    def __len__(self) -> int:
+        return len(self.columns["name"])
+    
+    def path(self, index: int) -> str:
+        return os.path.join(self.directories[self.columns["directory"][index]], self.columns["name"][index])
+    
+    def row(self, index: int) -> Dict[str, Any]:
+        error = self.columns["error"][index]
+        return {
+            "file": self.path(index),
+            "status": STATUSES[self.columns["status"][index]],
+            "links_created": self.columns["links"][index],
+            "error": self.errors[error] if error >= 0 else None
+        }
+    
+    def outcomes(self) -> Dict[str, Tuple[int, int, int]]:
+        """文件路径 -> (状态码, 链接数, 错误码)"""
+        columns = self.columns
+        return {
+            self.path(index): (columns["status"][index], columns["links"][index], columns["error"][index])
+            for index in range(len(self))
+        }
+
+class ScanReportStore:
+    """扫描报告存储"""
+    
+    def __init__(self, report_dir: str = "configs/scan_reports"):
+        self.report_dir = Path(report_dir)
+        self.index_file = self.report_dir / "index.json"
+        self._lock = threading.Lock()
+        self._index: List[Dict[str, Any]] = []  # 报告元数据，从旧到新
+        self._load_index()
+    
+    def _load_index(self):
+        try:
+            if self.index_file.exists():
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+        except Exception as e:
+            logger.error(f"加载扫描报告索引失败: {e}")
+            self._index = []
+    
+    def _save_index(self):
+        self.report_dir.mkdir(parents=True, exist_ok=True)
+        temp = self.index_file.with_name(self.index_file.name + ".tmp")
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False, indent=2)
+        os.replace(temp, self.index_file)
+    
+    def _report_file(self, report_id: str) -> Path:
+        return self.report_dir / f"{report_id}.json.gz"
+    
+    @staticmethod
+    def _outcomes(result: Dict[str, Any]) -> Dict[str, Tuple[str, int, Optional[str]]]:
+        """从扫描结果中提取逐文件结果：路径 -> (状态, 链接数, 错误信息)"""
+        outcomes = {}
+        for detail in result.get("details", []):
+            file_result = detail["result"]
+            if not file_result.get("success", True):
+                outcomes[detail["file"]] = (STATUS_FAILED, 0, file_result.get("error") or "未知错误")
+            elif file_result.get("links_created", 0):
+                outcomes[detail["file"]] = (STATUS_LINKED, file_result["links_created"], None)
+            else:
+                outcomes[detail["file"]] = (STATUS_UNCHANGED, 0, None)
+        
+        # 处理过程中抛出异常的文件没有 details
+        for error in result.get("errors", []):
+            if error["file"] not in outcomes or outcomes[error["file"]][0] != STATUS_FAILED:
+                outcomes[error["file"]] = (STATUS_FAILED, 0, error.get("error") or "未知错误")
+        
+        return outcomes
+    
+    def record(
+        self,
+        result: Dict[str, Any],
+        label: str,
+        source: str,
+        run_id: Optional[int] = None,
+        dry_run: bool = False
+    ) -> Optional[str]:
+        """
+        保存一次扫描的报告，并把报告 ID 写入 result["report_id"]
+        
+        Args:
+            result: 扫描结果（需包含 details 和 errors）
+            label: 扫描描述
+            source: 来源（api, scheduler, manual）
+            run_id: 定时任务运行记录 ID
+            dry_run: 是否为预览扫描（预览的结果不代表实际状态，不保存报告，也不参与对比）
+        
+        Returns:
+            报告 ID，预览扫描或结果不含逐文件信息时返回 None
+        """
+        if dry_run or not isinstance(result, dict) or "details" not in result:
+            return None
+        
+        outcomes = self._outcomes(result)
+        directories: Dict[str, int] = {}
+        errors: Dict[str, int] = {}
+        columns = {"directory": [], "name": [], "status": [], "links": [], "error": []}
+        summary = {status: 0 for status in STATUSES}
+        links_total = 0
+        
+        for file_path in sorted(outcomes):
+            status, links, error = outcomes[file_path]
+            directory, name = os.path.split(file_path)
+            columns["directory"].append(directories.setdefault(directory, len(directories)))
+            columns["name"].append(name)
+            columns["status"].append(STATUSES.index(status))
+            columns["links"].append(links)
+            columns["error"].append(errors.setdefault(error, len(errors)) if error else -1)
+            summary[status] += 1
+            links_total += links
+        
+        report_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        meta = {
+            "report_id": report_id,
+            "label": label,
+            "source": source,
+            "run_id": run_id,
+            "directory": result.get("directory"),
+            "scan_mode": result.get("scan_mode", "full"),
+            "created_at": time.time(),
+            "duration": result.get("duration"),
+            "timed_out": bool(result.get("timed_out")),
+            "total_files": len(outcomes),
+            "links_created": links_total,
+            "summary": summary
+        }
+        data = dict(meta)
+        data.update({
+            "version": REPORT_VERSION,
+            "statuses": list(STATUSES),
+            "directories": list(directories),
+            "errors": list(errors),
+            "columns": columns
+        })
+        
+        try:
+            self.report_dir.mkdir(parents=True, exist_ok=True)
+            with gzip.open(self._report_file(report_id), 'wt', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            
+            with self._lock:
+                self._index.append(meta)
+                expired = self._index[:-MAX_REPORTS]
+                self._index = self._index[-MAX_REPORTS:]
+                self._save_index()
+            for old in expired:
+                try:
+                    self._report_file(old["report_id"]).unlink()
+                except FileNotFoundError:
+                    pass
+        except Exception as e:
+            logger.error(f"保存扫描报告失败: {e}")
+            return None
+        
+        result["report_id"] = report_id
+        return report_id
+    
+    def list_reports(self, limit: int = 50, directory: Optional[str] = None) -> List[Dict[str, Any]]:
+        """最近的报告元数据，从新到旧"""
+        with self._lock:
+            reports = list(reversed(self._index))
+        if directory:
+            reports = [report for report in reports if report.get("directory") == directory]
+        return reports[:limit]
+    
+    def load(self, report_id: str) -> Optional[ScanReport]:
+        """载入报告，不存在时返回 None"""
+        if not all(c.isalnum() or c == '-' for c in report_id):
+            return None
+        try:
+            with gzip.open(self._report_file(report_id), 'rt', encoding='utf-8') as f:
+                return ScanReport(json.load(f))
+        except FileNotFoundError:
+            return None
+    
+    def get_files(
+        self,
+        report_id: str,
+        status: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> Optional[Dict[str, Any]]:
+        """查询报告中的文件结果，可按状态过滤（如 failed）"""
+        report = self.load(report_id)
+        if report is None:
+            return None
+        
+        if status is not None:
+            code = STATUSES.index(status)
+            indexes = [i for i, value in enumerate(report.columns["status"]) if value == code]
+        else:
+            indexes = list(range(len(report)))
+        
+        return {
+            "report": report.meta,
+            "total": len(indexes),
+            "files": [report.row(i) for i in indexes[offset:offset + limit]]
+        }
+    
+    def diff(self, base_id: str, target_id: str, limit: int = 100) -> Optional[Dict[str, Any]]:
+        """
+        对比两次扫描：新增失败、已修复、新增文件、消失文件、链接数变化
+        
+        Returns:
+            任一报告不存在时返回 None
+        """
+        base = self.load(base_id)
+        target = self.load(target_id)
+        if base is None or target is None:
+            return None
+        
+        failed = STATUSES.index(STATUS_FAILED)
+        base_outcomes = base.outcomes()
+        target_outcomes = target.outcomes()
+        changes: Dict[str, List[Dict[str, Any]]] = {
+            "newly_failed": [],
+            "fixed": [],
+            "added": [],
+            "removed": [],
+            "links_changed": []
+        }
+        
+        def error_text(report: ScanReport, code: int) -> Optional[str]:
+            return report.errors[code] if code >= 0 else None
+        
+        for path, (status, links, error) in target_outcomes.items():
+            previous = base_outcomes.get(path)
+            if previous is None:
+                changes["added"].append({"file": path, "status": STATUSES[status], "error": error_text(target, error)})
+            elif status == failed and previous[0] != failed:
+                changes["newly_failed"].append({"file": path, "error": error_text(target, error)})
+            elif status != failed and previous[0] == failed:
+                changes["fixed"].append({"file": path, "previous_error": error_text(base, previous[2])})
+            elif links != previous[1]:
+                changes["links_changed"].append({"file": path, "base_links": previous[1], "target_links": links})
+        
+        for path, (status, _, error) in base_outcomes.items():
+            if path not in target_outcomes:
+                changes["removed"].append({"file": path, "status": STATUSES[status], "error": error_text(base, error)})
+        
+        return {
+            "base": base.meta,
+            "target": target.meta,
+            "counts": {kind: len(items) for kind, items in changes.items()},
+            "changes": {kind: sorted(items, key=lambda item: item["file"])[:limit] for kind, items in changes.items()}
+        }
+
+# 全局扫描报告实例
+scan_reports = ScanReportStore()
@@ -7,19 +7,64 @@ import os
 import re
 import sys
 import ctypes
+import logging
 from pathlib import Path
-from typing import List, Dict, Set, Optional, Tuple
+from typing import Iterable, Iterator, List, Dict, Set, Optional, Tuple
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from concurrent.futures import wait, FIRST_COMPLETED
 
 from services.logger import get_logger
+from services.work_scheduler import work_scheduler, PRIORITY_BULK
+from services.devices import get_device_id
+from services.io_budget import io_budget, IoThrottle
+from services.fs_guard import fs_guard, MountUnavailableError
+from services.scan_progress import ScanProgress, scan_history
 
 logger = get_logger(__name__)
 
+def _io_op(throttle: Optional[IoThrottle], count: int = 1):
+    """在节流器预算内执行文件系统操作，count 为包含的操作数"""
+    return throttle.op(count) if throttle else nullcontext()
+
+def _list_directory(path: str) -> List[os.DirEntry]:
+    with os.scandir(path) as it:
+        return list(it)
+
+def _parse_checkpoint(resume_after: Optional[str]) -> Tuple[Optional[Tuple[str, ...]], Optional[str]]:
+    """
+    解析断点，返回 (断点所在目录的 parts, 断点文件名)
+    
+    以路径分隔符结尾的断点表示该目录自身的文件已全部处理，文件名为 None
+    """
+    if not resume_after:
+        return None, None
+    if resume_after.endswith(os.sep):
+        return Path(resume_after).parts, None
+    path = Path(resume_after)
+    return path.parent.parts, path.name
+
+class WalkPosition:
+    """
+    遍历位置：最后交给调用方的 .strm 文件，或最后一个自身文件已全部交出的目录（以路径分隔符结尾）
+    
+    没有 .strm 文件的大片目录也会推进位置，超时后从这里续扫，不再重复遍历
+    """
+    
+    def __init__(self, checkpoint: Optional[str] = None):
+        self.checkpoint = checkpoint
+
 class StrmScanner:
     """STRM 文件扫描器和软链管理器"""
     
-    def __init__(self, custom_video_extensions: Optional[List[str]] = None, custom_metadata_extensions: Optional[List[str]] = None):
+    def __init__(
+        self,
+        custom_video_extensions: Optional[List[str]] = None,
+        custom_metadata_extensions: Optional[List[str]] = None,
+        ops_per_second: Optional[float] = None,
+        adaptive_throttle: bool = False,
+        verbose: bool = False
+    ):
         # 默认支持的视频扩展名
         default_video_extensions = {'.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.ts', '.mts', '.3gp', '.ogv', '.rmvb', '.asf', '.divx', '.xvid'}
         
@@ -58,6 +103,13 @@ class StrmScanner:
         # STRM 文件匹配模式：xxx.(ext).strm
         self.strm_pattern = re.compile(r'(.+)\.\(([^.]+)\)\.strm$', re.IGNORECASE)
         
+        # I/O 预算：每秒文件系统操作数上限，adaptive 时根据延迟自动退避
+        self.ops_per_second = ops_per_second
+        self.adaptive_throttle = adaptive_throttle
+        
+        # 逐文件日志默认为 DEBUG 级别，排查单个目录时可开启按 INFO 输出
+        self.verbose = verbose
+        
         # 操作系统检测
         self.is_windows = os.name == 'nt'
         self.has_admin_rights = self._check_admin_rights() if self.is_windows else True
@@ -72,6 +124,11 @@ class StrmScanner:
         except Exception:
             return False
     
+    def _detail_level(self) -> Optional[int]:
+        """逐文件日志的级别；该级别未启用时返回 None，调用方据此跳过消息格式化"""
+        level = logging.INFO if self.verbose else logging.DEBUG
+        return level if logger.isEnabledFor(level) else None
+    
     def get_supported_extensions(self) -> Dict[str, Set[str]]:
         """获取支持的扩展名列表"""
         return {
@@ -98,86 +155,328 @@ class StrmScanner:
         directory: str, 
         target_formats: Optional[List[str]] = None,
         recursive: bool = True,
-        dry_run: bool = False
+        dry_run: bool = False,
+        deadline: Optional[float] = None,
+        resume_after: Optional[str] = None,
+        progress: Optional[ScanProgress] = None,
+        record_history: bool = True
     ) -> Dict[str, any]:
         """
         扫描目录中的 .strm 文件并处理软链接
         
+        目录按名称顺序遍历，边遍历边处理；到达 deadline 时在下一个检查点停止
+        （不再提交新文件，等待已提交的文件处理完），并返回断点供下次续扫
+        
         Args:
             directory: 扫描的目录路径
             target_formats: 目标视频格式列表（已废弃，保留兼容性）
             recursive: 是否递归扫描子目录
             dry_run: 是否只是预览不实际执行
-            
+            deadline: 截止时间（time.time() 时间戳），None 表示不限时
+            resume_after: 上次超时返回的断点，跳过遍历顺序在其之前（含）的文件和目录
+            progress: 进度对象，供扫描任务状态查询（由调用方结束）；为空时按扫描历史创建
+            record_history: 完整扫描后是否记录目录数，供下次估算进度
+        
         Returns:
-            包含扫描结果的字典
+            包含扫描结果的字典，超时时 timed_out 为 True 且 checkpoint 为断点
         """
         start_time = time.time()
         directory_path = Path(directory)
         
-        if not directory_path.exists():
+        # 挂载点熔断中时直接失败，不再访问
+        fs_guard.check(directory)
+        exists, is_dir = fs_guard.call(
+            directory,
+            lambda: (directory_path.exists(), directory_path.is_dir()),
+            description=f"检查目录 {directory}"
+        )
+        
+        if not exists:
             raise FileNotFoundError(f"目录不存在: {directory}")
         
-        if not directory_path.is_dir():
+        if not is_dir:
             raise ValueError(f"路径不是目录: {directory}")
         
         logger.info(f"开始扫描目录: {directory} (递归: {recursive}, 预览模式: {dry_run})")
         logger.info(f"支持的视频格式: {', '.join(sorted(self.video_extensions))}")
         logger.info(f"支持的元数据格式: {', '.join(sorted(self.metadata_extensions))}")
         
-        # 收集所有 .strm 文件
-        strm_files = self._find_strm_files(directory_path, recursive)
-        logger.info(f"找到 {len(strm_files)} 个 .strm 文件")
+        # 扫描配置和所在设备的 I/O 预算
+        throttle = io_budget.throttle_for(directory, self.ops_per_second, self.adaptive_throttle)
         
-        if not strm_files:
-            return {
-                "success": True,
-                "directory": directory,
-                "total_files": 0,
-                "processed": 0,
-                "created_links": 0,
-                "skipped": 0,
-                "errors": [],
-                "details": [],
-                "duration": time.time() - start_time
-            }
+        if resume_after:
+            logger.info(f"从断点续扫: {resume_after}")
+        
+        owns_progress = progress is None
+        if owns_progress:
+            progress = scan_history.new_progress(directory, recursive)
+        if resume_after:
+            # 断点之前的子树不会计入已遍历目录，与完整扫描的目录数不可比，只报告计数
+            progress.expected_directories = None
+        
+        # 边遍历边处理软链接创建（按所在存储设备调度）
+        position = WalkPosition(resume_after)
+        strm_files = self._iter_strm_files(
+            directory_path, recursive, throttle, resume_after, deadline, progress, position
+        )
+        results = self._process_strm_files(
+            strm_files,
+            dry_run,
+            device=get_device_id(directory),
+            throttle=throttle,
+            deadline=deadline,
+            progress=progress
+        )
+        logger.info(
+            f"扫描汇总: {directory}, .strm 文件 {results['submitted']} 个, "
+            f"新建链接 {results['created']} 个, 已存在 {results['existing']} 个, "
+            f"冲突 {results['conflicts']} 个, 失败 {len(results['errors'])} 个"
+        )
         
-        # 处理软链接创建
-        results = self._process_strm_files(strm_files, dry_run)
+        if owns_progress:
+            progress.finish()
+        if record_history and not results["timed_out"] and not resume_after:
+            # 只有完整遍历的目录数可用于下次的进度估算
+            scan_history.record(directory, recursive, progress)
         
         duration = time.time() - start_time
-        logger.info(f"扫描完成，耗时: {duration:.2f}秒")
+        if results["timed_out"]:
+            logger.warning(f"扫描达到时间限制，已在断点处停止: {directory}, 断点: {position.checkpoint}")
+        else:
+            logger.info(f"扫描完成，耗时: {duration:.2f}秒")
         
         return {
             "success": True,
             "directory": directory,
-            "total_files": len(strm_files),
+            "total_files": results["submitted"],
             "processed": results["processed"],
             "created_links": results["created"],
             "skipped": results["skipped"],
             "errors": results["errors"],
             "details": results["details"],
-            "duration": duration
+            "duration": duration,
+            "timed_out": results["timed_out"],
+            "checkpoint": position.checkpoint if results["timed_out"] else None
         }
     
-    def _find_strm_files(self, directory: Path, recursive: bool) -> List[Path]:
-        """查找目录中的所有 .strm 文件"""
-        strm_files = []
+    def _find_strm_files(
+        self,
+        directory: Path,
+        recursive: bool,
+        throttle: Optional[IoThrottle] = None
+    ) -> List[Path]:
+        """查找目录中的所有 .strm 文件（逐目录列举，每次列举计入 I/O 预算）"""
+        return list(self._iter_strm_files(directory, recursive, throttle))
+    
+    def _iter_strm_files(
+        self,
+        directory: Path,
+        recursive: bool,
+        throttle: Optional[IoThrottle] = None,
+        resume_after: Optional[str] = None,
+        deadline: Optional[float] = None,
+        progress: Optional[ScanProgress] = None,
+        position: Optional[WalkPosition] = None
+    ) -> Iterator[Path]:
+        """
+        按遍历顺序逐个产出 .strm 文件
         
-        try:
+        遍历顺序为目录按名称的先序遍历、目录内文件按名称排序，
+        resume_after 之前（含）的文件及完全位于其之前的子目录被跳过；
+        超过 deadline 后停止遍历。position 随遍历推进，调用方取下一个文件时
+        之前产出的文件都已被处理
+        """
+        checkpoint_dir, checkpoint_name = _parse_checkpoint(resume_after)
+        
+        for current_dir, entries in self._iter_listings(directory, recursive, throttle, checkpoint_dir):
+            dir_parts = Path(current_dir).parts
+            if progress:
+                progress.directory_visited()
+            if checkpoint_dir is not None and (
+                dir_parts < checkpoint_dir or (checkpoint_name is None and dir_parts == checkpoint_dir)
+            ):
+                # 断点所在目录的祖先目录或已完成的断点目录：其中的文件已在上次处理
+                continue
+            
+            for entry in sorted(entries, key=lambda e: e.name):
+                if (
+                    checkpoint_dir is not None
+                    and dir_parts == checkpoint_dir
+                    and (checkpoint_name is None or entry.name <= checkpoint_name)
+                ):
+                    continue
+                try:
+                    if entry.name.endswith('.strm') and entry.is_file():
+                        file_path = Path(entry.path)
+                        if self._is_valid_strm(file_path):
+                            if progress:
+                                progress.file_found()
+                            if position:
+                                position.checkpoint = str(file_path)
+                            yield file_path
+                except OSError:
+                    continue
+            
+            # 取到这里说明本目录的文件都已交给调用方
+            if position:
+                position.checkpoint = os.path.join(current_dir, "")
+            
+            if deadline is not None and time.time() >= deadline:
+                return
+    
+    def _iter_listings(
+        self,
+        directory: Path,
+        recursive: bool,
+        throttle: Optional[IoThrottle] = None,
+        skip_before: Optional[Tuple[str, ...]] = None
+    ) -> Iterator[Tuple[str, List[os.DirEntry]]]:
+        """
+        按名称顺序先序遍历目录，产出 (目录路径, 目录项列表)，每次列举计入 I/O 预算
+        
+        skip_before 为目录路径的 parts，遍历顺序完全在其之前的子目录不再列举
+        """
+        pending_dirs = [str(directory)]
+        
+        while pending_dirs:
+            current_dir = pending_dirs.pop()
+            
+            try:
+                with _io_op(throttle):
+                    entries = fs_guard.call(current_dir, _list_directory, current_dir, description=f"列举目录 {current_dir}")
+            except MountUnavailableError:
+                # 挂载点已熔断，放弃整个遍历
+                raise
+            except OSError as e:
+                logger.error(f"搜索 .strm 文件时出错: {current_dir}: {e}")
+                continue
+            
             if recursive:
-                pattern = "**/*.strm"
-            else:
-                pattern = "*.strm"
+                subdirs = []
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.path)
+                    except OSError:
+                        continue
+                
+                for subdir in sorted(subdirs, reverse=True):
+                    if skip_before is not None:
+                        parts = Path(subdir).parts
+                        if parts < skip_before and skip_before[:len(parts)] != parts:
+                            continue
+                    pending_dirs.append(subdir)
             
-            for file_path in directory.glob(pattern):
-                if file_path.is_file() and self._is_valid_strm(file_path):
-                    strm_files.append(file_path)
+            yield current_dir, entries
+    
+    def scan_new_extensions(
+        self,
+        directory: str,
+        metadata_extensions: Iterable[str] = (),
+        video_extensions: Iterable[str] = (),
+        recursive: bool = True,
+        dry_run: bool = False
+    ) -> Dict[str, any]:
+        """
+        只为新增的扩展名补建链接（扩展名增量扫描）
         
-        except Exception as e:
-            logger.error(f"搜索 .strm 文件时出错: {e}")
+        只根据目录列举中的文件名后缀筛选，不对每个元数据扩展名逐一 stat：
+        - 新增元数据扩展名：为已有 .strm 文件补建该扩展名的链接
+        - 新增视频扩展名：按全部元数据扩展名处理新匹配的 .strm 文件
+        筛选出的文件与完整扫描一样经工作调度器的批量队列创建链接
+        
+        Args:
+            directory: 扫描的目录路径
+            metadata_extensions: 新增的元数据扩展名
+            video_extensions: 新增的视频扩展名
+            recursive: 是否递归扫描子目录
+            dry_run: 是否只是预览不实际执行
+        """
+        start_time = time.time()
+        directory_path = Path(directory)
+        
+        fs_guard.check(directory)
+        if not fs_guard.call(directory_path, directory_path.is_dir, description=f"检查目录 {directory}"):
+            raise FileNotFoundError(f"目录不存在或不是目录: {directory}")
+        
+        new_metadata = {ext if ext.startswith('.') else '.' + ext for ext in metadata_extensions}
+        new_metadata = {ext.lower() for ext in new_metadata}
+        new_video = {ext.lstrip('.').lower() for ext in video_extensions}
+        valid_video = {ext.lstrip('.') for ext in self.video_extensions} | new_video
+        
+        logger.info(
+            f"开始扩展名增量扫描: {directory} "
+            f"(元数据: {', '.join(sorted(new_metadata)) or '无'}, "
+            f"视频: {', '.join(sorted(new_video)) or '无'})"
+        )
+        
+        throttle = io_budget.throttle_for(directory, self.ops_per_second, self.adaptive_throttle)
+        counts = {"total_files": 0, "unchanged": 0}
+        file_extensions: Dict[Path, Set[str]] = {}
+        
+        def candidates() -> Iterator[Path]:
+            """按目录列举筛选需要补建链接的 .strm 文件，并登记各自要处理的元数据扩展名"""
+            for current_dir, entries in self._iter_listings(directory_path, recursive, throttle):
+                names = {entry.name for entry in entries}
+                
+                for name in sorted(names):
+                    match = self.strm_pattern.match(name)
+                    if not match or match.group(2).lower() not in valid_video:
+                        continue
+                    
+                    base_name, video_ext = match.group(1), match.group(2)
+                    strm_file = Path(current_dir) / name
+                    counts["total_files"] += 1
+                    
+                    if video_ext.lower() in new_video:
+                        # 新匹配的 .strm 文件：按全部元数据扩展名处理
+                        yield strm_file
+                        continue
+                    
+                    # 已有 .strm 文件：只处理目录中存在源文件且还没有链接的新元数据扩展名
+                    missing = {
+                        ext for ext in new_metadata
+                        if f"{base_name}{ext}" in names and f"{base_name}.({video_ext}){ext}" not in names
+                    }
+                    if missing:
+                        file_extensions[strm_file] = missing
+                        yield strm_file
+                    else:
+                        counts["unchanged"] += 1
         
-        return strm_files
+        # 链接创建与完整扫描一样交给工作调度器的批量队列，按所在设备调度
+        results = self._process_strm_files(
+            candidates(),
+            dry_run,
+            device=get_device_id(directory),
+            throttle=throttle,
+            file_extensions=file_extensions
+        )
+        total_files = counts["total_files"]
+        processed = results["processed"] + counts["unchanged"]
+        created = results["created"]
+        skipped = results["skipped"] + counts["unchanged"]
+        errors = results["errors"]
+        details = results["details"]
+        
+        duration = time.time() - start_time
+        logger.info(
+            f"扩展名增量扫描完成: {directory}, 检查 {total_files} 个 .strm 文件, "
+            f"创建 {created} 个链接, 耗时: {duration:.2f}秒"
+        )
+        
+        return {
+            "success": True,
+            "directory": directory,
+            "total_files": total_files,
+            "processed": processed,
+            "created_links": created,
+            "skipped": skipped,
+            "errors": errors,
+            "details": details,
+            "duration": duration,
+            "scan_mode": "extension_delta"
+        }
     
     def _is_valid_strm(self, strm_path: Path) -> bool:
         """判断是否是有效的 .strm 文件"""
@@ -191,31 +490,76 @@ class StrmScanner:
     
     def _process_strm_files(
         self, 
-        strm_files: List[Path], 
-        dry_run: bool
+        strm_files: Iterable[Path], 
+        dry_run: bool,
+        priority: int = PRIORITY_BULK,
+        device: Optional[int] = None,
+        throttle: Optional[IoThrottle] = None,
+        file_extensions: Optional[Dict[Path, Set[str]]] = None,
+        deadline: Optional[float] = None,
+        progress: Optional[ScanProgress] = None
     ) -> Dict[str, any]:
-        """批量处理 .strm 文件"""
+        """
+        批量处理 .strm 文件
+        
+        file_extensions 可为每个文件单独指定要处理的元数据扩展名（共享扫描时使用），
+        未指定的文件使用扫描器自身的扩展名；
+        超过 deadline 后不再提交新文件并等待在途文件处理完（断点由遍历位置 WalkPosition 给出）
+        """
         processed = 0
         created = 0
         skipped = 0
+        existing = 0
+        conflicts = 0
         errors = []
         details = []
         
-        # 使用线程池提高处理效率
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            # 提交所有任务
-            future_to_file = {
-                executor.submit(
-                    self._process_single_strm, 
-                    strm_file, 
-                    dry_run
-                ): strm_file 
-                for strm_file in strm_files
-            }
+        # 通过共享工作调度器处理，批量任务让位于文件监听的实时任务；
+        # 限制在途任务数量，避免一次性把整个媒体库塞进队列
+        max_in_flight = work_scheduler.bulk_workers * 2
+        pending_files = iter(strm_files)
+        future_to_file = {}
+        
+        # 超时后不再提交新文件，等待在途文件处理完
+        submitted = 0
+        exhausted = False
+        timed_out = False
+        
+        while True:
+            while not exhausted and not timed_out and len(future_to_file) < max_in_flight:
+                if deadline is not None and time.time() >= deadline:
+                    timed_out = True
+                    break
+                
+                strm_file = next(pending_files, None)
+                if strm_file is None:
+                    exhausted = True
+                    # 文件遍历可能因超时提前结束
+                    timed_out = deadline is not None and time.time() >= deadline
+                    break
+                
+                future = work_scheduler.submit(
+                    self._process_single_strm,
+                    strm_file,
+                    dry_run,
+                    throttle,
+                    file_extensions.get(strm_file) if file_extensions else None,
+                    priority=priority,
+                    device=device
+                )
+                future_to_file[future] = strm_file
+                submitted += 1
+            
+            if not future_to_file:
+                break
+            
+            done, _ = wait(future_to_file, return_when=FIRST_COMPLETED)
             
             # 收集结果
-            for future in as_completed(future_to_file):
-                strm_file = future_to_file[future]
+            for future in done:
+                strm_file = future_to_file.pop(future)
+                if progress:
+                    progress.file_processed()
                 
                 try:
                     result = future.result()
@@ -223,6 +567,8 @@ class StrmScanner:
                     
                     if result["success"]:
                         created += result["links_created"]
+                        existing += result.get("existing_links", 0)
+                        conflicts += result.get("conflicts", 0)
                         if result["links_created"] == 0:
                             skipped += 1
                     else:
@@ -235,7 +581,7 @@ class StrmScanner:
                         "file": str(strm_file),
                         "result": result
                     })
-                    
+                
                 except Exception as e:
                     logger.error(f"处理文件 {strm_file} 时出错: {e}")
                     errors.append({
@@ -244,9 +590,13 @@ class StrmScanner:
                     })
         
         return {
+            "submitted": submitted,
+            "timed_out": timed_out,
             "processed": processed,
             "created": created,
             "skipped": skipped,
+            "existing": existing,
+            "conflicts": conflicts,
             "errors": errors,
             "details": details
         }
@@ -254,7 +604,9 @@ class StrmScanner:
     def _process_single_strm(
         self, 
         strm_file: Path, 
-        dry_run: bool
+        dry_run: bool,
+        throttle: Optional[IoThrottle] = None,
+        metadata_extensions: Optional[Set[str]] = None
     ) -> Dict[str, any]:
         """处理单个 .strm 文件"""
         try:
@@ -279,11 +631,13 @@ class StrmScanner:
             video_link_path = parent_dir / video_link_name
             
             # 完全跳过视频软链接创建
-            logger.info(f"跳过视频软链接创建: {video_link_path} (功能已禁用)")
+            level = self._detail_level()
+            if level:
+                logger.log(level, f"跳过视频软链接创建: {video_link_path} (功能已禁用)")
             
             # 2. 查找并创建对应的元数据软链接
             metadata_links_created = self._create_metadata_links(
-                parent_dir, base_name, video_ext, dry_run
+                parent_dir, base_name, video_ext, dry_run, throttle, metadata_extensions
             )
             links_created += metadata_links_created["count"]
             created_links.extend(metadata_links_created["links"])
@@ -292,10 +646,12 @@ class StrmScanner:
                 "success": True,
                 "links_created": links_created,
                 "created_links": created_links,
+                "existing_links": metadata_links_created["existing"],
+                "conflicts": metadata_links_created["conflicts"],
                 "base_name": base_name,
                 "video_extension": video_ext
             }
-            
+        
         except Exception as e:
             logger.error(f"处理 .strm 文件 {strm_file} 时出错: {e}")
             return {
@@ -309,80 +665,146 @@ class StrmScanner:
         parent_dir: Path, 
         base_name: str, 
         video_ext: str, 
-        dry_run: bool
+        dry_run: bool,
+        throttle: Optional[IoThrottle] = None,
+        metadata_extensions: Optional[Set[str]] = None
     ) -> Dict[str, any]:
-        """创建元数据软链接"""
+        """
+        创建元数据软链接（stat 和链接操作计入 I/O 预算）
+        
+        所有元数据扩展名的存在性检查合并为一次受超时保护的调用，
+        挂载点卡死时不会阻塞工作线程
+        """
         links_created = 0
         created_links = []
+        existing = 0
+        conflicts = 0
+        extensions = metadata_extensions or self.metadata_extensions
+        detail_level = self._detail_level()
         
         # 查找所有可能的元数据文件
-        for metadata_ext in self.metadata_extensions:
-            # 查找源元数据文件 (xxx.nfo, xxx.srt 等)
-            source_metadata_file = parent_dir / f"{base_name}{metadata_ext}"
-            
-            if source_metadata_file.exists():
-                # 创建对应的元数据软链接 (xxx.(mp4).nfo -> xxx.nfo)
-                metadata_link_name = f"{base_name}.({video_ext}){metadata_ext}"
-                metadata_link_path = parent_dir / metadata_link_name
-                
-                # 安全检查：如果目标元数据文件已存在且不是软链接，则跳过
-                if metadata_link_path.exists():
-                    if metadata_link_path.is_file() and not metadata_link_path.is_symlink():
-                        logger.warning(f"跳过创建元数据链接，文件已存在且不是软链接: {metadata_link_path}")
-                        continue
-                    elif metadata_link_path.is_symlink():
-                        # 如果是软链接，检查是否指向正确的文件
-                        try:
-                            target = metadata_link_path.readlink()
-                            if target == source_metadata_file:
-                                logger.info(f"元数据软链接已存在且正确: {metadata_link_path} -> {source_metadata_file}")
-                            else:
-                                logger.warning(f"元数据软链接存在但指向错误目标: {metadata_link_path} -> {target} (期望: {source_metadata_file})")
-                        except Exception as e:
-                            logger.warning(f"检查元数据软链接失败: {metadata_link_path}, 错误: {e}")
-                        continue
-                
-                # 文件不存在，可以安全创建
-                if not dry_run:
-                    try:
-                        if self.is_windows and not self.has_admin_rights:
-                            # Windows 下没有管理员权限，尝试创建硬链接
-                            try:
-                                metadata_link_path.hardlink_to(source_metadata_file)
-                                logger.info(f"创建元数据硬链接: {metadata_link_path} -> {source_metadata_file}")
-                                links_created += 1
-                                created_links.append(str(metadata_link_path))
-                            except OSError:
-                                # 如果硬链接也失败，尝试复制文件
-                                import shutil
-                                shutil.copy2(source_metadata_file, metadata_link_path)
-                                logger.info(f"复制元数据文件: {metadata_link_path} <- {source_metadata_file}")
-                                links_created += 1
-                                created_links.append(str(metadata_link_path))
-                        else:
-                            metadata_link_path.symlink_to(source_metadata_file)
-                            logger.info(f"创建元数据软链接: {metadata_link_path} -> {source_metadata_file}")
-                            links_created += 1
-                            created_links.append(str(metadata_link_path))
-                    except OSError as e:
-                        logger.error(f"创建元数据链接失败: {metadata_link_path} -> {source_metadata_file}: {e}")
-                        # 继续处理其他文件，不中断整个流程
+        with _io_op(throttle, len(extensions)):
+            found = fs_guard.call(
+                parent_dir,
+                self._probe_metadata_files,
+                parent_dir, base_name, video_ext, extensions,
+                description=f"检查元数据文件 {parent_dir / base_name}"
+            )
+        
+        for source_metadata_file, metadata_link_path, link_state, target in found:
+            # 安全检查：如果目标元数据文件已存在且不是软链接，则跳过
+            if link_state == "file":
+                conflicts += 1
+                logger.warning(f"跳过创建元数据链接，文件已存在且不是软链接: {metadata_link_path}")
+                continue
+            elif link_state == "symlink":
+                # 如果是软链接，检查是否指向正确的文件
+                if isinstance(target, Exception):
+                    logger.warning(f"检查元数据软链接失败: {metadata_link_path}, 错误: {target}")
+                elif target == source_metadata_file:
+                    existing += 1
+                    if detail_level:
+                        logger.log(detail_level, f"元数据软链接已存在且正确: {metadata_link_path} -> {source_metadata_file}")
                 else:
+                    conflicts += 1
+                    logger.warning(f"元数据软链接存在但指向错误目标: {metadata_link_path} -> {target} (期望: {source_metadata_file})")
+                continue
+            
+            # 文件不存在，可以安全创建
+            if not dry_run:
+                try:
+                    with _io_op(throttle):
+                        fs_guard.call(
+                            metadata_link_path,
+                            self._link_metadata_file,
+                            metadata_link_path, source_metadata_file,
+                            description=f"创建元数据链接 {metadata_link_path}"
+                        )
                     links_created += 1
                     created_links.append(str(metadata_link_path))
-                    logger.info(f"[预览] 将创建元数据软链接: {metadata_link_path} -> {source_metadata_file}")
+                except OSError as e:
+                    logger.error(f"创建元数据链接失败: {metadata_link_path} -> {source_metadata_file}: {e}")
+                    # 继续处理其他文件，不中断整个流程
+            else:
+                links_created += 1
+                created_links.append(str(metadata_link_path))
+                if detail_level:
+                    logger.log(detail_level, f"[预览] 将创建元数据软链接: {metadata_link_path} -> {source_metadata_file}")
         
         return {
             "count": links_created,
-            "links": created_links
+            "links": created_links,
+            "existing": existing,
+            "conflicts": conflicts
         }
     
+    @staticmethod
+    def _probe_metadata_files(
+        parent_dir: Path,
+        base_name: str,
+        video_ext: str,
+        extensions: Iterable[str]
+    ) -> List[Tuple[Path, Path, str, any]]:
+        """
+        检查元数据源文件和对应链接的状态（在受保护的线程中执行）
+        
+        Returns:
+            [(源文件, 链接路径, 链接状态, 软链接目标)]，链接状态为
+            missing（不存在）、file（普通文件）、symlink（软链接）或 other
+        """
+        found = []
+        for metadata_ext in extensions:
+            # 查找源元数据文件 (xxx.nfo, xxx.srt 等)
+            source_metadata_file = parent_dir / f"{base_name}{metadata_ext}"
+            if not source_metadata_file.exists():
+                continue
+            
+            # 对应的元数据软链接 (xxx.(mp4).nfo -> xxx.nfo)
+            metadata_link_path = parent_dir / f"{base_name}.({video_ext}){metadata_ext}"
+            target = None
+            if not metadata_link_path.exists():
+                link_state = "missing"
+            elif metadata_link_path.is_file() and not metadata_link_path.is_symlink():
+                link_state = "file"
+            elif metadata_link_path.is_symlink():
+                link_state = "symlink"
+                try:
+                    target = metadata_link_path.readlink()
+                except Exception as e:
+                    target = e
+            else:
+                link_state = "other"
+            
+            found.append((source_metadata_file, metadata_link_path, link_state, target))
+        
+        return found
+    
+    def _link_metadata_file(self, metadata_link_path: Path, source_metadata_file: Path):
+        """创建单个元数据链接，Windows 无管理员权限时降级为硬链接或复制"""
+        level = self._detail_level()
+        if self.is_windows and not self.has_admin_rights:
+            # Windows 下没有管理员权限，尝试创建硬链接
+            try:
+                metadata_link_path.hardlink_to(source_metadata_file)
+                if level:
+                    logger.log(level, f"创建元数据硬链接: {metadata_link_path} -> {source_metadata_file}")
+            except OSError:
+                # 如果硬链接也失败，尝试复制文件
+                import shutil
+                shutil.copy2(source_metadata_file, metadata_link_path)
+                if level:
+                    logger.log(level, f"复制元数据文件: {metadata_link_path} <- {source_metadata_file}")
+        else:
+            metadata_link_path.symlink_to(source_metadata_file)
+            if level:
+                logger.log(level, f"创建元数据软链接: {metadata_link_path} -> {source_metadata_file}")
+    
     def cleanup_broken_links(self, directory: str, recursive: bool = True) -> Dict[str, any]:
         """清理目录中的损坏软链接"""
         start_time = time.time()
         directory_path = Path(directory)
         
-        if not directory_path.exists():
+        if not fs_guard.call(directory_path, directory_path.exists, description=f"检查目录 {directory}"):
             raise FileNotFoundError(f"目录不存在: {directory}")
         
         logger.info(f"开始清理损坏的软链接: {directory}")
@@ -391,17 +813,20 @@ class StrmScanner:
         errors = []
         
         try:
-            if recursive:
-                pattern = "**/*"
-            else:
-                pattern = "*"
-            
-            for file_path in directory_path.glob(pattern):
-                if file_path.is_symlink() and not file_path.exists():
+            for _, entries in self._iter_listings(directory_path, recursive):
+                for entry in entries:
+                    if not entry.is_symlink():
+                        continue
+                    
+                    file_path = Path(entry.path)
                     try:
-                        file_path.unlink()
+                        if fs_guard.call(file_path, file_path.exists, description=f"检查软链接 {file_path}"):
+                            continue
+                        fs_guard.call(file_path, file_path.unlink, description=f"删除软链接 {file_path}")
                         removed_count += 1
                         logger.info(f"删除损坏的软链接: {file_path}")
+                    except MountUnavailableError:
+                        raise
                     except Exception as e:
                         error_msg = f"删除软链接 {file_path} 失败: {str(e)}"
                         logger.error(error_msg)
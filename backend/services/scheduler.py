@@ -3,28 +3,55 @@
 管理扫描任务的定时执行
 """
 
+import random
 import threading
-from typing import Dict, List, Optional, Callable
-from datetime import datetime
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Callable, Tuple
+from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.job import Job
 
 from services.logger import get_logger
+from services.event_bus import EventBus, POLICY_DROP_OLDEST
 from services.scanner import StrmScanner
+from services.dirty_tracker import dirty_tracker
+from services.task_store import TaskStore
+from services.scan_governor import ScanJob, scan_governor, make_scan_key
+from services.devices import get_device_id
+from services.shared_scan import roots_overlap, scan_shared
+from services.scan_progress import ScanProgress, scan_history
+from services.scan_reports import scan_reports
+from services.dir_summary import dir_summary
 
 logger = get_logger(__name__)
 
+# 错峰调度默认参数（秒）
+DEFAULT_STAGGER_WINDOW = 1800  # 同一设备上的任务最多推迟的时间
+DEFAULT_STAGGER_JITTER = 0  # 额外的随机抖动上限
+DEFAULT_TASK_DURATION = 60  # 没有历史记录时估计的任务耗时
+DEFAULT_OVERLAP_WINDOW = 900  # 关闭错峰时，合并扫描即将到期的重叠任务的时间窗口
+
 class SchedulerService:
     """定时任务调度服务"""
     
-    def __init__(self):
+    def __init__(self, task_store: Optional[TaskStore] = None):
         self.scheduler = None
+        self.task_store = task_store or TaskStore()  # 任务配置和运行历史的持久化存储
         self.scanner = StrmScanner()
         self.is_running = False
         self._lock = threading.Lock()
-        self.job_callbacks = []  # 任务执行回调
+        self.events = EventBus("scheduler")  # 事件总线，异步通知回调函数
+        
+        # 错峰调度：同一设备上同时触发的任务按历史耗时依次推迟
+        stagger = self.task_store.get_setting("stagger") or {}
+        self.stagger_window = stagger.get("window", DEFAULT_STAGGER_WINDOW)
+        self.stagger_jitter = stagger.get("jitter", DEFAULT_STAGGER_JITTER)
+        self._stagger_lock = threading.Lock()
+        self._device_next_slot: Dict[Optional[int], float] = {}  # 设备号 -> 下一个空闲时间点
         
         # 预定义的任务配置
         self.tasks = {}  # task_id -> task_config
@@ -49,6 +76,9 @@ class SchedulerService:
                 self.is_running = True
                 
                 logger.info("定时任务调度器启动成功")
+                
+                # 恢复持久化的任务
+                self._restore_tasks()
                 return True
                 
             except Exception as e:
@@ -76,6 +106,45 @@ class SchedulerService:
                 logger.error(f"停止调度器失败: {e}")
                 return False
     
+    def _restore_tasks(self):
+        """从任务存储恢复定时任务及其运行统计"""
+        # 新的调度器实例中没有任何 job，以存储为准重建任务列表
+        self.tasks.clear()
+        restored = 0
+        
+        for stored in self.task_store.load_tasks():
+            task_id = stored["task_id"]
+            success = self.add_scan_task(
+                task_id=task_id,
+                directory=stored["directory"],
+                target_formats=stored.get("target_formats") or [],
+                schedule_type=stored["schedule_type"],
+                schedule_params=stored["schedule_params"],
+                enabled=stored.get("enabled", True),
+                recursive=stored.get("recursive", True),
+                custom_video_extensions=stored.get("custom_video_extensions"),
+                custom_metadata_extensions=stored.get("custom_metadata_extensions"),
+                skip_watched=stored.get("skip_watched", True),
+                ops_per_second=stored.get("ops_per_second"),
+                adaptive_throttle=stored.get("adaptive_throttle", False),
+                time_limit=stored.get("time_limit")
+            )
+            
+            if success:
+                last_runs = self.task_store.get_runs(task_id, 1)
+                self.tasks[task_id].update({
+                    "created_at": stored["created_at"],
+                    "last_run": stored["last_run"],
+                    "run_count": stored["run_count"],
+                    "checkpoint": stored.get("checkpoint"),
+                    "checkpoint_started_at": stored.get("checkpoint_started_at"),
+                    "last_status": last_runs[0]["status"] if last_runs else None
+                })
+                restored += 1
+        
+        if restored:
+            logger.info(f"恢复了 {restored} 个定时任务")
+    
     def add_scan_task(
         self,
         task_id: str,
@@ -86,7 +155,11 @@ class SchedulerService:
         enabled: bool = True,
         recursive: bool = True,
         custom_video_extensions: List[str] = None,
-        custom_metadata_extensions: List[str] = None
+        custom_metadata_extensions: List[str] = None,
+        skip_watched: bool = True,
+        ops_per_second: Optional[float] = None,
+        adaptive_throttle: bool = False,
+        time_limit: Optional[float] = None
     ) -> bool:
         """
         添加扫描任务
@@ -101,16 +174,18 @@ class SchedulerService:
                 - interval: {'hours': 6} 每6小时执行一次
             enabled: 是否启用任务
             recursive: 是否递归扫描
+            skip_watched: 是否跳过文件监听服务已实时处理的目录树，
+                只补扫监听服务标记的脏目录
+            ops_per_second: 每秒文件系统操作数上限（I/O 预算）
+            adaptive_throttle: 是否根据存储延迟自动退避
+            time_limit: 单次运行的最长时间（秒），到时在下一个检查点停止，
+                下次运行从断点续扫；None 表示不限时
         """
         if not self.is_running or not self.scheduler:
             logger.error("调度器未运行，无法添加任务")
             return False
         
         try:
-            # 移除已存在的任务
-            if task_id in self.tasks:
-                self.remove_task(task_id)
-            
             # 创建触发器
             if schedule_type == 'cron':
                 trigger = CronTrigger(**schedule_params)
@@ -119,6 +194,11 @@ class SchedulerService:
             else:
                 raise ValueError(f"不支持的调度类型: {schedule_type}")
             
+            # 更新已存在的任务：只重建调度 job，保留运行统计和存储中的记录
+            previous = self.tasks.get(task_id)
+            if previous:
+                self._remove_jobs(task_id)
+            
             # 任务配置
             task_config = {
                 "task_id": task_id,
@@ -130,15 +210,25 @@ class SchedulerService:
                 "enabled": enabled,
                 "custom_video_extensions": custom_video_extensions or [],
                 "custom_metadata_extensions": custom_metadata_extensions or [],
+                "skip_watched": skip_watched,
+                "ops_per_second": ops_per_second,
+                "adaptive_throttle": adaptive_throttle,
+                "time_limit": time_limit,
                 "created_at": datetime.now(),
                 "last_run": None,
-                "run_count": 0
+                "run_count": 0,
+                "checkpoint": None,  # 上次超时运行的断点
+                "checkpoint_started_at": None,  # 首次超时运行的开始时间
+                "last_status": None  # 最近一次运行的状态 (success, timed_out, error)
             }
             
+            if previous:
+                self._carry_over_stats(previous, task_config)
+            
             # 添加任务
             if enabled:
                 job = self.scheduler.add_job(
-                    func=self._execute_scan_task,
+                    func=self._run_scheduled_task,
                     trigger=trigger,
                     args=[task_id],
                     id=task_id,
@@ -148,6 +238,7 @@ class SchedulerService:
                 task_config["job"] = job
             
             self.tasks[task_id] = task_config
+            self.task_store.save_task(task_config)
             
             logger.info(f"添加定时扫描任务: {task_id} -> {directory} ({schedule_type})")
             return True
@@ -156,6 +247,34 @@ class SchedulerService:
             logger.error(f"添加任务失败: {e}")
             return False
     
+    def _carry_over_stats(self, previous: Dict, task_config: Dict):
+        """
+        更新任务时沿用原任务的运行统计
+        
+        扫描范围或扩展名变化后，上次运行和断点不再覆盖新的规则，
+        清除 last_run 和断点使下次运行完整扫描（运行次数和历史保留）
+        """
+        task_config.update({
+            "created_at": previous["created_at"],
+            "run_count": previous["run_count"],
+            "last_status": previous.get("last_status")
+        })
+        
+        rules_changed = any(
+            previous.get(field) != task_config.get(field)
+            for field in ("directory", "recursive", "custom_video_extensions", "custom_metadata_extensions")
+        )
+        if rules_changed:
+            if previous.get("checkpoint"):
+                self.task_store.set_checkpoint(task_config["task_id"], None)
+            return
+        
+        task_config.update({
+            "last_run": previous["last_run"],
+            "checkpoint": previous.get("checkpoint"),
+            "checkpoint_started_at": previous.get("checkpoint_started_at")
+        })
+    
     def remove_task(self, task_id: str) -> bool:
         """移除任务"""
         if task_id not in self.tasks:
@@ -164,11 +283,11 @@ class SchedulerService:
         
         try:
             # 从调度器中移除
-            if self.scheduler and self.scheduler.get_job(task_id):
-                self.scheduler.remove_job(task_id)
+            self._remove_jobs(task_id)
             
             # 从任务列表中移除
             del self.tasks[task_id]
+            self.task_store.delete_task(task_id)
             
             logger.info(f"移除定时任务: {task_id}")
             return True
@@ -197,7 +316,7 @@ class SchedulerService:
                 trigger = IntervalTrigger(**task_config["schedule_params"])
             
             job = self.scheduler.add_job(
-                func=self._execute_scan_task,
+                func=self._run_scheduled_task,
                 trigger=trigger,
                 args=[task_id],
                 id=task_id,
@@ -207,6 +326,7 @@ class SchedulerService:
             
             task_config["job"] = job
             task_config["enabled"] = True
+            self.task_store.save_task(task_config)
             
             logger.info(f"启用定时任务: {task_id}")
             return True
@@ -229,12 +349,12 @@ class SchedulerService:
         
         try:
             # 从调度器中移除
-            if self.scheduler and self.scheduler.get_job(task_id):
-                self.scheduler.remove_job(task_id)
+            self._remove_jobs(task_id)
             
             task_config["enabled"] = False
             if "job" in task_config:
                 del task_config["job"]
+            self.task_store.save_task(task_config)
             
             logger.info(f"禁用定时任务: {task_id}")
             return True
@@ -243,14 +363,226 @@ class SchedulerService:
             logger.error(f"禁用任务失败: {e}")
             return False
     
-    def _execute_scan_task(self, task_id: str):
-        """执行扫描任务"""
+    def _remove_jobs(self, task_id: str):
+        """移除任务的周期 job 及尚未触发的错峰 job"""
+        if not self.scheduler:
+            return
+        for job_id in (task_id, self._staggered_job_id(task_id)):
+            if self.scheduler.get_job(job_id):
+                self.scheduler.remove_job(job_id)
+    
+    @staticmethod
+    def _staggered_job_id(task_id: str) -> str:
+        return f"{task_id}:staggered"
+    
+    def set_stagger(self, window: float, jitter: float):
+        """
+        设置错峰调度参数
+        
+        Args:
+            window: 同一设备上的任务最多推迟的秒数，0 表示关闭错峰
+            jitter: 额外随机抖动的秒数上限
+        """
+        self.stagger_window = max(0, window)
+        self.stagger_jitter = max(0, jitter)
+        self.task_store.set_setting("stagger", {
+            "window": self.stagger_window,
+            "jitter": self.stagger_jitter
+        })
+        logger.info(f"设置错峰调度: 窗口 {self.stagger_window} 秒, 抖动 {self.stagger_jitter} 秒")
+    
+    def get_stagger(self) -> Dict:
+        """获取错峰调度参数及各设备的下一个空闲时间点"""
+        with self._stagger_lock:
+            slots = dict(self._device_next_slot)
+        
+        now = time.time()
+        return {
+            "window": self.stagger_window,
+            "jitter": self.stagger_jitter,
+            "busy_devices": sum(1 for slot in slots.values() if slot > now)
+        }
+    
+    def _estimate_duration(self, task_id: str) -> float:
+        """按历史运行耗时的中位数估计任务耗时"""
+        p50 = self.task_store.get_duration_stats(task_id)["percentiles"].get("p50")
+        return p50 if p50 is not None else DEFAULT_TASK_DURATION
+    
+    def _stagger_delay(self, task_id: str) -> float:
+        """
+        计算任务的推迟时间
+        
+        同一设备上的任务按触发顺序排队，每个任务占用其历史耗时中位数长度的时间段；
+        推迟时间不超过错峰窗口，另加随机抖动
+        """
+        device = get_device_id(self.tasks[task_id]["directory"])
+        duration = self._estimate_duration(task_id)
+        jitter = random.uniform(0, self.stagger_jitter) if self.stagger_jitter else 0
+        
+        with self._stagger_lock:
+            now = time.time()
+            delay = min(max(0.0, self._device_next_slot.get(device, now) - now), self.stagger_window)
+            delay += jitter
+            self._device_next_slot[device] = now + delay + duration
+        
+        return delay
+    
+    def _overlap_window(self) -> float:
+        return self.stagger_window or DEFAULT_OVERLAP_WINDOW
+    
+    def _overlapping_due_tasks(self, task_id: str) -> List[str]:
+        """查找与指定任务目录重叠、且即将在同一时间窗口内触发的其他任务"""
+        if not self.scheduler:
+            return []
+        
+        task_config = self.tasks[task_id]
+        deadline = datetime.now(self.scheduler.timezone) + timedelta(seconds=self._overlap_window())
+        due = []
+        
+        for other_id, other in list(self.tasks.items()):
+            if other_id == task_id or not other["enabled"]:
+                continue
+            if not roots_overlap(
+                task_config["directory"], task_config["recursive"],
+                other["directory"], other["recursive"]
+            ):
+                continue
+            if scan_governor.is_active(("task", other_id)):
+                continue
+            
+            job = self.scheduler.get_job(self._staggered_job_id(other_id)) or self.scheduler.get_job(other_id)
+            if job and job.next_run_time and job.next_run_time <= deadline:
+                due.append(other_id)
+        
+        return due
+    
+    def _mark_covered(self, task_id: str):
+        """标记任务即将到来的触发已被合并扫描覆盖"""
+        staggered_job_id = self._staggered_job_id(task_id)
+        if self.scheduler and self.scheduler.get_job(staggered_job_id):
+            # 已错峰推迟的触发直接取消
+            self.scheduler.remove_job(staggered_job_id)
+        else:
+            self.tasks[task_id]["covered_at"] = time.time()
+    
+    def _submit_task(self, task_id: str, source: str):
+        """
+        通过全局扫描控制器提交任务
+        
+        去重键与手动扫描相同：同一任务的重复触发、同一目录和规则的手动扫描合并为一次运行；
+        限时或续扫的运行可能只覆盖部分目录，只与同一任务的触发合并
+        """
+        task_config = self.tasks[task_id]
+        progress = scan_history.new_progress(task_config["directory"], task_config["recursive"])
+        key = make_scan_key(
+            task_config["directory"],
+            task_config["recursive"],
+            task_config.get("custom_video_extensions"),
+            task_config.get("custom_metadata_extensions")
+        )
+        if task_config.get("time_limit") or task_config.get("checkpoint"):
+            key += ("task", task_id)
+        
+        run = lambda: self._execute_scan_task(task_id, progress)
+        job = scan_governor.submit(
+            key,
+            run,
+            description=f"定时任务 {task_id}: {task_config['directory']}",
+            source=source,
+            path=task_config["directory"],
+            progress=progress
+        )
+        if job.fn is not run:
+            # 合并到了进行中的其他扫描，扫描完成后记为本任务的一次运行
+            job.future.add_done_callback(lambda future: self._record_merged_run(task_id, job))
+        return job
+    
+    def _record_merged_run(self, task_id: str, job: ScanJob):
+        """把合并执行的扫描记为任务的一次运行（报告已由执行扫描的一方保存）"""
+        task_config = self.tasks.get(task_id)
+        if not task_config or job.future.cancelled() or job.future.exception():
+            return
+        
+        result = job.future.result()
+        if not isinstance(result, dict) or result.get("timed_out") or result.get("scan_mode") == "incremental":
+            # 部分扫描不能代替本任务的完整运行
+            logger.info(f"定时任务 {task_id} 合并的扫描只覆盖部分目录，不计为本任务的运行")
+            return
+        
+        start_time = datetime.fromtimestamp(job.started_at)
+        dirty_tracker.clear(task_config["directory"], job.started_at, task_config["recursive"])
+        task_config["last_run"] = start_time
+        task_config["run_count"] += 1
+        task_config["last_status"] = "success"
+        self.task_store.record_run(task_id, start_time, datetime.now(), "success", result=result)
+        logger.info(f"定时任务 {task_id} 已合并到进行中的扫描: {job.description}")
+    
+    def _run_scheduled_task(self, task_id: str):
+        """调度器触发的任务入口，需要错峰时改为一次性延迟触发"""
+        if task_id not in self.tasks:
+            logger.error(f"执行任务时未找到配置: {task_id}")
+            return
+        
+        # 本次触发已被重叠任务的合并扫描提前覆盖
+        covered_at = self.tasks[task_id].pop("covered_at", None)
+        if covered_at and time.time() - covered_at <= self._overlap_window():
+            logger.info(f"定时任务 {task_id} 已在重叠任务的合并扫描中完成，跳过本次触发")
+            return
+        
+        delay = self._stagger_delay(task_id) if self.stagger_window or self.stagger_jitter else 0
+        if delay >= 1 and self.scheduler:
+            run_date = datetime.now(self.scheduler.timezone) + timedelta(seconds=delay)
+            self.scheduler.add_job(
+                func=self._run_task_and_wait,
+                trigger=DateTrigger(run_date=run_date),
+                args=[task_id],
+                id=self._staggered_job_id(task_id),
+                name=f"STRM扫描任务(错峰): {self.tasks[task_id]['directory']}",
+                replace_existing=True
+            )
+            logger.info(f"同一设备上有其他任务，定时任务 {task_id} 错峰推迟 {delay:.0f} 秒执行")
+            return
+        
+        self._run_task_and_wait(task_id)
+    
+    def _run_task_and_wait(self, task_id: str):
+        """提交任务并等待扫描完成以保持 max_instances 语义"""
         if task_id not in self.tasks:
             logger.error(f"执行任务时未找到配置: {task_id}")
             return
         
+        try:
+            self._submit_task(task_id, "scheduler").future.result()
+        except Exception as e:
+            # 执行中的错误已由 _execute_scan_task 记录
+            logger.error(f"定时任务 {task_id} 未能完成: {e}")
+    
+    def _record_run(
+        self,
+        task_id: str,
+        start_time: datetime,
+        status: str,
+        result: Dict,
+        last_run: Optional[datetime] = None
+    ):
+        """记录一次有扫描结果的运行，保存逐文件扫描报告并更新目录摘要索引"""
+        run_id = self.task_store.record_run(
+            task_id, start_time, datetime.now(), status, result=result, last_run=last_run
+        )
+        scan_reports.record(result, label=f"定时任务 {task_id}", source="scheduler", run_id=run_id)
+        dir_summary.apply_scan_result(result)
+    
+    def _execute_scan_task(self, task_id: str, progress: Optional[ScanProgress] = None) -> Optional[Dict]:
+        """执行扫描任务，返回扫描结果（合并进来的手动扫描请求使用同一结果），出错时记录后重新抛出"""
+        if task_id not in self.tasks:
+            logger.error(f"执行任务时未找到配置: {task_id}")
+            return None
+        
         task_config = self.tasks[task_id]
         start_time = datetime.now()
+        if progress is None:
+            progress = scan_history.new_progress(task_config["directory"], task_config["recursive"])
+        task_config["progress"] = progress
         
         logger.info(f"开始执行定时扫描任务: {task_id}")
         
@@ -258,24 +590,99 @@ class SchedulerService:
             # 创建扫描器实例，应用自定义扩展名
             temp_scanner = StrmScanner(
                 custom_video_extensions=task_config.get("custom_video_extensions", []),
-                custom_metadata_extensions=task_config.get("custom_metadata_extensions", [])
+                custom_metadata_extensions=task_config.get("custom_metadata_extensions", []),
+                ops_per_second=task_config.get("ops_per_second"),
+                adaptive_throttle=task_config.get("adaptive_throttle", False)
             )
+            dir_summary.register_extensions(temp_scanner)
+            
+            # 监听服务自上次运行以来一直覆盖该目录时，只补扫脏目录
+            scan_started = time.time()
+            deadline = scan_started + task_config["time_limit"] if task_config.get("time_limit") else None
+            checkpoint = task_config.get("checkpoint")
+            plan = None
+            if checkpoint:
+                # 上次运行超时，从断点继续全量扫描
+                logger.info(f"定时任务 {task_id} 上次运行超时，从断点续扫")
+            elif task_config.get("skip_watched", True) and task_config["last_run"]:
+                plan = dirty_tracker.plan_scan(
+                    task_config["directory"],
+                    task_config["recursive"],
+                    task_config["last_run"].timestamp(),
+                    temp_scanner.video_extensions,
+                    temp_scanner.metadata_extensions
+                )
             
             # 执行扫描
-            result = temp_scanner.scan_directory(
-                directory=task_config["directory"],
-                target_formats=task_config["target_formats"],
-                recursive=task_config["recursive"],
-                dry_run=False
-            )
+            if plan is None:
+                # 限时或续扫的任务不与其他任务合并，保证断点只属于本任务
+                companions = [] if deadline or checkpoint else self._overlapping_due_tasks(task_id)
+                if companions:
+                    result = self._scan_with_companions(task_id, temp_scanner, companions)
+                else:
+                    result = temp_scanner.scan_directory(
+                        directory=task_config["directory"],
+                        target_formats=task_config["target_formats"],
+                        recursive=task_config["recursive"],
+                        dry_run=False,
+                        deadline=deadline,
+                        resume_after=checkpoint,
+                        progress=progress
+                    )
+                result["scan_mode"] = "full"
+            else:
+                # 增量扫描的目录数无法与完整扫描比较，只报告计数
+                progress.expected_directories = None
+                result = self._scan_dirty_directories(temp_scanner, task_config, plan, deadline, progress)
+            
+            if result.get("timed_out"):
+                # 超时：保存断点，不更新 last_run，脏目录保留到完整运行后再清除；
+                # 多次续扫时保留首次超时运行的开始时间
+                task_config["checkpoint"] = result.get("checkpoint")
+                if not task_config["checkpoint"]:
+                    task_config["checkpoint_started_at"] = None
+                elif not checkpoint or not task_config.get("checkpoint_started_at"):
+                    task_config["checkpoint_started_at"] = start_time
+                task_config["last_status"] = "timed_out"
+                self.task_store.set_checkpoint(
+                    task_id, task_config["checkpoint"], task_config["checkpoint_started_at"]
+                )
+                self._record_run(task_id, start_time, "timed_out", result)
+                
+                logger.warning(
+                    f"定时任务 {task_id} 超过时间限制 {task_config['time_limit']} 秒，已在检查点停止: "
+                    f"处理 {result['processed']} 个文件, 下次从断点续扫"
+                )
+                
+                self._notify_callbacks({
+                    "event": "task_timed_out",
+                    "task_id": task_id,
+                    "start_time": start_time,
+                    "result": result,
+                    "task_config": task_config
+                })
+                return result
+            
+            # 续扫跳过了断点之前的部分，首次超时运行之后才标记的脏目录可能位于其中，
+            # 按首次运行的开始时间清除脏目录和记录 last_run，这些目录留给下次补扫
+            covered_since = start_time
+            if checkpoint and task_config.get("checkpoint_started_at"):
+                covered_since = task_config["checkpoint_started_at"]
+            dirty_tracker.clear(task_config["directory"], covered_since.timestamp(), task_config["recursive"])
             
             # 更新任务统计
-            task_config["last_run"] = start_time
+            task_config["last_run"] = covered_since
             task_config["run_count"] += 1
+            task_config["last_status"] = "success"
+            if checkpoint:
+                task_config["checkpoint"] = None
+                task_config["checkpoint_started_at"] = None
+                self.task_store.set_checkpoint(task_id, None)
+            self._record_run(task_id, start_time, "success", result, last_run=covered_since)
             
             # 记录结果
             logger.info(
-                f"定时任务 {task_id} 执行完成: "
+                f"定时任务 {task_id} 执行完成 ({result['scan_mode']}): "
                 f"处理 {result['processed']} 个文件, "
                 f"创建 {result['created_links']} 个软链接, "
                 f"耗时 {result['duration']:.2f}秒"
@@ -289,9 +696,12 @@ class SchedulerService:
                 "result": result,
                 "task_config": task_config
             })
+            return result
             
         except Exception as e:
             logger.error(f"执行定时任务 {task_id} 时出错: {e}")
+            task_config["last_status"] = "error"
+            self.task_store.record_run(task_id, start_time, datetime.now(), "error", error_message=str(e))
             
             # 通知回调
             self._notify_callbacks({
@@ -301,6 +711,125 @@ class SchedulerService:
                 "error": str(e),
                 "task_config": task_config
             })
+            raise
+        
+        finally:
+            progress.finish()
+            task_config.pop("progress", None)
+    
+    def _scan_with_companions(self, task_id: str, scanner: StrmScanner, companions: List[str]) -> Dict:
+        """
+        与目录重叠、即将触发的任务合并为一次遍历
+        
+        每个物理目录只列举一次，各任务的扩展名规则在同一次遍历中应用；
+        伴随任务记录为已运行，其即将到来的触发被跳过
+        """
+        task_config = self.tasks[task_id]
+        start_time = datetime.now()
+        scan_started = time.time()
+        
+        requests = [{
+            "directory": task_config["directory"],
+            "recursive": task_config["recursive"],
+            "scanner": scanner
+        }]
+        for companion_id in companions:
+            companion = self.tasks[companion_id]
+            requests.append({
+                "directory": companion["directory"],
+                "recursive": companion["recursive"],
+                "scanner": StrmScanner(
+                    custom_video_extensions=companion.get("custom_video_extensions", []),
+                    custom_metadata_extensions=companion.get("custom_metadata_extensions", []),
+                    ops_per_second=companion.get("ops_per_second"),
+                    adaptive_throttle=companion.get("adaptive_throttle", False)
+                )
+            })
+        
+        for request in requests[1:]:
+            dir_summary.register_extensions(request["scanner"])
+        logger.info(f"定时任务 {task_id} 与重叠任务 {', '.join(companions)} 合并扫描")
+        results = scan_shared(requests)
+        
+        for companion_id, result in zip(companions, results[1:]):
+            companion = self.tasks.get(companion_id)
+            if not companion:
+                continue
+            
+            result["scan_mode"] = "full"
+            result["covered_by"] = task_id
+            dirty_tracker.clear(companion["directory"], scan_started, companion["recursive"])
+            
+            companion["last_run"] = start_time
+            companion["run_count"] += 1
+            self._mark_covered(companion_id)
+            self._record_run(companion_id, start_time, "success", result)
+            
+            self._notify_callbacks({
+                "event": "task_completed",
+                "task_id": companion_id,
+                "start_time": start_time,
+                "result": result,
+                "task_config": companion
+            })
+        
+        return results[0]
+    
+    def _scan_dirty_directories(
+        self,
+        scanner: StrmScanner,
+        task_config: Dict,
+        plan: List[Tuple[str, bool]],
+        deadline: Optional[float] = None,
+        progress: Optional[ScanProgress] = None
+    ) -> Dict:
+        """只扫描监听服务标记的脏目录，合并为一个扫描结果；超时后不再扫描剩余脏目录"""
+        start_time = time.time()
+        merged = {
+            "success": True,
+            "directory": task_config["directory"],
+            "total_files": 0,
+            "processed": 0,
+            "created_links": 0,
+            "skipped": 0,
+            "errors": [],
+            "details": [],
+            "duration": 0,
+            "scan_mode": "incremental",
+            "scanned_directories": 0,
+            "timed_out": False
+        }
+        
+        for path, recursive in plan:
+            if deadline is not None and time.time() >= deadline:
+                merged["timed_out"] = True
+                break
+            if not Path(path).is_dir():
+                continue
+            
+            result = scanner.scan_directory(
+                directory=path,
+                recursive=recursive,
+                dry_run=False,
+                deadline=deadline,
+                progress=progress,
+                record_history=False
+            )
+            for key in ("total_files", "processed", "created_links", "skipped"):
+                merged[key] += result[key]
+            merged["errors"].extend(result["errors"])
+            merged["details"].extend(result["details"])
+            merged["scanned_directories"] += 1
+            if result["timed_out"]:
+                merged["timed_out"] = True
+                break
+        
+        merged["duration"] = time.time() - start_time
+        logger.info(
+            f"目录 {task_config['directory']} 处于文件监听覆盖下，"
+            f"仅补扫 {merged['scanned_directories']} 个脏目录"
+        )
+        return merged
     
     def run_task_now(self, task_id: str) -> bool:
         """立即运行指定任务"""
@@ -309,14 +838,8 @@ class SchedulerService:
             return False
         
         try:
-            # 在后台线程中执行
-            thread = threading.Thread(
-                target=self._execute_scan_task,
-                args=[task_id],
-                name=f"ManualTask-{task_id}"
-            )
-            thread.daemon = True
-            thread.start()
+            # 交给全局扫描控制器排队执行
+            self._submit_task(task_id, "manual")
             
             logger.info(f"手动触发任务执行: {task_id}")
             return True
@@ -340,15 +863,22 @@ class SchedulerService:
                 "enabled": config["enabled"],
                 "custom_video_extensions": config.get("custom_video_extensions", []),
                 "custom_metadata_extensions": config.get("custom_metadata_extensions", []),
+                "skip_watched": config.get("skip_watched", True),
+                "ops_per_second": config.get("ops_per_second"),
+                "adaptive_throttle": config.get("adaptive_throttle", False),
+                "time_limit": config.get("time_limit"),
+                "last_status": config.get("last_status"),
+                "resume_checkpoint": config.get("checkpoint"),
+                "progress": config["progress"].to_dict() if config.get("progress") else None,
                 "created_at": config["created_at"].isoformat() if config["created_at"] else None,
                 "last_run": config["last_run"].isoformat() if config["last_run"] else None,
                 "run_count": config["run_count"],
                 "next_run": None
             }
             
-            # 获取下次运行时间
+            # 获取下次运行时间（已错峰推迟的任务以推迟后的时间为准）
             if config["enabled"] and self.scheduler:
-                job = self.scheduler.get_job(task_id)
+                job = self.scheduler.get_job(self._staggered_job_id(task_id)) or self.scheduler.get_job(task_id)
                 if job and job.next_run_time:
                     task_info["next_run"] = job.next_run_time.isoformat()
             
@@ -356,23 +886,35 @@ class SchedulerService:
         
         return tasks
     
-    def add_callback(self, callback: Callable):
-        """添加任务执行回调"""
-        if callback not in self.job_callbacks:
-            self.job_callbacks.append(callback)
+    def get_task_history(self, task_id: str, limit: int = 50) -> List[Dict]:
+        """获取任务运行历史"""
+        return self.task_store.get_runs(task_id, limit)
+    
+    def get_task_duration_stats(self, task_id: str) -> Dict:
+        """获取任务运行耗时的百分位统计"""
+        return self.task_store.get_duration_stats(task_id)
+    
+    def add_callback(
+        self,
+        callback: Callable,
+        policy: str = POLICY_DROP_OLDEST,
+        max_queue_size: int = 100
+    ):
+        """
+        添加任务执行回调
+        
+        回调在事件总线的独立线程中执行，不会阻塞扫描任务；
+        队列满时按 policy 丢弃或背压 (drop_oldest, drop_newest, block)
+        """
+        self.events.subscribe(callback, policy=policy, max_queue_size=max_queue_size)
     
     def remove_callback(self, callback: Callable):
         """移除任务执行回调"""
-        if callback in self.job_callbacks:
-            self.job_callbacks.remove(callback)
+        self.events.unsubscribe(callback)
     
     def _notify_callbacks(self, event_data: Dict):
-        """通知所有回调函数"""
-        for callback in self.job_callbacks:
-            try:
-                callback(event_data)
-            except Exception as e:
-                logger.error(f"任务回调函数执行失败: {e}")
+        """发布事件到事件总线，从不阻塞调用线程"""
+        self.events.publish(event_data)
     
     def get_running_status(self) -> bool:
         """检查调度器是否正在运行"""
@@ -0,0 +1,287 @@
+"""
+重叠扫描根目录的合并扫描模块
+多个扫描配置或定时任务的目录互相嵌套时（如 /media/tv 和 /media/tv/Anime），
+只遍历一次每个物理目录，并在同一次遍历中应用各自的扩展名规则
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from services.logger import get_logger
+from services.scanner import StrmScanner
+from services.devices import get_device_id, device_label
+from services.io_budget import io_budget
+from services.fs_guard import fs_guard
+
+logger = get_logger(__name__)
+
+def _resolve(directory: str) -> str:
+    return str(Path(directory).resolve())
+
+def _is_under(path: str, root: str) -> bool:
+    """path 是否位于 root 之下（不含 root 本身）"""
+    return path.startswith(root.rstrip(os.sep) + os.sep)
+
+def covers(root: str, recursive: bool, path: str) -> bool:
+    """扫描根目录 root 的扫描是否会处理目录 path（均为已解析的绝对路径）"""
+    return path == root or (recursive and _is_under(path, root))
+
+def roots_overlap(a_dir: str, a_recursive: bool, b_dir: str, b_recursive: bool) -> bool:
+    """两个扫描目标是否会处理相同的目录"""
+    a_dir = _resolve(a_dir)
+    b_dir = _resolve(b_dir)
+    return covers(a_dir, a_recursive, b_dir) or covers(b_dir, b_recursive, a_dir)
+
+def find_overlaps(targets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    找出互相重叠的扫描目标
+    
+    Args:
+        targets: [{"id": ..., "directory": ..., "recursive": ...}]
+    
+    Returns:
+        重叠的目标对，外层目录在前
+    """
+    overlaps = []
+    for i, a in enumerate(targets):
+        for b in targets[i + 1:]:
+            a_dir = _resolve(a["directory"])
+            b_dir = _resolve(b["directory"])
+            a_recursive = a.get("recursive", True)
+            b_recursive = b.get("recursive", True)
+            
+            if covers(a_dir, a_recursive, b_dir):
+                outer, inner = a, b
+            elif covers(b_dir, b_recursive, a_dir):
+                outer, inner = b, a
+            else:
+                continue
+            
+            overlaps.append({
+                "outer": outer["id"],
+                "outer_directory": outer["directory"],
+                "inner": inner["id"],
+                "inner_directory": inner["directory"]
+            })
+    
+    return overlaps
+
+def collapse_roots(targets: List[Tuple[str, bool]]) -> List[Tuple[str, bool]]:
+    """
+    合并扫描目标：被其他递归扫描覆盖的根目录不再单独遍历
+    
+    Args:
+        targets: [(目录, 是否递归)]
+    
+    Returns:
+        [(已解析的根目录, 是否递归)]
+    """
+    roots: Dict[str, bool] = {}
+    for directory, recursive in targets:
+        root = _resolve(directory)
+        roots[root] = roots.get(root, False) or recursive
+    
+    return [
+        (root, recursive)
+        for root, recursive in sorted(roots.items())
+        if not any(
+            other_recursive and _is_under(root, other)
+            for other, other_recursive in roots.items()
+        )
+    ]
+
+def scan_shared(requests: List[Dict[str, Any]], dry_run: bool = False) -> List[Dict[str, Any]]:
+    """
+    一次遍历完成多个可能重叠的扫描
+    
+    Args:
+        requests: [{"directory": ..., "recursive": ..., "scanner": StrmScanner}]
+        dry_run: 是否只是预览不实际执行
+    
+    Returns:
+        与 requests 顺序对应的扫描结果，格式同 StrmScanner.scan_directory
+    """
+    start_time = time.time()
+    
+    for request in requests:
+        directory_path = Path(request["directory"])
+        fs_guard.check(directory_path)
+        if not fs_guard.call(directory_path, directory_path.is_dir, description=f"检查目录 {directory_path}"):
+            raise FileNotFoundError(f"目录不存在或不是目录: {request['directory']}")
+        request["root"] = _resolve(request["directory"])
+        request["files"] = []
+    
+    walk_roots = collapse_roots([(r["root"], r["recursive"]) for r in requests])
+    primary: StrmScanner = requests[0]["scanner"]
+    
+    # 多个扫描共用一次遍历，按其中最严格的 I/O 预算节流
+    budgets = [r["scanner"].ops_per_second for r in requests if r["scanner"].ops_per_second]
+    ops_per_second = min(budgets) if budgets else None
+    adaptive = any(r["scanner"].adaptive_throttle for r in requests)
+    
+    logger.info(
+        f"合并扫描 {len(requests)} 个重叠目标，实际遍历 {len(walk_roots)} 个根目录: "
+        f"{', '.join(root for root, _ in walk_roots)}"
+    )
+    
+    # 单次遍历：每个目录只列举一次，按覆盖该目录的各扫描规则筛选 .strm 文件；
+    # 根目录按所在存储设备分组，每组使用该设备的 I/O 预算和链接调度槽位
+    devices: Dict[Optional[int], Dict[str, Any]] = {}
+    for walk_root, walk_recursive in walk_roots:
+        device = get_device_id(walk_root)
+        group = devices.get(device)
+        if group is None:
+            group = devices[device] = {
+                "throttle": io_budget.throttle_for(walk_root, ops_per_second, adaptive),
+                "roots": [],
+                "files": {},
+                "visited_dirs": 0
+            }
+        group["roots"].append((walk_root, walk_recursive))
+    
+    # 各设备分组同时进行，组内边遍历边把文件提交给工作调度器
+    threads = []
+    for device, group in devices.items():
+        thread = threading.Thread(
+            target=_scan_device_group,
+            args=(requests, primary, device, group, dry_run),
+            name=f"SharedScan-{device_label(device)}",
+            daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    
+    for group in devices.values():
+        if group.get("error"):
+            raise group["error"]
+    
+    logger.info(
+        f"合并扫描遍历了 {sum(group['visited_dirs'] for group in devices.values())} 个目录"
+        f"（{len(devices)} 个存储设备），"
+        f"找到 {sum(len(group['files']) for group in devices.values())} 个 .strm 文件"
+    )
+    
+    # 每个文件只处理一次，元数据扩展名取所有匹配扫描的并集
+    details_by_file: Dict[str, Dict] = {}
+    errors_by_file: Dict[str, Dict] = {}
+    totals = {"created": 0, "existing": 0, "conflicts": 0}
+    for group in devices.values():
+        processed = group["processed"]
+        for key in totals:
+            totals[key] += processed[key]
+        details_by_file.update((detail["file"], detail) for detail in processed["details"])
+        errors_by_file.update((error["file"], error) for error in processed["errors"])
+    
+    logger.info(
+        f"合并扫描汇总: 新建链接 {totals['created']} 个, 已存在 {totals['existing']} 个, "
+        f"冲突 {totals['conflicts']} 个, 失败 {len(errors_by_file)} 个"
+    )
+    
+    duration = time.time() - start_time
+    return [
+        _request_result(request, details_by_file, errors_by_file, duration)
+        for request in requests
+    ]
+
+def _iter_group_files(
+    requests: List[Dict[str, Any]],
+    primary: StrmScanner,
+    group: Dict[str, Any]
+) -> Iterator[Path]:
+    """
+    遍历设备分组的根目录，逐个产出至少匹配一个扫描规则的 .strm 文件
+    
+    产出前把文件登记到匹配的各扫描，并合并其元数据扩展名
+    """
+    file_extensions: Dict[Path, Set[str]] = group["files"]
+    
+    for walk_root, walk_recursive in group["roots"]:
+        for current_dir, entries in primary._iter_listings(Path(walk_root), walk_recursive, group["throttle"]):
+            covering = [r for r in requests if covers(r["root"], r["recursive"], current_dir)]
+            group["visited_dirs"] += 1
+            
+            for entry in sorted(entries, key=lambda e: e.name):
+                try:
+                    if not (entry.name.endswith('.strm') and entry.is_file()):
+                        continue
+                except OSError:
+                    continue
+                
+                file_path = Path(entry.path)
+                matched = False
+                for request in covering:
+                    if request["scanner"]._is_valid_strm(file_path):
+                        request["files"].append(file_path)
+                        file_extensions.setdefault(file_path, set()).update(
+                            request["scanner"].metadata_extensions
+                        )
+                        matched = True
+                if matched:
+                    yield file_path
+
+def _scan_device_group(
+    requests: List[Dict[str, Any]],
+    primary: StrmScanner,
+    device: Optional[int],
+    group: Dict[str, Any],
+    dry_run: bool
+):
+    """遍历并处理单个存储设备上的根目录，结果或异常保存在 group 中"""
+    try:
+        group["processed"] = primary._process_strm_files(
+            _iter_group_files(requests, primary, group),
+            dry_run,
+            device=device,
+            throttle=group["throttle"],
+            file_extensions=group["files"]
+        )
+    except Exception as e:
+        logger.error(f"合并扫描设备 {device_label(device)} 上的目录失败: {e}")
+        group["error"] = e
+
+def _request_result(
+    request: Dict[str, Any],
+    details_by_file: Dict[str, Dict],
+    errors_by_file: Dict[str, Dict],
+    duration: float
+) -> Dict[str, Any]:
+    """从共享处理结果中拆分出单个扫描的结果，只统计属于该扫描扩展名的链接"""
+    extensions = request["scanner"].metadata_extensions
+    result = {
+        "success": True,
+        "directory": request["directory"],
+        "total_files": len(request["files"]),
+        "processed": 0,
+        "created_links": 0,
+        "skipped": 0,
+        "errors": [],
+        "details": [],
+        "duration": duration,
+        "shared_scan": True
+    }
+    
+    for file_path in request["files"]:
+        key = str(file_path)
+        if key in errors_by_file:
+            result["errors"].append(errors_by_file[key])
+        
+        detail = details_by_file.get(key)
+        if not detail:
+            continue
+        
+        result["processed"] += 1
+        links = [
+            link for link in detail["result"].get("created_links", [])
+            if any(link.endswith(ext) for ext in extensions)
+        ]
+        result["created_links"] += len(links)
+        if detail["result"]["success"] and not links:
+            result["skipped"] += 1
+        result["details"].append(detail)
+    
+    return result
@@ -0,0 +1,258 @@
+"""
+定时任务持久化存储
+使用本地 SQLite 数据库保存定时任务配置和每次运行的历史记录
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from services.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 持久化的任务配置字段（运行时对象如 job 不保存）
+PERSISTED_TASK_FIELDS = (
+    "directory",
+    "target_formats",
+    "schedule_type",
+    "schedule_params",
+    "recursive",
+    "enabled",
+    "custom_video_extensions",
+    "custom_metadata_extensions",
+    "skip_watched",
+    "ops_per_second",
+    "adaptive_throttle",
+    "time_limit"
+)
+
+def percentile(sorted_values: Sequence[float], percent: float) -> Optional[float]:
+    """线性插值计算百分位数，sorted_values 需已排序"""
+    if not sorted_values:
+        return None
+    
+    rank = (len(sorted_values) - 1) * percent / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+class TaskStore:
+    """定时任务与运行历史存储"""
+    
+    def __init__(self, db_path: str = "configs/scheduler.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._init_schema()
+    
+    def _init_schema(self):
+        """创建数据表"""
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    config TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    last_run TEXT,
+                    run_count INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS task_runs (
+                    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task_id TEXT NOT NULL,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT NOT NULL,
+                    duration REAL NOT NULL,
+                    status TEXT NOT NULL,
+                    files_processed INTEGER NOT NULL DEFAULT 0,
+                    links_created INTEGER NOT NULL DEFAULT 0,
+                    errors INTEGER NOT NULL DEFAULT 0,
+                    error_message TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_task_runs_task
+                    ON task_runs (task_id, started_at);
+                CREATE TABLE IF NOT EXISTS settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+            """)
+            
+            # 旧版本数据库补充断点列
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+            if "checkpoint" not in columns:
+                self._conn.execute("ALTER TABLE tasks ADD COLUMN checkpoint TEXT")
+            if "checkpoint_started_at" not in columns:
+                self._conn.execute("ALTER TABLE tasks ADD COLUMN checkpoint_started_at TEXT")
+    
+    def save_task(self, task_config: Dict[str, Any]):
+        """保存（新增或更新）任务配置，更新时保留运行次数和断点"""
+        config = {field: task_config.get(field) for field in PERSISTED_TASK_FIELDS}
+        
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO tasks (task_id, config, created_at, last_run, run_count)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(task_id) DO UPDATE SET config = excluded.config, last_run = excluded.last_run
+                """,
+                (
+                    task_config["task_id"],
+                    json.dumps(config, ensure_ascii=False),
+                    task_config["created_at"].isoformat(),
+                    task_config["last_run"].isoformat() if task_config.get("last_run") else None,
+                    task_config.get("run_count", 0)
+                )
+            )
+    
+    def delete_task(self, task_id: str):
+        """删除任务配置（保留运行历史）"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+    
+    def load_tasks(self) -> List[Dict[str, Any]]:
+        """加载所有持久化的任务"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM tasks ORDER BY created_at").fetchall()
+        
+        tasks = []
+        for row in rows:
+            try:
+                task = json.loads(row["config"])
+            except json.JSONDecodeError as e:
+                logger.error(f"任务配置损坏，已跳过: {row['task_id']}: {e}")
+                continue
+            
+            task.update({
+                "task_id": row["task_id"],
+                "created_at": datetime.fromisoformat(row["created_at"]),
+                "last_run": datetime.fromisoformat(row["last_run"]) if row["last_run"] else None,
+                "run_count": row["run_count"],
+                "checkpoint": row["checkpoint"],
+                "checkpoint_started_at": (
+                    datetime.fromisoformat(row["checkpoint_started_at"]) if row["checkpoint_started_at"] else None
+                )
+            })
+            tasks.append(task)
+        
+        return tasks
+    
+    def record_run(
+        self,
+        task_id: str,
+        started_at: datetime,
+        finished_at: datetime,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error_message: Optional[str] = None,
+        last_run: Optional[datetime] = None
+    ) -> int:
+        """
+        记录一次运行，成功的运行同时更新任务的 last_run 和 run_count
+        
+        last_run 默认为本次运行的开始时间；从断点续扫完成时为首次超时运行的开始时间
+        """
+        result = result or {}
+        
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO task_runs (
+                    task_id, started_at, finished_at, duration, status,
+                    files_processed, links_created, errors, error_message
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    task_id,
+                    started_at.isoformat(),
+                    finished_at.isoformat(),
+                    (finished_at - started_at).total_seconds(),
+                    status,
+                    result.get("processed", 0),
+                    result.get("created_links", 0),
+                    len(result.get("errors", [])),
+                    error_message
+                )
+            )
+            if status == "success":
+                self._conn.execute(
+                    "UPDATE tasks SET last_run = ?, run_count = run_count + 1 WHERE task_id = ?",
+                    ((last_run or started_at).isoformat(), task_id)
+                )
+            return cursor.lastrowid
+    
+    def set_checkpoint(self, task_id: str, checkpoint: Optional[str], started_at: Optional[datetime] = None):
+        """
+        保存超时运行的断点，None 表示清除
+        
+        Args:
+            started_at: 首次超时运行的开始时间，续扫完成后作为 last_run 和清除脏目录的时间点
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE tasks SET checkpoint = ?, checkpoint_started_at = ? WHERE task_id = ?",
+                (checkpoint, started_at.isoformat() if checkpoint and started_at else None, task_id)
+            )
+    
+    def get_runs(self, task_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """获取任务最近的运行记录"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM task_runs WHERE task_id = ? ORDER BY started_at DESC LIMIT ?",
+                (task_id, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def get_duration_stats(
+        self,
+        task_id: str,
+        percentiles: Sequence[float] = (50, 90, 95, 99),
+        limit: int = 500
+    ) -> Dict[str, Any]:
+        """统计任务最近运行耗时的百分位数（仅统计成功的运行）"""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT duration FROM task_runs
+                WHERE task_id = ? AND status = 'success'
+                ORDER BY started_at DESC LIMIT ?
+                """,
+                (task_id, limit)
+            ).fetchall()
+        
+        durations = sorted(row["duration"] for row in rows)
+        
+        return {
+            "task_id": task_id,
+            "runs": len(durations),
+            "min": durations[0] if durations else None,
+            "max": durations[-1] if durations else None,
+            "mean": sum(durations) / len(durations) if durations else None,
+            "percentiles": {
+                f"p{int(p) if float(p).is_integer() else p}": percentile(durations, p)
+                for p in percentiles
+            }
+        }
+    
+    def get_setting(self, key: str) -> Any:
+        """读取调度器设置，不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else None
+    
+    def set_setting(self, key: str, value: Any):
+        """保存调度器设置"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                (key, json.dumps(value, ensure_ascii=False))
+            )
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -4,39 +4,191 @@
 """
 
 import os
+import re
 import threading
 from pathlib import Path
-from typing import Dict, List, Optional, Callable
+from typing import Dict, List, Optional, Callable, Set, Tuple
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, FileCreatedEvent, FileMovedEvent
 
 from services.logger import get_logger
+from services.event_bus import EventBus, POLICY_DROP_OLDEST
 from services.scanner import StrmScanner
+from services.dirty_tracker import dirty_tracker
+from services.dir_summary import dir_summary
+from services.fs_guard import fs_guard, FsTimeoutError, MountUnavailableError
+from services.work_scheduler import work_scheduler, PRIORITY_REALTIME
 
 logger = get_logger(__name__)
 
+# 监听模式
+WATCH_MODE_RECURSIVE = "recursive"  # 递归监听整个目录树
+WATCH_MODE_SELECTIVE = "selective"  # 仅监听包含 .strm 文件的目录及其上级目录
+WATCH_MODES = (WATCH_MODE_RECURSIVE, WATCH_MODE_SELECTIVE)
+
+INOTIFY_MAX_WATCHES_FILE = Path("/proc/sys/fs/inotify/max_user_watches")
+
+# 扫描器创建的元数据软链接：xxx.(ext).nfo，这类文件的事件无需补扫
+LINK_ARTIFACT_PATTERN = re.compile(r'.+\.\([^.]+\)\.[^.]+$')
+
+def get_inotify_watch_limit() -> Optional[int]:
+    """读取系统 inotify 监听数量上限，非 Linux 系统返回 None"""
+    try:
+        return int(INOTIFY_MAX_WATCHES_FILE.read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+def _list_for_watch(path: str) -> Tuple[List[str], bool]:
+    """列举目录，返回 (子目录名列表, 是否包含 .strm 文件)"""
+    subdirs = []
+    has_strm = False
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+            elif entry.name.endswith('.strm'):
+                has_strm = True
+    return subdirs, has_strm
+
+def collect_strm_directories(root: Path) -> Set[str]:
+    """
+    收集目录树中包含 .strm 文件的目录及其所有上级目录（直到 root）
+    
+    root 本身总是包含在结果中，以便发现新建的子目录；
+    逐个目录经挂载点保护列举，挂载点超时或熔断时抛出异常
+    """
+    root = Path(root)
+    strm_dirs = set()
+    
+    stack = [str(root)]
+    while stack:
+        path = stack.pop()
+        try:
+            subdirs, has_strm = fs_guard.call(path, _list_for_watch, path, description=f"收集监听目录 {path}")
+        except (FsTimeoutError, MountUnavailableError):
+            raise
+        except OSError:
+            continue
+        if has_strm:
+            strm_dirs.add(path)
+        stack.extend(os.path.join(path, name) for name in subdirs)
+    
+    result = {str(root)}
+    for dir_path in strm_dirs:
+        current = Path(dir_path)
+        # 向上补全父目录，直到到达根目录或已收集的目录
+        while str(current) not in result:
+            result.add(str(current))
+            if current == root or current.parent == current:
+                break
+            current = current.parent
+    
+    return result
+
+def _list_subdirectories(path: str) -> List[str]:
+    with os.scandir(path) as it:
+        return [entry.name for entry in it if entry.is_dir(follow_symlinks=False)]
+
+def count_directories(root: Path) -> int:
+    """
+    统计目录树中的目录数量（递归监听时每个目录占用一个 inotify watch）
+    
+    逐个目录经挂载点保护列举；挂载点超时或熔断时抛出异常
+    """
+    count = 0
+    stack = [str(root)]
+    while stack:
+        path = stack.pop()
+        count += 1
+        try:
+            names = fs_guard.call(path, _list_subdirectories, path, description=f"统计监听目录 {path}")
+        except (FsTimeoutError, MountUnavailableError):
+            raise
+        except OSError:
+            continue
+        stack.extend(os.path.join(path, name) for name in names)
+    return count
+
 class StrmFileHandler(FileSystemEventHandler):
     """STRM 文件事件处理器"""
     
-    def __init__(self, scanner: StrmScanner, target_formats: List[str], callback: Optional[Callable] = None):
+    def __init__(
+        self,
+        scanner: StrmScanner,
+        target_formats: List[str],
+        callback: Optional[Callable] = None,
+        directory_callback: Optional[Callable] = None
+    ):
         super().__init__()
         self.scanner = scanner
         self.target_formats = target_formats
         self.callback = callback
+        self.directory_callback = directory_callback  # 选择性监听模式下的目录变化回调
         self._processing = set()  # 防止重复处理
         self._lock = threading.Lock()
     
     def on_created(self, event):
         """文件创建事件"""
-        if not event.is_directory and event.src_path.endswith('.strm'):
-            self._handle_strm_file(event.src_path, "created")
+        self._invalidate_summary(event.src_path, event.is_directory)
+        if event.is_directory:
+            self._handle_directory(event.src_path, "created")
+        elif event.src_path.endswith('.strm'):
+            self.submit_strm_file(event.src_path, "created")
+        else:
+            self._handle_other_file(event.src_path)
     
     def on_moved(self, event):
         """文件移动事件"""
-        if not event.is_directory:
+        self._invalidate_summary(event.src_path, event.is_directory)
+        self._invalidate_summary(event.dest_path, event.is_directory)
+        if event.is_directory:
+            self._handle_directory(event.src_path, "deleted")
+            self._handle_directory(event.dest_path, "created")
+        else:
             # 处理移动到的新文件
             if event.dest_path.endswith('.strm'):
-                self._handle_strm_file(event.dest_path, "moved")
+                self.submit_strm_file(event.dest_path, "moved")
+            else:
+                self._handle_other_file(event.dest_path)
+    
+    def on_deleted(self, event):
+        """文件删除事件"""
+        self._invalidate_summary(event.src_path, event.is_directory)
+        if event.is_directory:
+            self._handle_directory(event.src_path, "deleted")
+    
+    @staticmethod
+    def _invalidate_summary(path: str, is_directory: bool):
+        """更新目录摘要索引：目录变化时重新索引该目录，文件变化时重新列举所在目录"""
+        dir_summary.invalidate(path if is_directory else os.path.dirname(path))
+    
+    def _handle_other_file(self, file_path: str):
+        """新增的字幕/元数据文件不由监听服务处理，交给定时任务补扫"""
+        if LINK_ARTIFACT_PATTERN.match(os.path.basename(file_path)):
+            return
+        dirty_tracker.mark_dirty(os.path.dirname(file_path))
+    
+    def _handle_directory(self, dir_path: str, event_type: str):
+        """处理目录变化事件"""
+        if event_type == "created":
+            # 新目录（尤其是整体移入的目录树）交给定时任务完整补扫
+            dirty_tracker.mark_dirty(dir_path, subtree=True)
+        
+        if not self.directory_callback:
+            return
+        
+        try:
+            self.directory_callback(dir_path, event_type)
+        except Exception as e:
+            logger.error(f"处理目录事件时出错: {dir_path} ({event_type}): {e}")
+    
+    def submit_strm_file(self, file_path: str, event_type: str):
+        """
+        以实时优先级提交 STRM 文件处理
+        
+        不在 observer 线程中直接处理，且总是先于批量扫描任务执行
+        """
+        work_scheduler.submit(self._handle_strm_file, file_path, event_type, priority=PRIORITY_REALTIME)
     
     def _handle_strm_file(self, file_path: str, event_type: str):
         """处理 STRM 文件事件"""
@@ -50,20 +202,17 @@ class StrmFileHandler(FileSystemEventHandler):
         
         try:
             # 验证是否是有效的视频 .strm 文件
-            if not self.scanner._is_video_strm(file_path):
+            if not self.scanner._is_valid_strm(file_path):
                 return
             
             logger.info(f"检测到 .strm 文件 {event_type}: {file_path}")
             
             # 处理单个文件
-            result = self.scanner._process_single_strm(
-                file_path, 
-                self.target_formats, 
-                dry_run=False
-            )
+            result = self.scanner._process_single_strm(file_path, dry_run=False)
             
             if result["success"]:
                 logger.info(f"成功处理 {file_path}, 创建了 {result['links_created']} 个软链接")
+                dirty_tracker.mark_processed(str(file_path))
                 
                 # 调用回调函数（如果有）
                 if self.callback:
@@ -76,6 +225,7 @@ class StrmFileHandler(FileSystemEventHandler):
                     })
             else:
                 logger.error(f"处理 {file_path} 失败: {result.get('error', '未知错误')}")
+                dirty_tracker.mark_dirty(str(file_path.parent))
                 
                 if self.callback:
                     self.callback({
@@ -88,6 +238,7 @@ class StrmFileHandler(FileSystemEventHandler):
         
         except Exception as e:
             logger.error(f"处理文件事件时出错: {e}")
+            dirty_tracker.mark_dirty(str(file_path.parent))
             if self.callback:
                 self.callback({
                     "event": "processing_error",
@@ -110,17 +261,34 @@ class WatcherService:
         self.watch_dirs = {}  # 监听目录配置
         self.is_running = False
         self._lock = threading.Lock()
-        self.event_callbacks = []  # 事件回调函数列表
+        self._watches_lock = threading.Lock()  # 保护各目录的 watches 字典
+        self.events = EventBus("watcher")  # 事件总线，异步通知回调函数
     
     def add_watch_directory(
         self, 
         directory: str, 
         target_formats: Optional[List[str]] = None,
-        recursive: bool = True
+        recursive: bool = True,
+        watch_mode: str = WATCH_MODE_RECURSIVE
     ) -> bool:
-        """添加监听目录"""
+        """
+        添加监听目录
+        
+        Args:
+            directory: 监听目录路径
+            target_formats: 目标视频格式
+            recursive: 是否递归监听子目录
+            watch_mode: 监听模式
+                - recursive: 递归监听整个目录树（每个子目录占用一个 inotify watch）
+                - selective: 仅监听包含 .strm 文件的目录及其上级目录，
+                  适合大型媒体库，避免超出 fs.inotify.max_user_watches
+        """
         directory = Path(directory).resolve()
         
+        if watch_mode not in WATCH_MODES:
+            logger.error(f"不支持的监听模式: {watch_mode}")
+            return False
+        
         if not directory.exists():
             logger.error(f"监听目录不存在: {directory}")
             return False
@@ -144,10 +312,15 @@ class WatcherService:
                 "path": directory,
                 "target_formats": target_formats,
                 "recursive": recursive,
-                "handler": None
+                "watch_mode": watch_mode if recursive else WATCH_MODE_RECURSIVE,
+                "watches": {},  # 监听路径 -> ObservedWatch
+                "watch_count": 0  # 占用的 inotify watch 数量
             }
             
-            logger.info(f"添加监听目录: {directory} (格式: {target_formats}, 递归: {recursive})")
+            logger.info(
+                f"添加监听目录: {directory} "
+                f"(格式: {target_formats}, 递归: {recursive}, 模式: {watch_mode})"
+            )
             
             # 如果服务正在运行，立即开始监听
             if self.is_running and self.observer:
@@ -165,9 +338,12 @@ class WatcherService:
                 return False
             
             # 停止对该目录的监听
-            if self.observer and self.watch_dirs[directory]["handler"]:
-                self.observer.unschedule(self.watch_dirs[directory]["handler"])
+            config = self.watch_dirs[directory]
+            if self.observer:
+                for watch in list(config["watches"].values()):
+                    self._unschedule_watch(watch)
             
+            dirty_tracker.stop_coverage(directory)
             del self.watch_dirs[directory]
             logger.info(f"移除监听目录: {directory}")
             return True
@@ -198,6 +374,7 @@ class WatcherService:
                 
             except Exception as e:
                 logger.error(f"启动监听服务失败: {e}")
+                dirty_tracker.stop_all_coverage()
                 self.is_running = False
                 return False
     
@@ -214,6 +391,9 @@ class WatcherService:
                     self.observer.join(timeout=5)  # 等待最多5秒
                     self.observer = None
                 
+                # 停止监听后，定时任务需要重新全量扫描
+                dirty_tracker.stop_all_coverage()
+                
                 self.is_running = False
                 logger.info("文件监听服务已停止")
                 return True
@@ -225,43 +405,188 @@ class WatcherService:
     def _start_watch_single_dir(self, dir_key: str):
         """为单个目录启动监听"""
         config = self.watch_dirs[dir_key]
+        config["watches"] = {}
+        selective = config["watch_mode"] == WATCH_MODE_SELECTIVE
+        
+        # 只有递归监听能保证目录树内所有新增 .strm 文件都被实时处理
+        if config["recursive"] and not selective:
+            dirty_tracker.start_coverage(dir_key, self.scanner.video_extensions, self.scanner.metadata_extensions)
         
         # 创建事件处理器
         handler = StrmFileHandler(
             self.scanner,
             config["target_formats"],
-            self._notify_callbacks
+            self._notify_callbacks,
+            directory_callback=(
+                lambda path, event_type: self._on_directory_event(dir_key, handler, path, event_type)
+            ) if selective else None
         )
         
-        # 添加监听
-        watch = self.observer.schedule(
-            handler,
-            str(config["path"]),
-            recursive=config["recursive"]
-        )
+        if selective:
+            # 仅为包含 .strm 文件的目录及其上级目录添加非递归监听；
+            # 根目录立即监听，其余目录在后台收集，不阻塞调用方也不持有 self._lock
+            self._add_single_watch(config, handler, str(config["path"]))
+            threading.Thread(
+                target=self._watch_strm_directories,
+                args=(config, handler, config["path"]),
+                name="WatchCollect",
+                daemon=True
+            ).start()
+        else:
+            # 添加监听
+            watch = self.observer.schedule(
+                handler,
+                str(config["path"]),
+                recursive=config["recursive"]
+            )
+            config["watches"][str(config["path"])] = watch
+            config["watch_count"] = 1
+            if config["recursive"]:
+                # 大目录树统计较慢，在后台线程中进行，完成前按 1 计
+                threading.Thread(
+                    target=self._count_watches,
+                    args=(config, watch),
+                    name="WatchCount",
+                    daemon=True
+                ).start()
+        
+        logger.info(f"开始监听目录: {config['path']} (模式: {config['watch_mode']})")
+    
+    def _watch_strm_directories(self, config: Dict, handler: StrmFileHandler, root: Path, new_tree: bool = False):
+        """
+        后台收集 root 下包含 .strm 文件的目录并添加监听
+        
+        new_tree 为 True 时 root 是新建或移入的目录，其中已有的 .strm 文件一并处理
+        """
+        observer = self.observer
+        watches = config["watches"]
+        root_path = str(root)
+        
+        try:
+            if new_tree and not fs_guard.call(root_path, os.path.isdir, root_path, description=f"检查目录 {root_path}"):
+                return
+            strm_dirs = collect_strm_directories(root)
+        except OSError as e:
+            logger.warning(f"收集监听目录失败: {root}: {e}")
+            return
         
-        # 保存处理器引用
-        config["handler"] = watch
+        for path in sorted(strm_dirs):
+            # 收集期间监听可能已被移除或重启
+            if self.observer is not observer or config["watches"] is not watches:
+                return
+            self._add_single_watch(config, handler, path)
         
-        logger.info(f"开始监听目录: {config['path']}")
+        if new_tree:
+            for path in strm_dirs:
+                try:
+                    strm_files = fs_guard.call(
+                        path, lambda: sorted(Path(path).glob('*.strm')), description=f"列举 .strm 文件 {path}"
+                    )
+                except OSError as e:
+                    logger.warning(f"列举 .strm 文件失败: {path}: {e}")
+                    continue
+                for strm_file in strm_files:
+                    handler.submit_strm_file(str(strm_file), "moved")
+            logger.info(f"新增目录监听: {root} (占用 watch: {config['watch_count']})")
+        else:
+            logger.info(f"监听目录 {root} 占用 watch: {config['watch_count']}")
     
-    def add_callback(self, callback: Callable):
-        """添加事件回调函数"""
-        if callback not in self.event_callbacks:
-            self.event_callbacks.append(callback)
+    def _count_watches(self, config: Dict, watch):
+        """后台统计递归监听占用的 watch 数量"""
+        try:
+            count = count_directories(config["path"])
+        except OSError as e:
+            logger.warning(f"统计监听目录数量失败: {e}")
+            return
+        
+        # 统计期间监听可能已被移除或重启
+        if config["watches"].get(str(config["path"])) is watch:
+            config["watch_count"] = count
+            logger.info(f"监听目录 {config['path']} 占用 watch: {count}")
+    
+    def _add_single_watch(self, config: Dict, handler: StrmFileHandler, dir_path: str):
+        """选择性监听模式下为单个目录添加非递归监听"""
+        with self._watches_lock:
+            if dir_path in config["watches"]:
+                return
+        
+        try:
+            watch = self.observer.schedule(handler, dir_path, recursive=False)
+        except OSError as e:
+            # 通常是超出 fs.inotify.max_user_watches
+            logger.error(f"添加目录监听失败: {dir_path}: {e}")
+            return
+        
+        with self._watches_lock:
+            config["watches"][dir_path] = watch
+            config["watch_count"] = len(config["watches"])
+    
+    def _unschedule_watch(self, watch):
+        """移除单个监听，忽略已失效的监听"""
+        try:
+            self.observer.unschedule(watch)
+        except KeyError:
+            pass
+    
+    def _on_directory_event(self, dir_key: str, handler: StrmFileHandler, dir_path: str, event_type: str):
+        """
+        选择性监听模式下的目录变化处理
+        
+        在 observer 线程中执行，不能持有 self._lock（避免与 observer 内部锁死锁）
+        """
+        config = self.watch_dirs.get(dir_key)
+        if not config or not self.observer:
+            return
+        
+        if event_type == "created":
+            # 新目录本身总是监听，以便发现后续写入的 .strm 文件；
+            # 移动进来的目录树可能已经包含 .strm 文件，需要补充监听并处理。
+            # 遍历可能很慢，在后台线程中进行，不阻塞 observer 线程
+            threading.Thread(
+                target=self._watch_strm_directories,
+                args=(config, handler, Path(dir_path), True),
+                name="WatchCollect",
+                daemon=True
+            ).start()
+        
+        elif event_type == "deleted":
+            prefix = dir_path.rstrip(os.sep) + os.sep
+            with self._watches_lock:
+                removed = [
+                    (path, watch) for path, watch in config["watches"].items()
+                    if path != str(config["path"]) and (path == dir_path or path.startswith(prefix))
+                ]
+                for path, _ in removed:
+                    del config["watches"][path]
+                config["watch_count"] = len(config["watches"])
+            
+            for _, watch in removed:
+                self._unschedule_watch(watch)
+            
+            if removed:
+                logger.info(f"移除目录监听: {dir_path} (释放 watch: {len(removed)})")
+    
+    def add_callback(
+        self,
+        callback: Callable,
+        policy: str = POLICY_DROP_OLDEST,
+        max_queue_size: int = 100
+    ):
+        """
+        添加事件回调函数
+        
+        回调在事件总线的独立线程中执行，不会阻塞文件处理；
+        队列满时按 policy 丢弃或背压 (drop_oldest, drop_newest, block)
+        """
+        self.events.subscribe(callback, policy=policy, max_queue_size=max_queue_size)
     
     def remove_callback(self, callback: Callable):
         """移除事件回调函数"""
-        if callback in self.event_callbacks:
-            self.event_callbacks.remove(callback)
+        self.events.unsubscribe(callback)
     
     def _notify_callbacks(self, event_data: Dict):
-        """通知所有回调函数"""
-        for callback in self.event_callbacks:
-            try:
-                callback(event_data)
-            except Exception as e:
-                logger.error(f"回调函数执行失败: {e}")
+        """发布事件到事件总线，从不阻塞调用线程"""
+        self.events.publish(event_data)
     
     def get_running_status(self) -> bool:
         """检查服务是否正在运行"""
@@ -269,14 +594,25 @@ class WatcherService:
     
     def get_watch_status(self) -> Dict:
         """获取监听状态"""
+        watches_used = sum(config["watch_count"] for config in self.watch_dirs.values()) if self.is_running else 0
+        watch_limit = get_inotify_watch_limit()
+        
         return {
             "is_running": self.is_running,
+            "coverage": dirty_tracker.get_status(),
             "watch_directories": [
                 {
                     "path": str(config["path"]),
                     "target_formats": config["target_formats"],
-                    "recursive": config["recursive"]
+                    "recursive": config["recursive"],
+                    "watch_mode": config["watch_mode"],
+                    "watch_count": config["watch_count"] if self.is_running else 0
                 }
                 for config in self.watch_dirs.values()
-            ]
+            ],
+            "inotify": {
+                "watches_used": watches_used,
+                "max_user_watches": watch_limit,
+                "usage_percent": round(watches_used / watch_limit * 100, 2) if watch_limit else None
+            }
         }
@@ -0,0 +1,197 @@
+"""
+链接操作工作调度模块
+所有扫描和监听产生的链接操作共享同一个工作线程池，按优先级分道调度：
+文件监听触发的实时任务总是先于批量扫描任务执行；
+批量任务按存储设备分组，不同设备并行，同一设备受并发预算限制
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+from services.logger import get_logger
+from services.devices import device_label
+
+logger = get_logger(__name__)
+
+# 优先级（数值越小越优先）
+PRIORITY_REALTIME = 0  # 文件监听触发，对延迟敏感
+PRIORITY_BULK = 1  # 定时/手动批量扫描
+
+PRIORITY_NAMES = {
+    PRIORITY_REALTIME: "realtime",
+    PRIORITY_BULK: "bulk"
+}
+
+class LinkWorkScheduler:
+    """链接操作共享工作调度器"""
+    
+    def __init__(self, max_workers: int = 8, reserved_realtime_workers: int = 1, per_device_workers: int = 3):
+        """
+        Args:
+            max_workers: 工作线程总数
+            reserved_realtime_workers: 只处理实时任务的预留线程数，
+                保证批量扫描占满线程池时新文件也能立即处理
+            per_device_workers: 同一存储设备上同时执行的批量任务上限，
+                避免多个扫描争抢同一块磁盘
+        """
+        self.max_workers = max(1, max_workers)
+        self.reserved_realtime_workers = min(max(0, reserved_realtime_workers), self.max_workers - 1)
+        self.per_device_workers = max(1, per_device_workers)
+        
+        self._lanes = {priority: deque() for priority in PRIORITY_NAMES}
+        self._cond = threading.Condition()
+        self._workers = []
+        self._active = {priority: 0 for priority in PRIORITY_NAMES}
+        self._completed = {priority: 0 for priority in PRIORITY_NAMES}
+        self._device_active: Dict[Optional[int], int] = {}  # 设备号 -> 执行中的任务数
+        self._shutdown = False
+    
+    @property
+    def bulk_workers(self) -> int:
+        """单个设备上可同时处理批量任务的线程数"""
+        return min(self.max_workers - self.reserved_realtime_workers, self.per_device_workers)
+    
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        priority: int = PRIORITY_BULK,
+        device: Optional[int] = None,
+        **kwargs
+    ) -> Future:
+        """
+        提交链接操作，返回 Future
+        
+        Args:
+            priority: 优先级 (PRIORITY_REALTIME 或 PRIORITY_BULK)
+            device: 操作所在的存储设备号 (st_dev)，批量任务按设备限制并发
+        """
+        if priority not in self._lanes:
+            raise ValueError(f"不支持的优先级: {priority}")
+        
+        future = Future()
+        
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("工作调度器已关闭")
+            
+            self._ensure_workers()
+            self._lanes[priority].append((future, fn, args, kwargs, device))
+            self._cond.notify_all()
+        
+        return future
+    
+    def _ensure_workers(self):
+        """按需启动工作线程（调用方需持有 self._cond）"""
+        if self._workers:
+            return
+        
+        for index in range(self.max_workers):
+            realtime_only = index < self.reserved_realtime_workers
+            worker = threading.Thread(
+                target=self._worker_loop,
+                args=(realtime_only,),
+                name=f"LinkWorker-{'rt' if realtime_only else 'all'}-{index}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        
+        logger.info(
+            f"链接工作调度器启动: {self.max_workers} 个线程 "
+            f"(实时任务预留 {self.reserved_realtime_workers} 个)"
+        )
+    
+    def _next_item(self, realtime_only: bool):
+        """
+        取出下一个任务（调用方需持有 self._cond）
+        
+        实时任务优先且不受设备预算限制；预留线程只处理实时任务；
+        批量任务跳过已用满预算的设备，按提交顺序取第一个可执行的任务
+        """
+        if self._lanes[PRIORITY_REALTIME]:
+            return PRIORITY_REALTIME, self._lanes[PRIORITY_REALTIME].popleft()
+        
+        if realtime_only:
+            return None, None
+        
+        bulk_lane = self._lanes[PRIORITY_BULK]
+        for index, item in enumerate(bulk_lane):
+            device = item[4]
+            if device is None or self._device_active.get(device, 0) < self.per_device_workers:
+                del bulk_lane[index]
+                return PRIORITY_BULK, item
+        
+        return None, None
+    
+    def _worker_loop(self, realtime_only: bool):
+        """工作线程主循环"""
+        while True:
+            with self._cond:
+                priority, item = self._next_item(realtime_only)
+                while item is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    priority, item = self._next_item(realtime_only)
+                
+                device = item[4]
+                self._active[priority] += 1
+                self._device_active[device] = self._device_active.get(device, 0) + 1
+            
+            future, fn, args, kwargs, _ = item
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._active[priority] -= 1
+                    self._completed[priority] += 1
+                    self._device_active[device] -= 1
+                    if not self._device_active[device]:
+                        del self._device_active[device]
+                    # 设备预算释放后，等待中的线程可能有任务可取
+                    self._cond.notify_all()
+    
+    def shutdown(self, cancel_pending: bool = True):
+        """关闭调度器，默认取消尚未开始的任务"""
+        with self._cond:
+            self._shutdown = True
+            if cancel_pending:
+                for lane in self._lanes.values():
+                    while lane:
+                        lane.popleft()[0].cancel()
+            self._cond.notify_all()
+        
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._workers = []
+    
+    def get_status(self) -> Dict:
+        """获取各优先级队列状态"""
+        with self._cond:
+            return {
+                "max_workers": self.max_workers,
+                "reserved_realtime_workers": self.reserved_realtime_workers,
+                "per_device_workers": self.per_device_workers,
+                "devices": {
+                    device_label(device): active
+                    for device, active in self._device_active.items()
+                },
+                "lanes": {
+                    name: {
+                        "queued": len(self._lanes[priority]),
+                        "active": self._active[priority],
+                        "completed": self._completed[priority]
+                    }
+                    for priority, name in PRIORITY_NAMES.items()
+                }
+            }
+
+# 全局工作调度器实例
+work_scheduler = LinkWorkScheduler()
@@ -0,0 +1,13 @@
+"""
+测试公共配置
+服务模块在导入时创建全局实例（日志、configs/ 下的索引文件等），
+先切换到临时目录，避免测试写入仓库中的 logs/ 和 configs/
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(tempfile.mkdtemp(prefix="strm_linker_tests_"))
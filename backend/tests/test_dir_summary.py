@@ -0,0 +1,102 @@
+"""目录摘要索引的增量更新"""
+
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+from services.dir_summary import DirectorySummaryIndex
+from services.scanner import StrmScanner
+
+def touch(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+
+def counts(index: DirectorySummaryIndex, path: Path):
+    summary = index.lookup(str(path))
+    if summary is None:
+        return None
+    return summary["strm_count"], summary["linked_sidecars"], summary["unlinked_sidecars"]
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "library"
+    touch(root / "movies" / "a" / "a.(mp4).strm")
+    touch(root / "movies" / "a" / "a.nfo")
+    touch(root / "movies" / "b" / "b.(mkv).strm")
+    touch(root / "tv" / "s1" / "e1.(mp4).strm")
+    touch(root / "tv" / "s1" / "e1.nfo")
+    (root / "tv" / "s1" / "e1.(mp4).nfo").symlink_to(root / "tv" / "s1" / "e1.nfo")
+    return root
+
+@pytest.fixture
+def index(tmp_path, library):
+    index = DirectorySummaryIndex(index_file=str(tmp_path / "summary.json"))
+    assert index.prepare(str(library), wait=5)
+    return index
+
+def test_full_walk_counts(index, library):
+    assert counts(index, library) == (3, 1, 1)
+    assert counts(index, library / "movies") == (2, 0, 1)
+    assert counts(index, library / "tv") == (1, 1, 0)
+    assert counts(index, library / "tv" / "s1") == (1, 1, 0)
+    assert index.lookup(str(library / "missing")) is None
+
+def test_relisting_one_directory_propagates_delta(index, library):
+    touch(library / "movies" / "a" / "c.(mp4).strm")
+    touch(library / "movies" / "a" / "c.nfo")
+    (library / "movies" / "a" / "a.(mp4).nfo").symlink_to(library / "movies" / "a" / "a.nfo")
+    
+    index._refresh_directory(str(library / "movies" / "a"))
+    assert counts(index, library / "movies" / "a") == (2, 1, 1)
+    assert counts(index, library / "movies") == (3, 1, 1)
+    assert counts(index, library) == (4, 2, 1)
+    # 兄弟目录不受影响
+    assert counts(index, library / "tv") == (1, 1, 0)
+
+def test_removed_and_added_subdirectories(index, library):
+    shutil.rmtree(library / "tv" / "s1")
+    touch(library / "tv" / "s2" / "x" / "e1.(mp4).strm")
+    
+    index._refresh_directory(str(library / "tv"))
+    assert index.lookup(str(library / "tv" / "s1")) is None
+    # 新建的子目录在后台整体索引
+    assert index.prepare(str(library / "tv" / "s2"), wait=5)
+    assert counts(index, library / "tv") == (1, 0, 0)
+    assert counts(index, library) == (3, 0, 1)
+    
+    # 重新列举已删除的目录时从上级计数中扣除
+    shutil.rmtree(library / "movies" / "b")
+    index._refresh_directory(str(library / "movies" / "b"))
+    assert index.lookup(str(library / "movies" / "b")) is None
+    assert counts(index, library) == (2, 0, 1)
+
+def test_incremental_updates_match_fresh_walk(index, library, tmp_path):
+    touch(library / "movies" / "a" / "d.(mp4).strm")
+    shutil.rmtree(library / "movies" / "b")
+    touch(library / "tv" / "s1" / "e2.(mp4).strm")
+    touch(library / "tv" / "s1" / "e2.nfo")
+    
+    for directory in ("movies/a", "movies", "tv/s1"):
+        index._refresh_directory(str(library / directory))
+    
+    fresh = DirectorySummaryIndex(index_file=str(tmp_path / "fresh.json"))
+    assert fresh.prepare(str(library), wait=5)
+    for directory in ("", "movies", "movies/a", "tv", "tv/s1"):
+        assert counts(index, library / directory) == counts(fresh, library / directory)
+
+def test_registered_extensions_are_counted(index, library):
+    touch(library / "movies" / "b" / "b.(iso).strm")
+    index.register_extensions(StrmScanner(custom_video_extensions=[".iso"]))
+    assert index.lookup(str(library))["refreshed_at"] == 0
+    
+    index._refresh_directory(str(library / "movies" / "b"))
+    assert counts(index, library) == (4, 1, 1)
+
+def test_scan_result_skips_oversized_root(index, tmp_path):
+    other = str(tmp_path / "huge")
+    with index._cond:
+        index._oversized[other] = time.time()
+    index.apply_scan_result({"directory": other, "details": []})
+    assert other not in index._pending
@@ -0,0 +1,60 @@
+"""监听覆盖范围与定时任务扫描规划"""
+
+import time
+
+from services.dirty_tracker import DirtyTracker
+
+VIDEO = {".mp4", ".mkv"}
+METADATA = {".nfo", ".jpg"}
+
+def covered_tracker(root) -> DirtyTracker:
+    tracker = DirtyTracker()
+    tracker.start_coverage(str(root), set(VIDEO), set(METADATA))
+    return tracker
+
+def test_plan_requires_coverage_since_last_run(tmp_path):
+    tracker = DirtyTracker()
+    assert tracker.plan_scan(str(tmp_path), True, time.time(), VIDEO, METADATA) is None
+    
+    tracker = covered_tracker(tmp_path)
+    # 监听开始前的上次运行之后可能有未处理的文件
+    assert tracker.plan_scan(str(tmp_path), True, time.time() - 60, VIDEO, METADATA) is None
+    assert tracker.plan_scan(str(tmp_path), True, None, VIDEO, METADATA) is None
+    assert tracker.plan_scan(str(tmp_path), True, time.time() + 1, VIDEO, METADATA) == []
+
+def test_plan_lists_dirty_directories_inside_task(tmp_path):
+    tracker = covered_tracker(tmp_path)
+    task = tmp_path / "movies"
+    tracker.mark_dirty(str(task / "a"), subtree=True)
+    tracker.mark_dirty(str(task / "a" / "nested"))
+    tracker.mark_dirty(str(task / "b"))
+    tracker.mark_dirty(str(tmp_path / "tv"))
+    last_run = time.time() + 1
+    
+    # 已被上级子树补扫覆盖的目录和任务目录以外的目录不在计划中
+    assert tracker.plan_scan(str(task), True, last_run, VIDEO, METADATA) == [
+        (str(task / "a"), True),
+        (str(task / "b"), False)
+    ]
+    # 非递归任务只关心任务目录本身
+    assert tracker.plan_scan(str(task), False, last_run, VIDEO, METADATA) == []
+    tracker.mark_dirty(str(task))
+    assert tracker.plan_scan(str(task), False, last_run, VIDEO, METADATA) == [(str(task), False)]
+
+def test_plan_requires_watcher_to_handle_task_extensions(tmp_path):
+    tracker = covered_tracker(tmp_path)
+    last_run = time.time() + 1
+    
+    assert tracker.plan_scan(str(tmp_path), True, last_run, {".mp4"}, METADATA) == []
+    assert tracker.plan_scan(str(tmp_path), True, last_run, VIDEO | {".iso"}, METADATA) is None
+    assert tracker.plan_scan(str(tmp_path), True, last_run, VIDEO, METADATA | {".txt"}) is None
+
+def test_clear_keeps_directories_marked_during_scan(tmp_path):
+    tracker = covered_tracker(tmp_path)
+    tracker.mark_dirty(str(tmp_path / "a"))
+    scan_started = time.time()
+    time.sleep(0.01)
+    tracker.mark_dirty(str(tmp_path / "b"))
+    
+    tracker.clear(str(tmp_path), scan_started)
+    assert tracker.plan_scan(str(tmp_path), True, time.time() + 1, VIDEO, METADATA) == [(str(tmp_path / "b"), False)]
@@ -0,0 +1,109 @@
+"""事件总线的订阅者队列策略与计数"""
+
+import threading
+import time
+
+import pytest
+
+from services.event_bus import EventBus, POLICY_BLOCK, POLICY_DROP_NEWEST, POLICY_DROP_OLDEST
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+class SlowSubscriber:
+    """第一个事件到达后阻塞投递线程，直到 release"""
+    
+    def __init__(self):
+        self.received = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+    
+    def __call__(self, event):
+        self.started.set()
+        self.release.wait(5)
+        self.received.append(event["n"])
+
+@pytest.fixture
+def bus():
+    bus = EventBus("test")
+    yield bus
+    bus.close()
+
+def publish_while_blocked(bus, subscriber, count):
+    bus.publish({"n": 0})
+    assert subscriber.started.wait(5)
+    for n in range(1, count):
+        bus.publish({"n": n})
+
+def subscriber_stats(bus):
+    (stats,) = bus.get_stats()["subscribers"]
+    return stats
+
+@pytest.mark.parametrize("policy, expected", [
+    (POLICY_DROP_OLDEST, [0, 2, 3]),
+    (POLICY_DROP_NEWEST, [0, 1, 2]),
+])
+def test_drop_policies(bus, policy, expected):
+    subscriber = SlowSubscriber()
+    bus.subscribe(subscriber, policy=policy, max_queue_size=2)
+    publish_while_blocked(bus, subscriber, 4)
+    assert wait_for(lambda: subscriber_stats(bus)["dropped"] == 1)
+    
+    subscriber.release.set()
+    assert wait_for(lambda: len(subscriber.received) == 3)
+    assert subscriber.received == expected
+    assert subscriber_stats(bus)["delivered"] == 3
+
+def test_block_policy_waits_for_space(bus):
+    subscriber = SlowSubscriber()
+    bus.subscribe(subscriber, policy=POLICY_BLOCK, max_queue_size=1, block_timeout=5)
+    bus.publish({"n": 0})
+    assert subscriber.started.wait(5)
+    
+    # 收件箱也有容量限制，逐个发布让转交线程取走事件：
+    # 第二个事件进入投递队列，第三个由转交线程持有，等待队列出现空位
+    for n in (1, 2):
+        bus.publish({"n": n})
+        time.sleep(0.1)
+    assert subscriber_stats(bus)["queued"] == 1
+    
+    subscriber.release.set()
+    assert wait_for(lambda: len(subscriber.received) == 3)
+    assert subscriber.received == [0, 1, 2]
+    assert subscriber_stats(bus)["dropped"] == 0
+
+def test_block_policy_drops_after_timeout_without_stalling_others(bus):
+    subscriber = SlowSubscriber()
+    fast = []
+    bus.subscribe(subscriber, policy=POLICY_BLOCK, max_queue_size=1, block_timeout=0.1)
+    bus.subscribe(fast.append)
+    publish_while_blocked(bus, subscriber, 3)
+    
+    # 慢订阅者背压期间其他订阅者照常收到事件
+    assert wait_for(lambda: len(fast) == 3)
+    assert wait_for(lambda: bus.get_stats()["subscriber_dropped"] == 1)
+    subscriber.release.set()
+    assert wait_for(lambda: subscriber.received == [0, 1])
+
+def test_publish_counts_from_many_threads(bus):
+    received = []
+    bus.subscribe(received.append, max_queue_size=10000)
+    
+    def publish_many():
+        for n in range(500):
+            bus.publish({"n": n})
+    
+    threads = [threading.Thread(target=publish_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    stats = bus.get_stats()
+    assert stats["published"] + stats["dropped"] == 4000
+    assert wait_for(lambda: len(received) == stats["published"])
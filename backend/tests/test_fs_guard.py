@@ -0,0 +1,135 @@
+"""挂载点熔断器状态转换"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.fs_guard import (
+    BREAKER_CLOSED,
+    BREAKER_HALF_OPEN,
+    BREAKER_OPEN,
+    FsGuard,
+    FsTimeoutError,
+    MountUnavailableError
+)
+
+@pytest.fixture
+def stuck():
+    """模拟卡死在失效挂载上的操作，测试结束时释放线程"""
+    release = threading.Event()
+    yield lambda: release.wait(10)
+    release.set()
+
+def breaker_state(guard: FsGuard) -> str:
+    (status,) = guard.get_status()
+    return status["state"]
+
+def trip(guard: FsGuard, path: str, stuck):
+    for _ in range(guard.failure_threshold):
+        with pytest.raises(FsTimeoutError):
+            guard.call(path, stuck)
+
+def test_consecutive_timeouts_open_breaker(tmp_path, stuck):
+    guard = FsGuard(timeout=0.05, failure_threshold=2, cooldown=60)
+    path = str(tmp_path)
+    
+    with pytest.raises(FsTimeoutError):
+        guard.call(path, stuck)
+    assert breaker_state(guard) == BREAKER_CLOSED
+    
+    # 成功的操作重置连续超时计数
+    assert guard.call(path, lambda: 1) == 1
+    assert guard.get_status()[0]["consecutive_timeouts"] == 0
+    
+    trip(guard, path, stuck)
+    assert breaker_state(guard) == BREAKER_OPEN
+    with pytest.raises(MountUnavailableError):
+        guard.call(path, lambda: 1)
+    with pytest.raises(MountUnavailableError):
+        guard.check(path)
+    assert guard.get_unhealthy_mounts()[0]["total_rejected"] == 1
+
+def test_half_open_allows_single_probe_and_closes_on_success(tmp_path, stuck):
+    guard = FsGuard(timeout=0.5, failure_threshold=1, cooldown=0.1)
+    path = str(tmp_path)
+    trip(guard, path, stuck)
+    time.sleep(0.15)
+    assert breaker_state(guard) == BREAKER_HALF_OPEN
+    
+    probe_started = threading.Event()
+    probe_release = threading.Event()
+    
+    def probe():
+        probe_started.set()
+        probe_release.wait(5)
+        return "ok"
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(guard.call, path, probe)
+        assert probe_started.wait(5)
+        # 试探进行中时其他操作仍被拒绝
+        with pytest.raises(MountUnavailableError):
+            guard.call(path, lambda: 1)
+        probe_release.set()
+        assert future.result(timeout=5) == "ok"
+    
+    assert breaker_state(guard) == BREAKER_CLOSED
+    assert guard.call(path, lambda: 2) == 2
+
+def test_failed_probe_reopens_breaker(tmp_path, stuck):
+    guard = FsGuard(timeout=0.05, failure_threshold=3, cooldown=0.1)
+    path = str(tmp_path)
+    trip(guard, path, stuck)
+    time.sleep(0.15)
+    
+    # 半开状态下一次超时即重新熔断，不需要再达到阈值
+    with pytest.raises(FsTimeoutError):
+        guard.call(path, stuck)
+    assert breaker_state(guard) == BREAKER_OPEN
+    with pytest.raises(MountUnavailableError):
+        guard.call(path, lambda: 1)
+
+def test_ordinary_errors_do_not_trip_breaker(tmp_path):
+    guard = FsGuard(timeout=1, failure_threshold=1, cooldown=60)
+    missing = tmp_path / "missing"
+    
+    for _ in range(3):
+        with pytest.raises(FileNotFoundError):
+            guard.call(str(missing), missing.stat)
+    assert breaker_state(guard) == BREAKER_CLOSED
+
+def test_queue_wait_does_not_count_as_timeout(tmp_path, stuck):
+    guard = FsGuard(timeout=0.3, failure_threshold=2, cooldown=60, workers_per_mount=1)
+    path = str(tmp_path)
+    worker_busy = threading.Event()
+    release = threading.Event()
+    
+    def busy():
+        worker_busy.set()
+        release.wait(5)
+        return "busy"
+    
+    def slow():
+        time.sleep(0.2)
+        return "queued"
+    
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first = executor.submit(guard.call, path, busy)
+        assert worker_busy.wait(5)
+        
+        # 排队 0.2 秒加执行 0.2 秒超过 timeout，但超时从开始执行时计算
+        queued = executor.submit(guard.call, path, slow)
+        time.sleep(0.2)
+        release.set()
+        assert first.result(timeout=5) == "busy"
+        assert queued.result(timeout=5) == "queued"
+    
+    # 唯一的线程被卡死的操作占用时，等待空闲线程超时不计入连续超时
+    with pytest.raises(FsTimeoutError):
+        guard.call(path, stuck)
+    with pytest.raises(FsTimeoutError, match="等待空闲线程"):
+        guard.call(path, lambda: 1)
+    assert guard.get_status()[0]["consecutive_timeouts"] == 1
+    assert breaker_state(guard) == BREAKER_CLOSED
@@ -0,0 +1,71 @@
+"""自适应令牌桶的速率调整与设备预算注册表"""
+
+import json
+
+import pytest
+
+import services.io_budget as io_budget_module
+from services.io_budget import AdaptiveTokenBucket, IoBudgetRegistry, TokenBucket, create_bucket
+
+def test_high_latency_backs_off_to_min_rate():
+    bucket = AdaptiveTokenBucket(100, min_rate=5, target_latency=0.05, adjust_interval=0)
+    bucket.record_latency(1.0)
+    assert bucket.rate == pytest.approx(70)
+    
+    for _ in range(50):
+        bucket.record_latency(1.0)
+    assert bucket.rate == 5
+
+def test_normal_latency_recovers_to_max_rate():
+    bucket = AdaptiveTokenBucket(100, min_rate=5, target_latency=0.05, adjust_interval=0)
+    for _ in range(20):
+        bucket.record_latency(1.0)
+    assert bucket.rate == 5
+    
+    # 平均延迟先回落到目标以下，之后每次加性增加 max_rate 的 5%
+    rates = []
+    for _ in range(200):
+        bucket.record_latency(0.0)
+        rates.append(bucket.rate)
+    assert rates == sorted(rates)
+    assert bucket.rate == 100
+    assert bucket.get_stats()["latency_ewma"] < bucket.target_latency
+
+def test_adjustments_wait_for_interval():
+    bucket = AdaptiveTokenBucket(100, adjust_interval=60)
+    bucket.record_latency(1.0)
+    assert bucket.rate == 100
+    assert bucket.latency_ewma == 1.0
+
+def test_min_rate_is_capped_by_max_rate():
+    bucket = AdaptiveTokenBucket(2, min_rate=5, adjust_interval=0)
+    bucket.record_latency(1.0)
+    assert bucket.rate == 2
+
+def test_create_bucket():
+    assert type(create_bucket(10)) is TokenBucket
+    assert isinstance(create_bucket(10, adaptive=True), AdaptiveTokenBucket)
+
+def test_registry_resolves_devices_lazily(tmp_path, monkeypatch):
+    library = tmp_path / "library"
+    library.mkdir()
+    config_file = tmp_path / "io_budgets.json"
+    config_file.write_text(json.dumps({str(library): {"ops_per_second": 50, "adaptive": False}}))
+    
+    resolved = []
+    monkeypatch.setattr(io_budget_module, "get_device_id", lambda path: resolved.append(path) or 1)
+    registry = IoBudgetRegistry(str(config_file))
+    # 加载配置时不访问文件系统
+    assert resolved == []
+    
+    throttle = registry.throttle_for(str(library / "movies"))
+    assert throttle is not None
+    assert [bucket.rate for bucket in throttle.buckets] == [50]
+    assert str(library) in resolved
+    
+    # 同一设备上的新预算替换旧预算
+    other = tmp_path / "other"
+    other.mkdir()
+    registry.set_device_budget(str(other), 20)
+    assert [status["path"] for status in registry.get_status()] == [str(other)]
+    assert [bucket.rate for bucket in registry.throttle_for(str(library)).buckets] == [20]
@@ -0,0 +1,64 @@
+"""日志流式导出：跨分段按时间顺序读取、分块输出与 gzip 压缩"""
+
+import asyncio
+import gzip
+import json
+
+import pytest
+
+import api.logs as logs_api
+from services.logger import LogManager
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    # 分段很小，导出需要跨多个分段读取
+    manager = LogManager(str(tmp_path / "logs"), max_segment_bytes=512, use_store=False)
+    logger = manager.get_logger("tests.export")
+    try:
+        for i in range(40):
+            if i % 10 == 0:
+                logger.warning(f"导出记录 {i}")
+            else:
+                logger.info(f"导出记录 {i}")
+    finally:
+        logger.removeHandler(manager.queue_handler)
+        manager.shutdown()
+    
+    monkeypatch.setattr(logs_api, "log_manager", manager)
+    monkeypatch.setattr(logs_api, "EXPORT_CHUNK_SIZE", 256)
+    return manager
+
+def export(**params) -> bytes:
+    params = {
+        "format_type": "json", "limit": None, "level": None, "start_time": None,
+        "end_time": None, "search": None, "compress": False, **params
+    }
+    
+    async def run():
+        response = await logs_api.export_logs(**params)
+        return [chunk async for chunk in response.body_iterator]
+    
+    chunks = asyncio.run(run())
+    assert all(chunks)
+    return b"".join(chunks)
+
+def test_iter_logs_reads_segments_oldest_first(manager):
+    assert len(manager.file_handler.snapshot()) > 3
+    messages = [entry["message"] for _, entry in manager.iter_logs(name="tests.export")]
+    assert messages == [f"导出记录 {i}" for i in range(40)]
+
+def test_json_export_is_chronological_and_filtered(manager):
+    entries = json.loads(export())
+    assert [entry["message"] for entry in entries if entry["name"] == "tests.export"] == [
+        f"导出记录 {i}" for i in range(40)
+    ]
+    
+    warnings = json.loads(export(level="warning"))
+    assert [entry["message"] for entry in warnings] == [f"导出记录 {i}" for i in (0, 10, 20, 30)]
+    assert len(json.loads(export(search="导出记录", limit=5))) == 5
+
+def test_gzip_text_export(manager):
+    text = gzip.decompress(export(format_type="txt", search="导出记录 3", compress=True)).decode("utf-8")
+    lines = text.splitlines()
+    assert len(lines) == 11
+    assert lines[0].endswith("INFO tests.export - 导出记录 3")
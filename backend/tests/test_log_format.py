@@ -0,0 +1,50 @@
+"""快速 JSON 日志格式化器的输出"""
+
+import json
+import logging
+import sys
+import time
+
+from services.log_format import FastJsonFormatter
+from services.log_segments import parse_log_time
+
+def make_record(message: str, **extra) -> logging.LogRecord:
+    return logging.makeLogRecord({
+        "name": "services.scanner",
+        "levelname": "INFO",
+        "levelno": logging.INFO,
+        "msg": message,
+        **extra
+    })
+
+def test_output_is_valid_json_with_fixed_fields():
+    record = make_record('路径 "C:\\媒体\\电影"\n第二行\t%s', args=("参数",))
+    line = FastJsonFormatter().format(record)
+    
+    assert "\n" not in line
+    assert "路径" in line  # 中文不转义
+    entry = json.loads(line)
+    assert list(entry) == ["asctime", "name", "levelname", "message"]
+    assert entry["message"] == '路径 "C:\\媒体\\电影"\n第二行\t参数'
+    assert entry["name"] == "services.scanner" and entry["levelname"] == "INFO"
+
+def test_asctime_is_parseable_and_cached_per_second():
+    formatter = FastJsonFormatter()
+    created = time.time()
+    first = make_record("a", created=created, msecs=(created % 1) * 1000)
+    second = make_record("b", created=created, msecs=999)
+    
+    asctime = json.loads(formatter.format(first))["asctime"]
+    assert abs(parse_log_time(asctime) - created) < 0.002
+    # 同一秒内复用时间前缀，只有毫秒不同
+    assert json.loads(formatter.format(second))["asctime"] == asctime[:-3] + "999"
+
+def test_exception_is_included():
+    try:
+        raise ValueError("出错了")
+    except ValueError:
+        record = make_record("处理失败", exc_info=sys.exc_info())
+    
+    entry = json.loads(FastJsonFormatter().format(record))
+    assert entry["message"] == "处理失败"
+    assert "ValueError: 出错了" in entry["exc_info"]
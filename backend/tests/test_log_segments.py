@@ -0,0 +1,96 @@
+"""分段日志的保留策略与压缩分段的读取"""
+
+import logging
+import time
+
+from services.log_segments import (
+    COMPRESSED_SUFFIX,
+    SegmentedLogHandler,
+    index_path,
+    read_segment_forward,
+    read_segment_reversed
+)
+
+DAY = 86400
+
+def emit(handler: SegmentedLogHandler, created: float, message: str):
+    handler.emit(logging.makeLogRecord({"msg": message, "levelname": "INFO", "created": created}))
+
+def make_handler(tmp_path) -> SegmentedLogHandler:
+    """三个分段：10 天前、5 天前（已滚动）和当前分段"""
+    handler = SegmentedLogHandler(tmp_path / "app.log")
+    now = time.time()
+    emit(handler, now - 10 * DAY, "oldest")
+    emit(handler, now - 5 * DAY, "middle")
+    emit(handler, now, "current")
+    return handler
+
+def test_retention_deletes_and_compresses_whole_segments(tmp_path):
+    handler = make_handler(tmp_path)
+    try:
+        current, middle, oldest = handler.snapshot()
+        assert current.path == tmp_path / "app.log"
+        
+        result = handler.apply_retention(max_age=7 * DAY, compress_age=DAY)
+        assert result["deleted"] == 1
+        assert result["compressed"] == 1
+        assert result["freed_bytes"] >= oldest.size
+        
+        assert not oldest.path.exists()
+        assert not index_path(oldest.path).exists()
+        assert not middle.path.exists()
+        
+        remaining = handler.snapshot()
+        assert [segment.count for segment in remaining] == [1, 1]
+        assert remaining[1].path.name.endswith(COMPRESSED_SUFFIX)
+        assert remaining[1].path.exists()
+        
+        # 当前分段不受影响，之后的写入正常追加
+        assert (tmp_path / "app.log").exists()
+        emit(handler, time.time(), "after")
+        assert handler.snapshot()[0].count == 2
+    finally:
+        handler.close()
+
+def test_retention_size_limit_drops_oldest_first(tmp_path):
+    handler = make_handler(tmp_path)
+    try:
+        current, middle, oldest = handler.snapshot()
+        
+        result = handler.apply_retention(max_total_bytes=current.size + middle.size)
+        assert result == {"deleted": 1, "compressed": 0, "freed_bytes": oldest.size}
+        assert [segment.path for segment in handler.snapshot()] == [current.path, middle.path]
+        
+        # 当前分段即使超出上限也保留
+        result = handler.apply_retention(max_total_bytes=0)
+        assert result["deleted"] == 1
+        assert [segment.path for segment in handler.snapshot()] == [current.path]
+    finally:
+        handler.close()
+
+def test_retention_reloads_from_index_files(tmp_path):
+    handler = make_handler(tmp_path)
+    handler.close()
+    
+    reopened = SegmentedLogHandler(tmp_path / "app.log")
+    try:
+        assert reopened.apply_retention(max_age=7 * DAY)["deleted"] == 1
+        assert len(reopened.snapshot()) == 2
+    finally:
+        reopened.close()
+
+def test_compressed_segments_remain_readable(tmp_path):
+    handler = SegmentedLogHandler(tmp_path / "app.log")
+    try:
+        now = time.time()
+        for i in range(5):
+            emit(handler, now - 3 * DAY + i, f"line {i}")
+        emit(handler, now, "current")
+        
+        handler.apply_retention(compress_age=DAY)
+        segment = handler.snapshot()[1]
+        assert segment.path.name.endswith(COMPRESSED_SUFFIX)
+        assert list(read_segment_forward(segment)) == [f"line {i}" for i in range(5)]
+        assert list(read_segment_reversed(segment)) == [f"line {i}" for i in reversed(range(5))]
+    finally:
+        handler.close()
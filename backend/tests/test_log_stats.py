@@ -0,0 +1,42 @@
+"""日志统计的累计计数、按小时范围与持久化"""
+
+import logging
+import time
+
+from services.log_stats import LogStats, LogStatsHandler
+
+HOUR = 3600
+
+def test_counts_levels_loggers_and_recent_errors(tmp_path):
+    stats = LogStats(tmp_path / "stats.json")
+    now = time.time()
+    stats.record(now - 48 * HOUR, "ERROR", "services.scanner", "旧")
+    stats.record(now - HOUR, "ERROR", "services.scanner", "近")
+    stats.record(now, "INFO", "services.watcher", "最新")
+    
+    result = stats.get_stats(hours=24)
+    assert result["total"] == 3
+    assert result["level_counts"] == {"ERROR": 2, "INFO": 1}
+    assert result["logger_counts"] == {"services.scanner": 2, "services.watcher": 1}
+    # 最近错误和按小时计数只统计查询范围内的小时
+    assert result["recent_errors"] == 1
+    assert sum(hour["total"] for hour in result["hourly"]) == 2
+    assert result["latest_log_time"] == "最新"
+    assert result["since"] == now - 48 * HOUR
+    assert stats.get_stats(hours=72)["recent_errors"] == 2
+
+def test_counts_are_persisted_and_seed_only_fresh_files(tmp_path):
+    stats_file = tmp_path / "stats.json"
+    stats = LogStats(stats_file, seed={"INFO": 5})
+    assert stats.get_stats()["total"] == 5
+    
+    handler = LogStatsHandler(stats)
+    handler.emit(logging.makeLogRecord({"name": "tests", "levelname": "WARNING", "msg": "警告"}))
+    handler.close()
+    
+    # 已有计数文件时忽略初始计数
+    reloaded = LogStats(stats_file, seed={"INFO": 100})
+    result = reloaded.get_stats()
+    assert result["total"] == 6
+    assert result["level_counts"] == {"INFO": 5, "WARNING": 1}
+    assert result["logger_counts"] == {"tests": 1}
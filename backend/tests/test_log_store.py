@@ -0,0 +1,68 @@
+"""SQLite 日志索引存储的查询、搜索与过期删除"""
+
+import json
+import time
+
+import pytest
+
+from services.log_store import LogStore, fts5_available
+from services.logger import LogManager
+
+pytestmark = pytest.mark.skipif(not fts5_available(), reason="当前 SQLite 不支持 FTS5")
+
+def add(store: LogStore, created: float, level: str, name: str, message: str):
+    record = json.dumps({"name": name, "levelname": level, "message": message}, ensure_ascii=False)
+    store.add(created, level, name, message, record)
+
+@pytest.fixture
+def store(tmp_path):
+    store = LogStore(str(tmp_path / "logs.db"))
+    now = time.time()
+    add(store, now - 300, "INFO", "services.scanner", "开始扫描目录: /media/movies")
+    add(store, now - 200, "ERROR", "services.scanner", "处理 .strm 文件 Movie.(mp4).strm 时出错")
+    add(store, now - 100, "INFO", "services.scheduler", "定时任务 movies 执行成功")
+    add(store, now, "WARNING", "services.watcher", "目录监控已停止")
+    yield store
+    store.close()
+
+def messages(entries):
+    return [entry["message"] for entry in entries]
+
+def test_query_filters_and_pages_newest_first(store):
+    now = time.time()
+    assert messages(store.query(limit=2)) == ["目录监控已停止", "定时任务 movies 执行成功"]
+    assert messages(store.query(limit=2, offset=2))[0].startswith("处理 .strm 文件")
+    assert len(store.query(level="error")) == 1
+    assert len(store.query(name="services.scanner")) == 2
+    assert messages(store.query(start_ts=now - 150, end_ts=now - 50)) == ["定时任务 movies 执行成功"]
+
+def test_search_uses_full_text_index_and_short_keyword_fallback(store):
+    # 三个字符以上的关键词走 FTS5 索引，大小写不敏感
+    assert messages(store.query(search="MOVIE.(mp4)")) == ["处理 .strm 文件 Movie.(mp4).strm 时出错"]
+    # 过短的关键词退回逐行匹配，仍能找到中文子串
+    assert messages(store.query(search="监控")) == ["目录监控已停止"]
+    assert store.query(search="不存在的关键词") == []
+
+def test_delete_before_removes_old_records_from_both_tables(store):
+    assert store.delete_before(time.time() - 150) == 2
+    assert len(store.query()) == 2
+    assert store.query(search="开始扫描") == []
+
+def test_log_manager_queries_through_store(tmp_path):
+    manager = LogManager(str(tmp_path / "logs"), use_store=True)
+    logger = manager.get_logger("tests.log_store")
+    try:
+        assert manager.store is not None
+        for i in range(3):
+            logger.info(f"索引存储记录 {i}")
+        
+        # 日志由后台监听线程写入，等待全部入库
+        deadline = time.time() + 5
+        while len(manager.get_logs(name="tests.log_store")) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        
+        assert messages(manager.get_logs(name="tests.log_store")) == [f"索引存储记录 {i}" for i in (2, 1, 0)]
+        assert messages(manager.get_logs(search="记录 1")) == ["索引存储记录 1"]
+    finally:
+        logger.removeHandler(manager.queue_handler)
+        manager.shutdown()
@@ -0,0 +1,60 @@
+"""实时日志推送：服务端过滤、有界缓冲与跨线程唤醒"""
+
+import asyncio
+import logging
+import threading
+
+from services.log_tail import LogTailHandler, LogTailHub
+
+def record(name: str, level: int, message: str) -> logging.LogRecord:
+    return logging.makeLogRecord({
+        "name": name,
+        "levelno": level,
+        "levelname": logging.getLevelName(level),
+        "msg": message
+    })
+
+def test_listener_thread_records_wake_filtered_subscribers():
+    hub = LogTailHub()
+    handler = LogTailHandler(hub)
+    
+    async def run():
+        errors = hub.subscribe(level="error")
+        scanner = hub.subscribe(name="services.scanner", search="扫描")
+        
+        def listener():
+            handler.emit(record("services.scanner", logging.INFO, "开始扫描目录"))
+            handler.emit(record("services.scanner", logging.ERROR, "处理文件出错"))
+            handler.emit(record("services.watcher", logging.INFO, "扫描完成"))
+        
+        thread = threading.Thread(target=listener)
+        thread.start()
+        await asyncio.wait_for(errors.ready.wait(), 5)
+        await asyncio.wait_for(scanner.ready.wait(), 5)
+        thread.join()
+        
+        assert [entry["message"] for entry in errors.drain()] == ["处理文件出错"]
+        assert [entry["message"] for entry in scanner.drain()] == ["开始扫描目录"]
+        assert not errors.ready.is_set()
+        
+        hub.unsubscribe(errors)
+        hub.unsubscribe(scanner)
+        assert not hub.has_subscribers
+        handler.emit(record("services.scanner", logging.ERROR, "取消订阅后不再推送"))
+        assert not errors.buffer and not scanner.buffer
+    
+    asyncio.run(run())
+
+def test_slow_subscriber_drops_oldest_entries():
+    hub = LogTailHub()
+    handler = LogTailHandler(hub)
+    
+    async def run():
+        subscriber = hub.subscribe(buffer_size=3)
+        for i in range(5):
+            handler.emit(record("tests", logging.INFO, f"日志 {i}"))
+        
+        assert [entry["message"] for entry in subscriber.drain()] == ["日志 2", "日志 3", "日志 4"]
+        assert hub.get_stats() == {"subscribers": 1, "delivered": 3, "dropped": 2}
+    
+    asyncio.run(run())
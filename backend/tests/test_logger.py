@@ -0,0 +1,54 @@
+"""日志队列处理器：业务线程只入队，后台监听线程统一写入文件"""
+
+import logging
+import threading
+
+import pytest
+
+from services.logger import LogManager
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = LogManager(str(tmp_path / "logs"), use_store=False)
+    yield manager
+    manager.shutdown()
+
+def test_loggers_share_one_queue_handler(manager):
+    first = manager.get_logger("tests.queue.first")
+    second = manager.get_logger("tests.queue.second")
+    try:
+        manager.get_logger("tests.queue.first")
+        assert first.handlers == [manager.queue_handler]
+        assert second.handlers == [manager.queue_handler]
+    finally:
+        first.removeHandler(manager.queue_handler)
+        second.removeHandler(manager.queue_handler)
+
+def test_records_from_many_threads_are_written_by_listener(manager):
+    logger = manager.get_logger("tests.queue.threads")
+    try:
+        def emit(worker: int):
+            for i in range(50):
+                logger.info(f"worker {worker} 记录 {i}")
+        
+        threads = [threading.Thread(target=emit, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        logger.debug("低于 INFO 的日志不写入")
+    finally:
+        logger.removeHandler(manager.queue_handler)
+    
+    # 停止监听线程时写出队列中剩余的日志，重复调用无副作用
+    manager.shutdown()
+    manager.shutdown()
+    
+    logs = manager.get_logs(limit=1000, name="tests.queue.threads")
+    assert len(logs) == 200
+    assert {entry["levelname"] for entry in logs} == {"INFO"}
+    # 同一线程的日志按写入顺序保存（get_logs 按时间倒序返回）
+    for worker in range(4):
+        messages = [entry["message"] for entry in reversed(logs) if entry["message"].startswith(f"worker {worker} ")]
+        assert messages == [f"worker {worker} 记录 {i}" for i in range(50)]
+    assert manager.get_logs(limit=10, search="worker 2 记录 7", name="tests.queue.threads")[0]["message"] == "worker 2 记录 7"
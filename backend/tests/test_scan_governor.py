@@ -0,0 +1,69 @@
+"""扫描去重键和扫描控制器的合并"""
+
+import os
+import threading
+
+from services.scan_governor import ScanGovernor, make_scan_key
+
+def test_make_scan_key_normalizes_path_and_extensions(tmp_path):
+    library = tmp_path / "library"
+    library.mkdir()
+    os.symlink(library, tmp_path / "alias")
+    
+    key = make_scan_key(str(library), True, [".MKV", ".iso"], None)
+    assert make_scan_key(str(library) + os.sep, True, [".iso", ".mkv"], []) == key
+    assert make_scan_key(str(tmp_path / "alias"), True, [".iso", ".mkv"]) == key
+
+def test_make_scan_key_distinguishes_scan_rules(tmp_path):
+    key = make_scan_key(str(tmp_path))
+    assert make_scan_key(str(tmp_path), recursive=False) != key
+    assert make_scan_key(str(tmp_path), custom_video_extensions=[".iso"]) != key
+    assert make_scan_key(str(tmp_path), custom_metadata_extensions=[".txt"]) != key
+    assert make_scan_key(str(tmp_path), dry_run=True) != key
+
+def test_duplicate_submissions_share_one_job(tmp_path):
+    governor = ScanGovernor(max_concurrent_scans=1)
+    release = threading.Event()
+    calls = []
+    
+    def scan():
+        calls.append(1)
+        release.wait(5)
+        return "done"
+    
+    key = make_scan_key(str(tmp_path))
+    first = governor.submit(key, scan, description="first")
+    second = governor.submit(make_scan_key(str(tmp_path) + os.sep), scan, description="second")
+    assert second is first
+    assert first.merged_requests == 1
+    assert governor.is_active(key)
+    
+    release.set()
+    assert first.future.result(timeout=5) == "done"
+    assert len(calls) == 1
+    
+    # 完成后的相同请求重新执行
+    third = governor.submit(key, scan, description="third")
+    assert third is not first
+    assert third.future.result(timeout=5) == "done"
+
+def test_batch_scan_uses_budget_of_every_device(monkeypatch):
+    import services.scan_governor as governor_module
+    monkeypatch.setattr(governor_module, "get_device_id", lambda path: {"a": 1, "b": 2, "c": 3}[path])
+    governor = ScanGovernor(max_concurrent_scans=4, max_scans_per_device=1)
+    release = threading.Event()
+    
+    def scan():
+        release.wait(5)
+        return "done"
+    
+    batch = governor.submit(("batch",), scan, paths=["a", "b"])
+    on_b = governor.submit(("b",), scan, path="b")
+    on_c = governor.submit(("c",), scan, path="c")
+    assert batch.state == "running"
+    # 批量扫描占用了设备 b 的预算，其他设备上的扫描不受影响
+    assert on_b.state == "queued"
+    assert on_c.state == "running"
+    
+    release.set()
+    assert on_b.future.result(timeout=5) == "done"
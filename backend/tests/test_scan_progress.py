@@ -0,0 +1,43 @@
+"""扫描进度估算与扫描历史"""
+
+import os
+
+from services.scan_progress import ScanHistory, ScanProgress
+
+def test_progress_uses_previous_directory_count(tmp_path):
+    progress = ScanProgress(str(tmp_path), expected_directories=4)
+    assert progress.to_dict()["percent"] == 0
+    
+    for _ in range(2):
+        progress.directory_visited()
+    status = progress.to_dict()
+    assert status["percent"] == 50.0
+    assert status["eta_seconds"] is not None
+    
+    # 目录比上次多时未完成的扫描最多报告 99%
+    for _ in range(4):
+        progress.directory_visited()
+    assert progress.to_dict()["percent"] == 99.0
+    
+    progress.finish()
+    assert progress.to_dict()["percent"] == 100.0
+    assert progress.to_dict()["eta_seconds"] == 0
+
+def test_history_is_keyed_by_real_path_and_persisted(tmp_path):
+    library = tmp_path / "library"
+    library.mkdir()
+    os.symlink(library, tmp_path / "alias")
+    history_file = tmp_path / "scan_history.json"
+    
+    history = ScanHistory(str(history_file))
+    assert history.new_progress(str(library)).expected_directories is None
+    
+    finished = ScanProgress(str(library))
+    for _ in range(7):
+        finished.directory_visited()
+    finished.finish()
+    history.record(str(library), True, finished)
+    
+    reloaded = ScanHistory(str(history_file))
+    assert reloaded.new_progress(str(tmp_path / "alias")).expected_directories == 7
+    assert reloaded.new_progress(str(library), recursive=False).expected_directories is None
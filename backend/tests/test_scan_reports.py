@@ -0,0 +1,87 @@
+"""扫描报告的保存、查询与两次扫描的对比"""
+
+import services.scan_reports as scan_reports_module
+from services.scan_reports import ScanReportStore
+
+def scan_result(details, errors=()):
+    return {
+        "directory": "/media",
+        "duration": 1.0,
+        "details": [{"file": file, "result": result} for file, result in details],
+        "errors": list(errors)
+    }
+
+def ok(links: int = 0):
+    return {"success": True, "links_created": links}
+
+def failed(error: str):
+    return {"success": False, "error": error}
+
+def test_record_and_query_failed_files(tmp_path):
+    store = ScanReportStore(str(tmp_path / "reports"))
+    result = scan_result(
+        [("/media/a/1.strm", ok(2)), ("/media/a/2.strm", ok()), ("/media/b/3.strm", failed("权限不足"))],
+        errors=[{"file": "/media/b/4.strm", "error": "权限不足"}]
+    )
+    report_id = store.record(result, "手动扫描", "api")
+    
+    assert result["report_id"] == report_id
+    meta = store.list_reports()[0]
+    assert meta["summary"] == {"linked": 1, "unchanged": 1, "failed": 2}
+    assert meta["links_created"] == 2 and meta["total_files"] == 4
+    
+    # 目录和错误信息字典编码
+    report = store.load(report_id)
+    assert report.directories == ["/media/a", "/media/b"]
+    assert report.errors == ["权限不足"]
+    
+    files = store.get_files(report_id, status="failed")
+    assert files["total"] == 2
+    assert [row["file"] for row in files["files"]] == ["/media/b/3.strm", "/media/b/4.strm"]
+    assert {row["error"] for row in files["files"]} == {"权限不足"}
+    
+    # 重新载入索引后仍可查询
+    assert ScanReportStore(str(tmp_path / "reports")).list_reports()[0]["report_id"] == report_id
+
+def test_preview_and_invalid_reports_are_not_saved(tmp_path):
+    store = ScanReportStore(str(tmp_path / "reports"))
+    result = scan_result([("/media/1.strm", ok(1))])
+    assert store.record(result, "预览", "api", dry_run=True) is None
+    assert "report_id" not in result
+    assert store.list_reports() == []
+    assert store.load("../index") is None
+
+def test_diff_between_two_scans(tmp_path):
+    store = ScanReportStore(str(tmp_path / "reports"))
+    base = store.record(scan_result([
+        ("/media/fixed.strm", failed("挂载点不可用")),
+        ("/media/breaks.strm", ok(1)),
+        ("/media/more.strm", ok(1)),
+        ("/media/gone.strm", ok()),
+        ("/media/same.strm", ok(1)),
+    ]), "基准", "scheduler")
+    target = store.record(scan_result([
+        ("/media/fixed.strm", ok(2)),
+        ("/media/breaks.strm", failed("权限不足")),
+        ("/media/more.strm", ok(3)),
+        ("/media/new.strm", ok(1)),
+        ("/media/same.strm", ok(1)),
+    ]), "对比", "scheduler")
+    
+    diff = store.diff(base, target)
+    assert diff["counts"] == {"newly_failed": 1, "fixed": 1, "added": 1, "removed": 1, "links_changed": 1}
+    changes = diff["changes"]
+    assert changes["newly_failed"] == [{"file": "/media/breaks.strm", "error": "权限不足"}]
+    assert changes["fixed"] == [{"file": "/media/fixed.strm", "previous_error": "挂载点不可用"}]
+    assert changes["added"][0]["file"] == "/media/new.strm"
+    assert changes["removed"][0]["file"] == "/media/gone.strm"
+    assert changes["links_changed"] == [{"file": "/media/more.strm", "base_links": 1, "target_links": 3}]
+    assert store.diff(base, "missing") is None
+
+def test_old_reports_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(scan_reports_module, "MAX_REPORTS", 2)
+    store = ScanReportStore(str(tmp_path / "reports"))
+    report_ids = [store.record(scan_result([("/media/1.strm", ok())]), f"扫描 {i}", "api") for i in range(3)]
+    
+    assert [meta["report_id"] for meta in store.list_reports()] == list(reversed(report_ids[1:]))
+    assert store.load(report_ids[0]) is None
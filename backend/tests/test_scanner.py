@@ -0,0 +1,162 @@
+"""扫描遍历顺序、断点续扫、扩展名增量扫描与扫描日志量"""
+
+import logging
+import os
+from pathlib import Path
+
+import services.scanner as scanner_module
+from services.scanner import StrmScanner, WalkPosition
+from services.work_scheduler import PRIORITY_BULK
+
+def make_library(root: Path):
+    files = [
+        "0.(mp4).strm",
+        "a/1.(mp4).strm",
+        "a/2.(mkv).strm",
+        "a/sub/3.(mp4).strm",
+        "a b/4.(mp4).strm",
+        "b/5.(mp4).strm",
+        "b/c/d/6.(mp4).strm",
+    ]
+    for name in files + ["a/notes.txt", "b/7.(xyz).strm"]:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    (root / "empty").mkdir()
+
+def test_iteration_order_is_preorder_by_name(tmp_path):
+    make_library(tmp_path)
+    found = [path.relative_to(tmp_path).as_posix() for path in StrmScanner()._iter_strm_files(tmp_path, True)]
+    assert found == [
+        "0.(mp4).strm",
+        "a/1.(mp4).strm",
+        "a/2.(mkv).strm",
+        "a/sub/3.(mp4).strm",
+        "a b/4.(mp4).strm",
+        "b/5.(mp4).strm",
+        "b/c/d/6.(mp4).strm",
+    ]
+    
+    flat = [path.name for path in StrmScanner()._iter_strm_files(tmp_path, False)]
+    assert flat == ["0.(mp4).strm"]
+
+def test_resume_yields_exactly_the_remaining_files(tmp_path):
+    make_library(tmp_path)
+    scanner = StrmScanner()
+    full = list(scanner._iter_strm_files(tmp_path, True))
+    
+    for index, checkpoint in enumerate(full):
+        resumed = list(scanner._iter_strm_files(tmp_path, True, resume_after=str(checkpoint)))
+        assert resumed == full[index + 1:]
+
+def test_resume_after_deleted_checkpoint(tmp_path):
+    make_library(tmp_path)
+    scanner = StrmScanner()
+    checkpoint = tmp_path / "a" / "sub" / "3.(mp4).strm"
+    checkpoint.unlink()
+    
+    resumed = [path.name for path in scanner._iter_strm_files(tmp_path, True, resume_after=str(checkpoint))]
+    assert resumed == ["4.(mp4).strm", "5.(mp4).strm", "6.(mp4).strm"]
+
+def test_checkpoint_advances_through_directories_without_strm_files(tmp_path):
+    for name in ["a/x", "a/y", "b"]:
+        (tmp_path / name).mkdir(parents=True)
+    (tmp_path / "c").mkdir()
+    (tmp_path / "c" / "1.(mp4).strm").touch()
+    scanner = StrmScanner()
+    
+    # 每次运行只完成一个目录就超时，断点应逐个目录推进而不是停在扫描根目录
+    checkpoint = None
+    checkpoints = []
+    found = []
+    for _ in range(10):
+        position = WalkPosition(checkpoint)
+        found += scanner._iter_strm_files(tmp_path, True, resume_after=checkpoint, deadline=0, position=position)
+        if position.checkpoint == checkpoint:
+            break
+        checkpoint = position.checkpoint
+        checkpoints.append(checkpoint)
+    
+    assert checkpoints == [
+        os.path.join(str(tmp_path / name), "") if name else os.path.join(str(tmp_path), "")
+        for name in ["", "a", "a/x", "a/y", "b", "c"]
+    ]
+    assert found == [tmp_path / "c" / "1.(mp4).strm"]
+
+def test_scan_new_extensions_links_only_new_extensions_on_bulk_lane(tmp_path, monkeypatch):
+    for name in [
+        "A.(mp4).strm", "A.nfo", "A.abc",
+        "B.(iso).strm", "B.nfo",
+        "C.(mp4).strm", "C.nfo",
+    ]:
+        (tmp_path / name).touch()
+    (tmp_path / "A.(mp4).nfo").symlink_to(tmp_path / "A.nfo")
+    
+    priorities = []
+    submit = scanner_module.work_scheduler.submit
+    
+    def record_submit(fn, *args, **kwargs):
+        priorities.append(kwargs.get("priority"))
+        return submit(fn, *args, **kwargs)
+    
+    monkeypatch.setattr(scanner_module.work_scheduler, "submit", record_submit)
+    scanner = StrmScanner(custom_video_extensions=["iso"], custom_metadata_extensions=[".abc"])
+    result = scanner.scan_new_extensions(str(tmp_path), metadata_extensions=[".abc"], video_extensions=["iso"])
+    
+    # A 补建新元数据扩展名的链接，新视频扩展名的 B 按全部元数据扩展名处理，C 没有需要补建的链接
+    assert result["total_files"] == 3
+    assert result["created_links"] == 2
+    assert result["skipped"] == 1
+    assert sorted(path.name for path in tmp_path.iterdir() if path.is_symlink()) == [
+        "A.(mp4).abc", "A.(mp4).nfo", "B.(iso).nfo"
+    ]
+    assert priorities == [PRIORITY_BULK, PRIORITY_BULK]
+
+class RecordList(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.records = []
+    
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+
+def scan_with_records(tmp_path, scanner: StrmScanner):
+    for name in ["A.(mp4).strm", "A.nfo", "B.(mkv).strm", "B.nfo", "B.jpg"]:
+        (tmp_path / name).touch()
+    
+    handler = RecordList()
+    scanner_module.logger.addHandler(handler)
+    try:
+        result = scanner.scan_directory(str(tmp_path), record_history=False)
+    finally:
+        scanner_module.logger.removeHandler(handler)
+    return result, handler.records
+
+def test_per_file_logs_are_skipped_below_debug(tmp_path):
+    result, records = scan_with_records(tmp_path, StrmScanner())
+    
+    assert result["created_links"] == 3
+    messages = [record.getMessage() for record in records]
+    assert not any("软链接" in message for message in messages)
+    summaries = [message for message in messages if message.startswith("扫描汇总")]
+    assert len(summaries) == 1
+    assert "新建链接 3 个" in summaries[0]
+
+def test_verbose_scan_logs_each_file_at_info(tmp_path):
+    result, records = scan_with_records(tmp_path, StrmScanner(verbose=True))
+    
+    assert result["created_links"] == 3
+    created = [record for record in records if record.getMessage().startswith("创建元数据软链接")]
+    skipped = [record for record in records if record.getMessage().startswith("跳过视频软链接创建")]
+    assert len(created) == 3 and len(skipped) == 2
+    assert {record.levelno for record in created + skipped} == {logging.INFO}
+
+def test_detail_level_follows_logger_level():
+    scanner = StrmScanner()
+    assert scanner._detail_level() is None
+    
+    scanner_module.logger.setLevel(logging.DEBUG)
+    try:
+        assert scanner._detail_level() == logging.DEBUG
+    finally:
+        scanner_module.logger.setLevel(logging.INFO)
@@ -0,0 +1,167 @@
+"""定时任务的更新、扫描合并、错峰调度、超时断点与续扫"""
+
+import os
+import threading
+import time
+
+import pytest
+
+import services.scheduler as scheduler_module
+from services.dirty_tracker import DirtyTracker
+from services.scan_governor import scan_governor, make_scan_key
+from services.scanner import StrmScanner
+from services.scheduler import SchedulerService
+from services.task_store import TaskStore
+
+VIDEO = {".mp4", ".mkv"}
+METADATA = {".nfo", ".jpg"}
+
+def scan_result(timed_out: bool, checkpoint=None) -> dict:
+    return {
+        "success": True,
+        "total_files": 0,
+        "processed": 0,
+        "created_links": 0,
+        "skipped": 0,
+        "errors": [],
+        "details": [],
+        "duration": 0.0,
+        "timed_out": timed_out,
+        "checkpoint": checkpoint
+    }
+
+@pytest.fixture
+def service(tmp_path):
+    service = SchedulerService(TaskStore(str(tmp_path / "scheduler.db")))
+    service.start()
+    yield service
+    service.stop()
+
+def test_resumed_run_keeps_first_attempt_start(service, tmp_path, monkeypatch):
+    library = tmp_path / "library"
+    library.mkdir()
+    tracker = DirtyTracker()
+    tracker.start_coverage(str(library), set(VIDEO), set(METADATA))
+    monkeypatch.setattr(scheduler_module, "dirty_tracker", tracker)
+    
+    results = [scan_result(True, os.path.join(str(library / "a"), "")), scan_result(False)]
+    resumed_from = []
+    
+    def fake_scan(self, directory, resume_after=None, **kwargs):
+        resumed_from.append(resume_after)
+        return results.pop(0)
+    
+    monkeypatch.setattr(StrmScanner, "scan_directory", fake_scan)
+    service.add_scan_task("movies", str(library), [], "interval", {"hours": 24}, time_limit=60)
+    
+    service._execute_scan_task("movies")
+    first_started = service.tasks["movies"]["checkpoint_started_at"]
+    assert service.tasks["movies"]["last_status"] == "timed_out"
+    assert first_started is not None
+    
+    # 首次运行之后标记的脏目录可能位于续扫跳过的部分
+    time.sleep(0.01)
+    tracker.mark_dirty(str(library / "a"))
+    
+    # 重启后从存储恢复断点和首次运行的开始时间
+    service.stop()
+    service.start()
+    assert service.tasks["movies"]["checkpoint_started_at"] == first_started
+    
+    service._execute_scan_task("movies")
+    task = service.tasks["movies"]
+    assert resumed_from == [None, os.path.join(str(library / "a"), "")]
+    assert task["last_status"] == "success"
+    assert task["last_run"] == first_started
+    assert task["checkpoint"] is None and task["checkpoint_started_at"] is None
+    assert tracker.plan_scan(str(library), True, time.time() + 1, VIDEO, METADATA) == [(str(library / "a"), False)]
+    
+    stored = service.task_store.load_tasks()[0]
+    assert stored["last_run"] == first_started
+    assert stored["run_count"] == 1
+    assert stored["checkpoint"] is None and stored["checkpoint_started_at"] is None
+
+def test_scheduled_run_merges_with_manual_scan_of_same_directory(service, tmp_path, monkeypatch):
+    library = tmp_path / "library"
+    library.mkdir()
+    release = threading.Event()
+    
+    def manual_scan():
+        release.wait(5)
+        return scan_result(False)
+    
+    def fail_scan(self, *args, **kwargs):
+        raise AssertionError("合并后的定时任务不应再次扫描")
+    
+    monkeypatch.setattr(StrmScanner, "scan_directory", fail_scan)
+    manual = scan_governor.submit(make_scan_key(str(library)), manual_scan, description="manual", path=str(library))
+    
+    service.add_scan_task("movies", str(library) + os.sep, [], "interval", {"hours": 24})
+    service.add_scan_task("limited", str(library), [], "interval", {"hours": 24}, time_limit=60)
+    assert service._submit_task("movies", "manual") is manual
+    # 限时任务可能只扫描部分目录，不与完整扫描合并
+    limited = service._submit_task("limited", "manual")
+    assert limited is not manual
+    
+    release.set()
+    manual.future.result(5)
+    for _ in range(100):
+        if service.tasks["movies"]["run_count"]:
+            break
+        time.sleep(0.01)
+    
+    assert service.tasks["movies"]["run_count"] == 1
+    assert service.tasks["movies"]["last_run"] is not None
+    assert [run["status"] for run in service.task_store.get_runs("movies")] == ["success"]
+    with pytest.raises(AssertionError):
+        limited.future.result(5)
+
+def test_updating_task_keeps_run_stats(service, tmp_path, monkeypatch):
+    library = tmp_path / "library"
+    (library / "anime").mkdir(parents=True)
+    monkeypatch.setattr(StrmScanner, "scan_directory", lambda self, *args, **kwargs: scan_result(False))
+    service.add_scan_task("movies", str(library), [], "interval", {"hours": 24}, skip_watched=False)
+    service._execute_scan_task("movies")
+    last_run = service.tasks["movies"]["last_run"]
+    
+    # 只修改调度参数：运行统计不变
+    assert service.add_scan_task("movies", str(library), [], "interval", {"hours": 6}, skip_watched=False)
+    task = service.tasks["movies"]
+    assert task["run_count"] == 1 and task["last_run"] == last_run
+    stored = service.task_store.load_tasks()[0]
+    assert stored["run_count"] == 1 and stored["last_run"] == last_run
+    assert stored["schedule_params"] == {"hours": 6}
+    
+    # 修改扫描目录：下次完整扫描，运行次数和历史保留
+    assert service.add_scan_task("movies", str(library / "anime"), [], "interval", {"hours": 6}, skip_watched=False)
+    stored = service.task_store.load_tasks()[0]
+    assert stored["run_count"] == 1 and stored["last_run"] is None
+    assert len(service.task_store.get_runs("movies")) == 1
+
+def test_stagger_delays_tasks_on_the_same_device(service, tmp_path, monkeypatch):
+    for name in ("movies", "shows", "anime"):
+        (tmp_path / name).mkdir()
+        service.add_scan_task(name, str(tmp_path / name), [], "interval", {"hours": 24})
+    service.set_stagger(window=100, jitter=0)
+    
+    # 没有历史记录时每个任务按默认耗时占用设备，推迟时间不超过错峰窗口
+    assert service._stagger_delay("movies") == 0
+    assert service._stagger_delay("shows") == pytest.approx(scheduler_module.DEFAULT_TASK_DURATION, abs=1)
+    assert service._stagger_delay("anime") == pytest.approx(100, abs=1)
+    assert service.get_stagger()["busy_devices"] == 1
+    
+    # 推迟的触发改为一次性延迟任务，不立即提交扫描
+    submitted = []
+    monkeypatch.setattr(service, "_run_task_and_wait", submitted.append)
+    service._run_scheduled_task("shows")
+    assert submitted == []
+    assert service.scheduler.get_job(service._staggered_job_id("shows"))
+
+def test_stagger_settings_are_persisted(tmp_path):
+    store = TaskStore(str(tmp_path / "scheduler.db"))
+    SchedulerService(store).set_stagger(window=-5, jitter=3)
+    
+    reloaded = SchedulerService(store)
+    assert reloaded.stagger_window == 0
+    assert reloaded.stagger_jitter == 3
+    assert reloaded.get_stagger()["busy_devices"] == 0
@@ -0,0 +1,74 @@
+"""重叠目录的合并扫描"""
+
+import threading
+
+import services.shared_scan as shared_scan_module
+from services.scanner import StrmScanner
+from services.shared_scan import collapse_roots, scan_shared
+
+def make_library(root):
+    for name in [
+        "movies/A.(mp4).strm", "movies/A.nfo", "movies/A.abc",
+        "movies/anime/B.(mp4).strm", "movies/anime/B.nfo", "movies/anime/B.abc",
+        "movies/anime/C.(iso).strm", "movies/anime/C.nfo",
+    ]:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+def test_collapse_roots_drops_roots_covered_by_recursive_scans(tmp_path):
+    outer = tmp_path / "movies"
+    inner = outer / "anime"
+    inner.mkdir(parents=True)
+    
+    assert collapse_roots([(str(outer), True), (str(inner), False)]) == [(str(outer), True)]
+    assert collapse_roots([(str(outer), False), (str(inner), True)]) == [(str(outer), False), (str(inner), True)]
+
+def test_shared_scan_splits_results_per_request(tmp_path):
+    make_library(tmp_path)
+    movies = tmp_path / "movies"
+    anime = movies / "anime"
+    
+    outer, inner = scan_shared([
+        {"directory": str(movies), "recursive": True, "scanner": StrmScanner()},
+        {
+            "directory": str(anime),
+            "recursive": True,
+            "scanner": StrmScanner(custom_video_extensions=[".iso"], custom_metadata_extensions=[".abc"])
+        }
+    ])
+    
+    # 每个请求只统计自身规则匹配的文件和链接
+    assert outer["total_files"] == 2
+    assert outer["created_links"] == 2
+    assert sorted(detail["file"] for detail in outer["details"]) == [
+        str(movies / "A.(mp4).strm"), str(anime / "B.(mp4).strm")
+    ]
+    assert inner["total_files"] == 2
+    assert inner["created_links"] == 3
+    
+    # 同一文件只处理一次，元数据扩展名取匹配请求的并集
+    links = sorted(path.name for path in tmp_path.rglob("*") if path.is_symlink())
+    assert links == ["A.(mp4).nfo", "B.(mp4).abc", "B.(mp4).nfo", "C.(iso).nfo"]
+
+def test_device_groups_are_processed_concurrently(tmp_path, monkeypatch):
+    make_library(tmp_path)
+    (tmp_path / "tv").mkdir()
+    (tmp_path / "tv" / "D.(mp4).strm").touch()
+    monkeypatch.setattr(shared_scan_module, "get_device_id", lambda path: 2 if "tv" in path else 1)
+    
+    # 两个设备分组都开始处理后才放行，逐组处理时会超时
+    barrier = threading.Barrier(2, timeout=5)
+    process = StrmScanner._process_strm_files
+    
+    def process_after_barrier(self, *args, **kwargs):
+        barrier.wait()
+        return process(self, *args, **kwargs)
+    
+    monkeypatch.setattr(StrmScanner, "_process_strm_files", process_after_barrier)
+    movies, tv = scan_shared([
+        {"directory": str(tmp_path / "movies"), "recursive": True, "scanner": StrmScanner()},
+        {"directory": str(tmp_path / "tv"), "recursive": True, "scanner": StrmScanner()}
+    ])
+    assert movies["total_files"] == 2
+    assert tv["total_files"] == 1
@@ -0,0 +1,71 @@
+"""定时任务存储：重启恢复与耗时百分位数"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.task_store import TaskStore, percentile
+
+def make_task(task_id: str, **overrides) -> dict:
+    task = {
+        "task_id": task_id,
+        "directory": "/media/movies",
+        "target_formats": ["mp4"],
+        "schedule_type": "interval",
+        "schedule_params": {"hours": 6},
+        "recursive": True,
+        "enabled": True,
+        "created_at": datetime(2024, 1, 1, 3, 0),
+        "last_run": None,
+        "run_count": 0
+    }
+    task.update(overrides)
+    return task
+
+def test_percentile_interpolates_between_ranks():
+    assert percentile([], 50) is None
+    assert percentile([4.0], 99) == 4.0
+    values = [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 90) == pytest.approx(4.6)
+    assert percentile(values, 100) == 5.0
+
+def test_tasks_and_runs_survive_restart(tmp_path):
+    db_path = str(tmp_path / "scheduler.db")
+    store = TaskStore(db_path)
+    store.save_task(make_task("movies"))
+    
+    started = datetime(2024, 1, 2, 3, 0)
+    for seconds, status in [(10, "success"), (30, "success"), (5, "error"), (20, "success")]:
+        store.record_run("movies", started, started + timedelta(seconds=seconds), status)
+        started += timedelta(hours=6)
+    store.set_checkpoint("movies", "/media/movies/b/", datetime(2024, 1, 3, 3, 0))
+    store.close()
+    
+    reopened = TaskStore(db_path)
+    task = reopened.load_tasks()[0]
+    assert task["directory"] == "/media/movies"
+    assert task["run_count"] == 3
+    assert task["last_run"] == datetime(2024, 1, 2, 21, 0)
+    assert task["checkpoint"] == "/media/movies/b/"
+    assert task["checkpoint_started_at"] == datetime(2024, 1, 3, 3, 0)
+    assert [run["status"] for run in reopened.get_runs("movies")] == ["success", "error", "success", "success"]
+    
+    # 只统计成功的运行
+    stats = reopened.get_duration_stats("movies", percentiles=(50, 90))
+    assert stats["runs"] == 3
+    assert stats["min"] == 10 and stats["max"] == 30
+    assert stats["percentiles"] == {"p50": 20, "p90": pytest.approx(28)}
+
+def test_saving_existing_task_keeps_run_stats(tmp_path):
+    store = TaskStore(str(tmp_path / "scheduler.db"))
+    store.save_task(make_task("movies"))
+    started = datetime(2024, 1, 2, 3, 0)
+    store.record_run("movies", started, started + timedelta(seconds=10), "success")
+    store.set_checkpoint("movies", "/media/movies/b/", started)
+    
+    store.save_task(make_task("movies", schedule_params={"hours": 12}, last_run=started))
+    task = store.load_tasks()[0]
+    assert task["schedule_params"] == {"hours": 12}
+    assert task["run_count"] == 1
+    assert task["checkpoint"] == "/media/movies/b/"
@@ -0,0 +1,56 @@
+"""选择性监听模式的目录收集"""
+
+import os
+import time
+
+import pytest
+
+from services.watcher import WatcherService, WATCH_MODE_SELECTIVE, collect_strm_directories
+
+def make_library(root):
+    for name in ["a/1.(mp4).strm", "b/notes.txt", "c/d/2.(mp4).strm"]:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_collect_strm_directories_includes_parents(tmp_path):
+    make_library(tmp_path)
+    assert collect_strm_directories(tmp_path) == {
+        str(tmp_path),
+        str(tmp_path / "a"),
+        str(tmp_path / "c"),
+        str(tmp_path / "c" / "d")
+    }
+
+@pytest.fixture
+def watcher():
+    service = WatcherService()
+    yield service
+    service.stop()
+
+def test_selective_watches_are_collected_in_background(tmp_path, watcher):
+    library = tmp_path / "library"
+    make_library(library)
+    root = str(library.resolve())
+    assert watcher.add_watch_directory(root, watch_mode=WATCH_MODE_SELECTIVE)
+    assert watcher.start()
+    
+    watches = watcher.watch_dirs[root]["watches"]
+    assert root in watches
+    assert wait_for(lambda: len(watches) == 4)
+    assert set(watches) == collect_strm_directories(library.resolve())
+    
+    # 移入的目录树在后台补充监听
+    staging = tmp_path / "staging"
+    (staging / "f").mkdir(parents=True)
+    (staging / "f" / "3.(mp4).strm").touch()
+    os.rename(staging, library / "e")
+    assert wait_for(lambda: os.path.join(root, "e", "f") in watches)
@@ -0,0 +1,83 @@
+"""链接工作调度器的优先级分道与设备预算"""
+
+import threading
+
+import pytest
+
+from services.devices import get_device_id
+from services.work_scheduler import LinkWorkScheduler, PRIORITY_BULK, PRIORITY_REALTIME
+
+@pytest.fixture
+def gate():
+    """阻塞工作线程的任务，测试结束时放行"""
+    release = threading.Event()
+    yield release
+    release.set()
+
+def make_scheduler(request, **kwargs) -> LinkWorkScheduler:
+    scheduler = LinkWorkScheduler(**kwargs)
+    request.addfinalizer(scheduler.shutdown)
+    return scheduler
+
+def occupy(scheduler, gate, **kwargs):
+    """提交一个阻塞任务并等待它开始执行"""
+    started = threading.Event()
+    
+    def blocked():
+        started.set()
+        gate.wait(5)
+    
+    future = scheduler.submit(blocked, **kwargs)
+    assert started.wait(5)
+    return future
+
+def test_realtime_work_runs_before_queued_bulk_work(request, gate):
+    scheduler = make_scheduler(request, max_workers=1, reserved_realtime_workers=0)
+    occupy(scheduler, gate)
+    
+    order = []
+    bulk = [scheduler.submit(order.append, f"bulk-{n}", priority=PRIORITY_BULK) for n in range(2)]
+    realtime = scheduler.submit(order.append, "realtime", priority=PRIORITY_REALTIME)
+    gate.set()
+    
+    for future in bulk + [realtime]:
+        future.result(timeout=5)
+    assert order == ["realtime", "bulk-0", "bulk-1"]
+
+def test_reserved_worker_handles_realtime_while_bulk_saturates_pool(request, gate):
+    scheduler = make_scheduler(request, max_workers=2, reserved_realtime_workers=1)
+    occupy(scheduler, gate)
+    queued_bulk = scheduler.submit(lambda: "bulk")
+    
+    # 批量任务占满普通线程时，实时任务由预留线程立即处理
+    assert scheduler.submit(lambda: "realtime", priority=PRIORITY_REALTIME).result(timeout=5) == "realtime"
+    assert not queued_bulk.done()
+    lanes = scheduler.get_status()["lanes"]
+    assert lanes["bulk"]["queued"] == 1 and lanes["realtime"]["completed"] == 1
+    
+    gate.set()
+    assert queued_bulk.result(timeout=5) == "bulk"
+
+def test_unknown_priority_is_rejected(request):
+    scheduler = make_scheduler(request)
+    with pytest.raises(ValueError):
+        scheduler.submit(lambda: None, priority=5)
+
+def test_bulk_work_respects_per_device_budget(request, gate):
+    scheduler = make_scheduler(request, max_workers=3, reserved_realtime_workers=0, per_device_workers=1)
+    occupy(scheduler, gate, device=1)
+    
+    # 设备 1 已用满预算，其他设备的批量任务和实时任务不受影响
+    same_device = scheduler.submit(lambda: "device 1", device=1)
+    assert scheduler.submit(lambda: "device 2", device=2).result(timeout=5) == "device 2"
+    assert scheduler.submit(lambda: "realtime", priority=PRIORITY_REALTIME, device=1).result(timeout=5) == "realtime"
+    assert not same_device.done()
+    assert list(scheduler.get_status()["devices"].values()) == [1]
+    
+    gate.set()
+    assert same_device.result(timeout=5) == "device 1"
+
+def test_device_ids_group_paths_by_filesystem(tmp_path):
+    (tmp_path / "a").mkdir()
+    assert get_device_id(str(tmp_path / "a")) == get_device_id(str(tmp_path)) is not None
+    assert get_device_id(str(tmp_path / "missing")) is None